@@ -0,0 +1,351 @@
+# Benchmark do interpretador com tabelas usuarios/pedidos sintéticas.
+#
+# Gera (uma vez) as tabelas com o tamanho pedido, copia-as para um diretório de trabalho e corre uma
+# matriz fixa de consultas (leituras, JOIN, GROUP BY, ORDER BY+LIMIT, DISTINCT, ordenação e agregações
+# com resultados intermédios grandes, UPDATE, DELETE, INSERT).
+# Cada consulta corre num processo novo, para que o tempo e o pico de memória (RSS) sejam só dela.
+# Os resultados são gravados num JSON que pode ser comparado com o de outra execução:
+#     python benchmark.py --tamanho 1m --saida antes.json
+#     python benchmark.py --tamanho 1m --saida depois.json
+#     python benchmark.py --comparar antes.json depois.json
+# O pico de memória com e sem limite para os resultados intermédios (ver configuracao.MEMORIA_CONSULTA_BYTES):
+#     python benchmark.py --tamanho 1m --config MEMORIA_CONSULTA_BYTES=0 --saida sem_limite.json
+#     python benchmark.py --tamanho 1m --config MEMORIA_CONSULTA_BYTES=33554432 --saida com_limite.json
+# Com --verificar, a matriz corre uma vez com o motor de linhas e outra com o motor NumPy (ver
+# motor_numpy.py) e, em vez de tempos, compara o que cada consulta imprimiu nos dois motores.
+#
+# Tamanhos: 10k, 1m e 10m linhas em pedidos; usuarios tem --proporcao-usuarios dessas linhas (0.1 por omissão).
+# A coluna pedidos.id_usuario segue uma distribuição de Zipf com expoente --assimetria (0 = uniforme):
+# com assimetria alta, poucos usuários concentram a maior parte dos pedidos.
+import argparse
+import ast
+import csv
+import datetime
+import hashlib
+import importlib.util
+import itertools
+import json
+import os
+import platform
+import random
+import resource
+import shutil
+import statistics
+import subprocess
+import sys
+import time
+
+_DIRETORIO = os.path.dirname(os.path.abspath(__file__))
+
+TAMANHOS = {'10k': 10_000, '1m': 1_000_000, '10m': 10_000_000}
+
+_PRIMEIROS_NOMES = ['Ana', 'Bruno', 'Carla', 'Diogo', 'Eva', 'Filipe', 'Gabriela', 'Hugo', 'Inês', 'João',
+                    'Lara', 'Miguel', 'Nuno', 'Olga', 'Pedro', 'Rita', 'Sara', 'Tiago', 'Vera', 'Zé']
+_APELIDOS = ['Silva', 'Santos', 'Ferreira', 'Pereira', 'Costa', 'Oliveira', 'Martins', 'Sousa', 'Rodrigues',
+             'Almeida', 'Lopes', 'Gomes', 'Carvalho', 'Ribeiro', 'Pinto', 'Marques']
+_DOMINIOS = ['email.com', 'correio.pt', 'exemplo.org', 'mail.net']
+_PRODUTOS = ['Notebook', 'Mouse', 'Teclado', 'Monitor', 'Cadeira', 'Mesa', 'Headset', 'Webcam', 'Impressora',
+             'Tablet', 'Telemóvel', 'Cabo HDMI', 'Disco SSD', 'Memória RAM', 'Router', 'Coluna', 'Microfone',
+             'Lâmpada', 'Mochila', 'Carregador']
+
+# Linhas geradas de cada vez antes de serem escritas.
+_LOTE_GERACAO = 100_000
+
+# Matriz de consultas: (nome, sql). '{meio}' é substituído por um ID de usuário a meio da tabela.
+# As escritas ficam no fim, pela ordem indicada, e correm uma só vez.
+CONSULTAS_LEITURA = [
+    ('scan_filtro', "SELECT nome, idade FROM usuarios WHERE idade > 75"),
+    ('scan_ponto', "SELECT * FROM usuarios WHERE id = {meio}"),
+    ('like', "SELECT nome, email FROM usuarios WHERE email LIKE '%77@%'"),
+    ('join', "SELECT nome, produto, valor FROM usuarios JOIN pedidos ON id = id_usuario WHERE valor > 999"),
+    ('group_by_produto', "SELECT produto, COUNT(*), AVG(valor) FROM pedidos GROUP BY produto"),
+    ('group_by_usuario', "SELECT id_usuario, SUM(valor) FROM pedidos GROUP BY id_usuario ORDER BY id_usuario LIMIT 20"),
+    ('order_by_limit', "SELECT * FROM pedidos ORDER BY valor DESC LIMIT 10"),
+    ('distinct', "SELECT DISTINCT produto FROM pedidos"),
+    ('agregacao_total', "SELECT COUNT(*), SUM(valor) FROM pedidos"),
+    # Resultados intermédios do tamanho da tabela: com configuracao.MEMORIA_CONSULTA_BYTES, o pico de
+    # memória destas fica limitado (a ordenação, os grupos e as chaves passam para disco).
+    ('order_by_completo', "SELECT pedido_id, valor FROM pedidos ORDER BY valor"),
+    ('group_by_pedido', "SELECT pedido_id, SUM(valor) FROM pedidos GROUP BY pedido_id"),
+    ('distinct_valores', "SELECT DISTINCT id_usuario, valor FROM pedidos"),
+]
+CONSULTAS_ESCRITA = [
+    ('update', "UPDATE pedidos SET valor = 1 WHERE id_usuario = 1"),
+    ('delete', "DELETE FROM pedidos WHERE valor < 2"),
+    ('insert', "INSERT INTO usuarios (nome, idade, email) VALUES "
+               + ", ".join(f"('Novo {i}', {18 + i % 60}, 'novo{i}@email.com')" for i in range(100))),
+]
+
+# Tabelas lidas por cada consulta, para calcular as linhas lidas por segundo.
+_TABELAS_CONSULTA = {
+    'join': ('usuarios', 'pedidos'),
+}
+
+def _tabelas_da_consulta(nome, sql):
+    if nome in _TABELAS_CONSULTA:
+        return _TABELAS_CONSULTA[nome]
+    return ('pedidos',) if 'pedidos' in sql else ('usuarios',)
+
+# --- Geração de dados ---
+
+def gerar_usuarios(caminho, linhas, semente):
+    aleatorio = random.Random(semente)
+    with open(caminho, 'w', newline='', encoding='utf-8') as f:
+        escritor = csv.writer(f)
+        escritor.writerow(['id', 'nome', 'idade', 'email'])
+        for inicio in range(1, linhas + 1, _LOTE_GERACAO):
+            escritor.writerows(
+                (i,
+                 f"{aleatorio.choice(_PRIMEIROS_NOMES)} {aleatorio.choice(_APELIDOS)}",
+                 aleatorio.randint(18, 80),
+                 f"user{i}@{aleatorio.choice(_DOMINIOS)}")
+                for i in range(inicio, min(inicio + _LOTE_GERACAO, linhas + 1))
+            )
+
+# Pesos acumulados de uma distribuição de Zipf sobre 1..n (o ID 1 é o mais frequente).
+def _pesos_zipf(n, assimetria):
+    return list(itertools.accumulate(1.0 / k ** assimetria for k in range(1, n + 1)))
+
+def gerar_pedidos(caminho, linhas, linhas_usuarios, assimetria, semente):
+    aleatorio = random.Random(semente + 1)
+    ids_usuarios = range(1, linhas_usuarios + 1)
+    pesos = _pesos_zipf(linhas_usuarios, assimetria)
+    with open(caminho, 'w', newline='', encoding='utf-8') as f:
+        escritor = csv.writer(f)
+        escritor.writerow(['pedido_id', 'id_usuario', 'produto', 'valor'])
+        for inicio in range(1, linhas + 1, _LOTE_GERACAO):
+            fim = min(inicio + _LOTE_GERACAO, linhas + 1)
+            usuarios = aleatorio.choices(ids_usuarios, cum_weights=pesos, k=fim - inicio)
+            escritor.writerows(
+                (i, id_usuario, aleatorio.choice(_PRODUTOS), round(aleatorio.uniform(1, 1000), 2))
+                for i, id_usuario in zip(range(inicio, fim), usuarios)
+            )
+
+# Gera as tabelas em 'diretorio', a menos que já lá estejam com os mesmos parâmetros.
+def preparar_dados(diretorio, parametros):
+    marcador = os.path.join(diretorio, 'parametros.json')
+    try:
+        with open(marcador, encoding='utf-8') as f:
+            if json.load(f) == parametros:
+                return
+    except (FileNotFoundError, ValueError):
+        pass
+
+    os.makedirs(diretorio, exist_ok=True)
+    print(f"A gerar dados em {diretorio}: {parametros}", file=sys.stderr)
+    gerar_usuarios(os.path.join(diretorio, 'usuarios.csv'), parametros['linhas_usuarios'], parametros['semente'])
+    gerar_pedidos(os.path.join(diretorio, 'pedidos.csv'), parametros['linhas_pedidos'],
+                  parametros['linhas_usuarios'], parametros['assimetria'], parametros['semente'])
+    with open(marcador, 'w', encoding='utf-8') as f:
+        json.dump(parametros, f)
+
+# --- Execução de cada consulta num processo próprio ---
+
+# Conta as linhas impressas pelo executor sem as guardar (fica só um resumo SHA-256 do texto).
+class _ContadorLinhas:
+    def __init__(self):
+        self.linhas = 0
+        self.erros = []
+        self.resumo = hashlib.sha256()
+
+    def write(self, texto):
+        self.linhas += texto.count('\n')
+        self.resumo.update(texto.encode('utf-8'))
+        if texto.startswith('ERRO'):
+            self.erros.append(texto.strip())
+        return len(texto)
+
+    def flush(self):
+        pass
+
+# Corre no processo filho: executa uma consulta no diretório de dados e imprime as medições em JSON.
+def _executar_no_filho(diretorio_dados, sql, configuracoes):
+    inicio = time.perf_counter()
+    os.chdir(diretorio_dados)
+    import configuracao
+    from executor import executar
+    from preparadas import analisar
+    for chave, valor in configuracoes.items():
+        setattr(configuracao, chave, valor)
+
+    contador, saida = _ContadorLinhas(), sys.stdout
+    sys.stdout = contador
+    try:
+        executar(analisar(sql))
+    finally:
+        sys.stdout = saida
+    tempo = time.perf_counter() - inicio
+    print(json.dumps({
+        'tempo_s': tempo,
+        'pico_rss_kb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+        'linhas_impressas': contador.linhas,
+        'resumo_saida': contador.resumo.hexdigest(),
+        'erros': contador.erros
+    }))
+
+def medir_consulta(diretorio_dados, sql, configuracoes):
+    inicio = time.perf_counter()
+    resultado = subprocess.run(
+        [sys.executable, os.path.abspath(__file__), '--filho', diretorio_dados, sql, json.dumps(configuracoes)],
+        capture_output=True, text=True, check=True
+    )
+    medicao = json.loads(resultado.stdout.strip().splitlines()[-1])
+    medicao['tempo_processo_s'] = time.perf_counter() - inicio
+    return medicao
+
+def _contar_linhas(caminho):
+    with open(caminho, newline='', encoding='utf-8') as f:
+        return sum(1 for valores in csv.reader(f) if valores) - 1
+
+# Corre a matriz de consultas sobre uma cópia dos dados e devolve o relatório.
+def correr(diretorio_base, diretorio_trabalho, parametros, repeticoes, configuracoes, filtro=None):
+    shutil.rmtree(diretorio_trabalho, ignore_errors=True)
+    os.makedirs(diretorio_trabalho)
+    for tabela in ('usuarios.csv', 'pedidos.csv'):
+        shutil.copy(os.path.join(diretorio_base, tabela), diretorio_trabalho)
+
+    meio = max(1, parametros['linhas_usuarios'] // 2)
+    consultas = [(nome, sql, False) for nome, sql in CONSULTAS_LEITURA] + \
+                [(nome, sql, True) for nome, sql in CONSULTAS_ESCRITA]
+    resultados = []
+    for nome, sql, escrita in consultas:
+        if filtro and nome not in filtro:
+            continue
+        sql = sql.format(meio=meio)
+        linhas_lidas = sum(_contar_linhas(os.path.join(diretorio_trabalho, f"{tabela}.csv"))
+                           for tabela in _tabelas_da_consulta(nome, sql))
+        medicoes = [medir_consulta(diretorio_trabalho, sql, configuracoes)
+                    for _ in range(1 if escrita else repeticoes)]
+        tempo = statistics.median(m['tempo_s'] for m in medicoes)
+        resultado = {
+            'nome': nome,
+            'sql': sql if len(sql) <= 200 else sql[:200] + '...',
+            'escrita': escrita,
+            'repeticoes': len(medicoes),
+            'tempo_s': tempo,
+            'tempo_processo_s': statistics.median(m['tempo_processo_s'] for m in medicoes),
+            'pico_rss_kb': max(m['pico_rss_kb'] for m in medicoes),
+            'linhas_lidas': linhas_lidas,
+            'linhas_por_segundo': linhas_lidas / tempo if tempo else None,
+            'linhas_impressas': medicoes[-1]['linhas_impressas'],
+            'resumo_saida': medicoes[-1]['resumo_saida'],
+            'erros': medicoes[-1]['erros']
+        }
+        resultados.append(resultado)
+        print(f"{nome}: {tempo:.3f} s, {resultado['pico_rss_kb'] / 1024:.1f} MB", file=sys.stderr)
+    return resultados
+
+# Corre a matriz (cada consulta uma vez, com as escritas pela mesma ordem) com cada motor de execução e
+# compara o texto impresso por cada consulta. Devolve True se os dois motores deram os mesmos resultados.
+def verificar_motores(diretorio_base, diretorio_trabalho, parametros, configuracoes, filtro=None):
+    resumos = {}
+    for motor in ('linhas', 'numpy'):
+        print(f"-- motor {motor}", file=sys.stderr)
+        resultados = correr(diretorio_base, diretorio_trabalho, parametros, 1,
+                            dict(configuracoes, MOTOR_EXECUCAO=motor), filtro)
+        resumos[motor] = [(r['nome'], r['resumo_saida'], r['linhas_impressas']) for r in resultados]
+    iguais = True
+    for (nome, resumo_linhas, linhas), (_, resumo_numpy, _) in zip(resumos['linhas'], resumos['numpy']):
+        igual = resumo_linhas == resumo_numpy
+        iguais = iguais and igual
+        print(f"{nome}: {'iguais' if igual else 'DIFERENTES'} ({linhas} linhas impressas)")
+    return iguais
+
+def _revisao_git():
+    try:
+        return subprocess.run(['git', 'rev-parse', 'HEAD'], cwd=_DIRETORIO,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+# --- Comparação de resultados ---
+
+def comparar(caminho_antes, caminho_depois):
+    with open(caminho_antes, encoding='utf-8') as f:
+        antes = {r['nome']: r for r in json.load(f)['consultas']}
+    with open(caminho_depois, encoding='utf-8') as f:
+        depois = {r['nome']: r for r in json.load(f)['consultas']}
+    print("consulta | tempo antes (s) | tempo depois (s) | aceleração | RSS antes (MB) | RSS depois (MB)")
+    for nome in antes:
+        if nome not in depois:
+            continue
+        a, d = antes[nome], depois[nome]
+        aceleracao = a['tempo_s'] / d['tempo_s'] if d['tempo_s'] else float('inf')
+        print(f"{nome} | {a['tempo_s']:.3f} | {d['tempo_s']:.3f} | {aceleracao:.2f}x | "
+              f"{a['pico_rss_kb'] / 1024:.1f} | {d['pico_rss_kb'] / 1024:.1f}")
+
+# Converte 'CHAVE=VALOR' (da opção --config) num par, com o valor interpretado como literal Python.
+def _opcao_configuracao(texto):
+    chave, _, valor = texto.partition('=')
+    try:
+        return chave, ast.literal_eval(valor)
+    except (ValueError, SyntaxError):
+        return chave, valor
+
+def main():
+    if len(sys.argv) > 1 and sys.argv[1] == '--filho':
+        sys.path.insert(0, _DIRETORIO)
+        _executar_no_filho(sys.argv[2], sys.argv[3], json.loads(sys.argv[4]))
+        return
+
+    argumentos = argparse.ArgumentParser(description="Benchmark com tabelas usuarios/pedidos sintéticas.")
+    argumentos.add_argument('--tamanho', choices=sorted(TAMANHOS), default='10k')
+    argumentos.add_argument('--proporcao-usuarios', type=float, default=0.1)
+    argumentos.add_argument('--assimetria', type=float, default=1.1,
+                            help="expoente de Zipf de pedidos.id_usuario (0 = uniforme)")
+    argumentos.add_argument('--semente', type=int, default=42)
+    argumentos.add_argument('--repeticoes', type=int, default=3, help="execuções de cada leitura (conta a mediana)")
+    argumentos.add_argument('--dados', default=os.path.join(_DIRETORIO, 'dados_benchmark'),
+                            help="diretório onde os dados gerados são guardados e reaproveitados")
+    argumentos.add_argument('--consultas', nargs='*', help="corre só as consultas com estes nomes")
+    argumentos.add_argument('--config', action='append', default=[], type=_opcao_configuracao,
+                            metavar='CHAVE=VALOR', help="altera um parâmetro de configuracao.py nas consultas")
+    argumentos.add_argument('--saida', help="ficheiro JSON de resultados")
+    argumentos.add_argument('--comparar', nargs=2, metavar=('ANTES', 'DEPOIS'),
+                            help="compara dois ficheiros de resultados e termina")
+    argumentos.add_argument('--verificar', action='store_true',
+                            help="compara os resultados do motor de linhas e do motor NumPy em vez de medir tempos")
+    opcoes = argumentos.parse_args()
+
+    if opcoes.comparar:
+        comparar(*opcoes.comparar)
+        return
+
+    linhas = TAMANHOS[opcoes.tamanho]
+    parametros = {
+        'linhas_pedidos': linhas,
+        'linhas_usuarios': max(1, int(linhas * opcoes.proporcao_usuarios)),
+        'assimetria': opcoes.assimetria,
+        'semente': opcoes.semente
+    }
+    base = os.path.join(opcoes.dados, f"{opcoes.tamanho}-z{opcoes.assimetria}-s{opcoes.semente}")
+    if abs(opcoes.proporcao_usuarios - 0.1) > 1e-12:
+        base += f"-u{opcoes.proporcao_usuarios}"
+    preparar_dados(base, parametros)
+
+    configuracoes = dict(opcoes.config)
+    if opcoes.verificar:
+        if importlib.util.find_spec('numpy') is None:
+            sys.exit("ERRO: o NumPy não está instalado; não há motor vetorizado para verificar.")
+        iguais = verificar_motores(base, os.path.join(opcoes.dados, 'trabalho'), parametros,
+                                   configuracoes, opcoes.consultas)
+        sys.exit(0 if iguais else 1)
+    resultados = correr(base, os.path.join(opcoes.dados, 'trabalho'), parametros,
+                        opcoes.repeticoes, configuracoes, opcoes.consultas)
+    relatorio = {
+        'data': datetime.datetime.now().isoformat(timespec='seconds'),
+        'revisao': _revisao_git(),
+        'python': platform.python_version(),
+        'plataforma': platform.platform(),
+        'tamanho': opcoes.tamanho,
+        'parametros': parametros,
+        'configuracao': configuracoes,
+        'consultas': resultados
+    }
+    saida = opcoes.saida or f"benchmark-{opcoes.tamanho}-{datetime.datetime.now():%Y%m%d-%H%M%S}.json"
+    with open(saida, 'w', encoding='utf-8') as f:
+        json.dump(relatorio, f, indent=2, ensure_ascii=False)
+    print(f"Resultados gravados em {saida}", file=sys.stderr)
+
+if __name__ == '__main__':
+    main()
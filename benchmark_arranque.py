@@ -0,0 +1,75 @@
+# Mede o tempo de arranque a frio do interpretador: do início do processo até ao primeiro resultado impresso.
+# Cada medição corre num processo Python novo, num diretório temporário com cópias dos CSV de exemplo,
+# e é feita uma execução de aquecimento (para criar os .pyc) que não conta.
+# Com --revisao, mede também uma revisão anterior do git (extraída com 'git archive') para comparar:
+#     python benchmark_arranque.py --repeticoes 20 --revisao HEAD~1
+import argparse
+import glob
+import os
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+_DIRETORIO = os.path.dirname(os.path.abspath(__file__))
+
+# Programa executado em cada processo; escreve no stderr o tempo desde o início até ao primeiro resultado.
+_PROGRAMA = (
+    "import time\n"
+    "inicio = time.perf_counter()\n"
+    "from parser_sql import parser\n"
+    "from executor import executar\n"
+    "executar(parser.parse({sql!r}))\n"
+    "import sys\n"
+    "sys.stderr.write(repr(time.perf_counter() - inicio))\n"
+)
+
+def _medir_uma_vez(diretorio_codigo, diretorio_dados, sql):
+    ambiente = dict(os.environ, PYTHONPATH=diretorio_codigo)
+    inicio = time.perf_counter()
+    resultado = subprocess.run(
+        [sys.executable, '-c', _PROGRAMA.format(sql=sql)],
+        cwd=diretorio_dados, env=ambiente, capture_output=True, text=True, check=True
+    )
+    total = time.perf_counter() - inicio
+    return total, float(resultado.stderr.strip().splitlines()[-1])
+
+# Mede 'repeticoes' arranques do código em 'diretorio_codigo'. Devolve as medianas (total, desde o import).
+def medir(diretorio_codigo, sql, repeticoes):
+    with tempfile.TemporaryDirectory() as diretorio_dados:
+        for tabela in glob.glob(os.path.join(diretorio_codigo, '*.csv')):
+            shutil.copy(tabela, diretorio_dados)
+        _medir_uma_vez(diretorio_codigo, diretorio_dados, sql)
+        medicoes = [_medir_uma_vez(diretorio_codigo, diretorio_dados, sql) for _ in range(repeticoes)]
+    return statistics.median(m[0] for m in medicoes), statistics.median(m[1] for m in medicoes)
+
+# Extrai uma revisão do repositório para um diretório temporário.
+def extrair_revisao(revisao, destino):
+    arquivo = subprocess.run(
+        ['git', 'archive', '--format=tar', revisao], cwd=_DIRETORIO, capture_output=True, check=True
+    ).stdout
+    subprocess.run(['tar', '-x', '-C', destino], input=arquivo, check=True)
+
+def main():
+    argumentos = argparse.ArgumentParser(description="Tempo de arranque até ao primeiro resultado.")
+    argumentos.add_argument('--repeticoes', type=int, default=10)
+    argumentos.add_argument('--revisao', help="revisão do git a medir para comparação (ex.: HEAD~1)")
+    argumentos.add_argument('--sql', default="SELECT nome FROM usuarios WHERE idade > 20 LIMIT 1")
+    opcoes = argumentos.parse_args()
+
+    medicoes = []
+    if opcoes.revisao:
+        with tempfile.TemporaryDirectory() as diretorio_revisao:
+            extrair_revisao(opcoes.revisao, diretorio_revisao)
+            medicoes.append((opcoes.revisao, medir(diretorio_revisao, opcoes.sql, opcoes.repeticoes)))
+    medicoes.append(('atual', medir(_DIRETORIO, opcoes.sql, opcoes.repeticoes)))
+
+    print(f"Mediana de {opcoes.repeticoes} arranques: {opcoes.sql}")
+    print("versão | processo completo (ms) | desde o import (ms)")
+    for nome, (total, desde_import) in medicoes:
+        print(f"{nome} | {total * 1000:.1f} | {desde_import * 1000:.1f}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,164 @@
+# Cache, em memória do processo, das tabelas CSV já lidas.
+# Cada tabela fica guardada pelo seu caminho, junto com a assinatura do ficheiro (tamanho, mtime, inode):
+# se o ficheiro for alterado por fora, a assinatura deixa de coincidir e a tabela é lida de novo.
+# As escritas feitas pelo executor atualizam (INSERT) ou invalidam (VACUUM) a entrada. UPDATE e DELETE
+# não mudam o ficheiro (escrevem no log de alterações), por isso a cache guarda sempre o CSV base.
+import itertools
+import os
+import sys
+from collections import OrderedDict
+
+import configuracao
+
+# caminho -> entrada; a ordem do OrderedDict é a ordem de uso (a mais antiga primeiro).
+_tabelas = OrderedDict()
+_memoria_usada = 0
+
+# caminho -> (assinatura, orçamento) das tabelas que não couberam no orçamento de memória: enquanto o
+# ficheiro não mudar e o orçamento não aumentar, não se volta a tentar carregá-las.
+_recusadas = {}
+
+# Assinatura que identifica uma versão de um ficheiro.
+def assinatura_ficheiro(caminho):
+    estado = os.stat(caminho)
+    return (estado.st_size, estado.st_mtime_ns, estado.st_ino)
+
+def _memoria_linha(valores):
+    return sys.getsizeof(valores) + sum(map(sys.getsizeof, valores))
+
+def _remover(caminho):
+    global _memoria_usada
+    entrada = _tabelas.pop(caminho, None)
+    if entrada is not None:
+        _memoria_usada -= entrada['memoria']
+
+def _descartar_antigas(limite):
+    while _tabelas and _memoria_usada > limite:
+        caminho_antigo = next(iter(_tabelas))
+        _remover(caminho_antigo)
+
+# Devolve a tabela guardada em cache, ou None se não está lá (ou o ficheiro mudou desde que foi guardada)
+# ou a cache está desativada. As tabelas entram na cache através de ler_e_guardar.
+def obter_tabela(caminho):
+    if not configuracao.CACHE_TABELAS_BYTES:
+        return None
+    entrada = _tabelas.get(caminho)
+    if entrada is None:
+        return None
+    if entrada['assinatura'] != assinatura_ficheiro(caminho):
+        _remover(caminho)
+        return None
+    _tabelas.move_to_end(caminho)
+    return entrada
+
+# Indica se uma leitura completa da tabela deve tentar guardá-la na cache (ver ler_e_guardar): a cache
+# está ligada, o ficheiro cabe no orçamento de memória e esta versão dele ainda não foi recusada.
+def pode_guardar(caminho):
+    limite = configuracao.CACHE_TABELAS_BYTES
+    assinatura = assinatura_ficheiro(caminho)
+    # O texto do ficheiro é uma estimativa por baixo da memória que a tabela vai ocupar.
+    return limite > 0 and assinatura[0] <= limite and not recusada(caminho, assinatura)
+
+def _guardar(caminho, entrada):
+    global _memoria_usada
+    _remover(caminho)
+    _recusadas.pop(caminho, None)
+    _tabelas[caminho] = entrada
+    _memoria_usada += entrada['memoria']
+    _descartar_antigas(configuracao.CACHE_TABELAS_BYTES)
+
+# Lê a tabela do ficheiro e gera as suas linhas (como leitor_mmap.varrer, com as mesmas 'colunas' e
+# 'estatisticas'), guardando os valores à medida que são lidos: a tabela só fica na cache se a leitura
+# chegar ao fim, por isso uma leitura interrompida (ex.: por um LIMIT) não paga a leitura do resto do
+# ficheiro. Se a memória passar do orçamento, deixa de guardar e regista a recusa, mas continua a gerar
+# as linhas.
+def ler_e_guardar(caminho, colunas=None, estatisticas=None):
+    # Importado aqui porque leitor_mmap importa este módulo.
+    from leitor_mmap import ler_cabecalho, varrer_valores
+    limite = configuracao.CACHE_TABELAS_BYTES
+    assinatura = assinatura_ficheiro(caminho)
+    cabecalho = ler_cabecalho(caminho)
+    linhas, memoria = [], _memoria_linha(cabecalho)
+
+    def valores_lidos():
+        nonlocal linhas, memoria
+        for valores in varrer_valores(caminho, estatisticas=estatisticas):
+            valores = tuple(valores)
+            if linhas is not None:
+                linhas.append(valores)
+                memoria += _memoria_linha(valores)
+                if memoria > limite:
+                    linhas = None
+                    _recusadas[caminho] = (assinatura, limite)
+            yield valores
+
+    yield from _gerar_linhas(cabecalho, valores_lidos(), colunas)
+    if linhas is not None:
+        _guardar(caminho, {
+            'assinatura': assinatura,
+            'cabecalho': cabecalho,
+            'linhas': linhas,
+            'memoria': memoria + sys.getsizeof(linhas)
+        })
+
+# Indica se a tabela está guardada na cache.
+def em_cache(caminho):
+    return caminho in _tabelas
+
+# Indica se a versão atual do ficheiro já foi lida e não coube no orçamento de memória atual.
+def recusada(caminho, assinatura=None):
+    recusa = _recusadas.get(caminho)
+    if recusa is None:
+        return False
+    if assinatura is None:
+        assinatura = assinatura_ficheiro(caminho)
+    return recusa[0] == assinatura and configuracao.CACHE_TABELAS_BYTES <= recusa[1]
+
+# Gera as linhas de uma tabela em cache como dicionários novos (quem os recebe pode alterá-los).
+# Segue as mesmas regras do csv.DictReader para linhas com campos a menos ou a mais.
+# Com 'colunas' (um conjunto de nomes), as linhas só têm essas colunas (ver leitor_mmap.projetor_de_linhas).
+# Com 'intervalos' (pares [primeira, fim) de números de linha, por ordem), só gera as linhas desses intervalos.
+def linhas_da_tabela(entrada, colunas=None, intervalos=None):
+    todas = valores_linhas = entrada['linhas']
+    if intervalos is not None:
+        valores_linhas = itertools.chain.from_iterable(todas[primeira:fim] for primeira, fim in intervalos)
+    return _gerar_linhas(entrada['cabecalho'], valores_linhas, colunas)
+
+def _gerar_linhas(cabecalho, valores_linhas, colunas):
+    if colunas is not None:
+        from leitor_mmap import projetor_de_linhas
+        yield from map(projetor_de_linhas(cabecalho, colunas), valores_linhas)
+        return
+    numero_colunas = len(cabecalho)
+    for valores in valores_linhas:
+        linha = dict(zip(cabecalho, valores))
+        if len(valores) > numero_colunas:
+            linha[None] = list(valores[numero_colunas:])
+        elif len(valores) < numero_colunas:
+            for coluna in cabecalho[len(valores):]:
+                linha[coluna] = None
+        yield linha
+
+# Acrescenta à tabela em cache as linhas que acabaram de ser escritas no fim do ficheiro.
+# Só é seguro se a cache tinha a versão do ficheiro anterior à escrita; caso contrário a entrada é descartada.
+def registrar_insercao(caminho, assinatura_anterior, novas_linhas):
+    global _memoria_usada
+    entrada = _tabelas.get(caminho)
+    if entrada is None:
+        return
+    if entrada['assinatura'] != assinatura_anterior:
+        _remover(caminho)
+        return
+
+    for valores in novas_linhas:
+        valores = tuple(valores)
+        entrada['linhas'].append(valores)
+        entrada['memoria'] += _memoria_linha(valores)
+        _memoria_usada += _memoria_linha(valores)
+    entrada['assinatura'] = assinatura_ficheiro(caminho)
+    _descartar_antigas(configuracao.CACHE_TABELAS_BYTES)
+
+# Descarta a tabela da cache (usado depois das escritas que reescrevem o ficheiro).
+def invalidar(caminho):
+    _remover(caminho)
+    _recusadas.pop(caminho, None)
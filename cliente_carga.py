@@ -0,0 +1,122 @@
+# Cliente de carga para o servidor.py: abre N ligações ao mesmo tempo, cada uma a enviar consultas sem
+# parar durante --duracao segundos, e mede as consultas por segundo e a latência para cada nível de
+# concorrência pedido.
+#     python servidor.py --porta 5433 &
+#     python cliente_carga.py --porta 5433 --concorrencia 1 4 16 --duracao 10
+#     python cliente_carga.py --socket /tmp/sql.sock --escrita "UPDATE pedidos SET valor = 1 WHERE pedido_id = 101"
+# Cada ligação escolhe ao acaso (com uma semente fixa) uma das --consulta ou, com probabilidade
+# --fracao-escritas, uma das --escrita. As respostas com "erro" são contadas à parte e não entram na latência.
+import argparse
+import asyncio
+import json
+import random
+import sys
+import time
+
+from servidor import _PORTA
+
+CONSULTAS_PADRAO = [
+    "SELECT nome, idade FROM usuarios WHERE idade > 30",
+    "SELECT * FROM usuarios WHERE id = 2",
+    "SELECT produto, COUNT(*), SUM(valor) FROM pedidos GROUP BY produto",
+    "SELECT nome, produto, valor FROM usuarios JOIN pedidos ON id = id_usuario WHERE valor > 1000",
+]
+
+# Percentil (0-100) de uma lista já ordenada, pelo método do posto mais próximo.
+def _percentil(ordenadas, percentil):
+    if not ordenadas:
+        return 0.0
+    posicao = max(0, -(-len(ordenadas) * percentil // 100) - 1)
+    return ordenadas[min(posicao, len(ordenadas) - 1)]
+
+async def _abrir_ligacao(opcoes):
+    if opcoes.socket:
+        return await asyncio.open_unix_connection(opcoes.socket, limit=2 ** 26)
+    return await asyncio.open_connection(opcoes.host, opcoes.porta, limit=2 ** 26)
+
+# Uma ligação: envia pedidos, um de cada vez, até ao fim do prazo. Acrescenta as latências (em segundos)
+# das respostas sem erro a 'latencias' e devolve o número de erros.
+async def _cliente(opcoes, semente, fim, latencias, erros_vistos):
+    aleatorio = random.Random(semente)
+    leitor, escritor = await _abrir_ligacao(opcoes)
+    erros = 0
+    try:
+        while time.perf_counter() < fim:
+            if opcoes.escrita and aleatorio.random() < opcoes.fracao_escritas:
+                sql = aleatorio.choice(opcoes.escrita)
+            else:
+                sql = aleatorio.choice(opcoes.consulta)
+            inicio = time.perf_counter()
+            escritor.write(json.dumps({'sql': sql}, ensure_ascii=False).encode('utf-8') + b'\n')
+            await escritor.drain()
+            resposta = json.loads(await leitor.readline())
+            duracao = time.perf_counter() - inicio
+            if 'erro' in resposta:
+                erros += 1
+                erros_vistos.setdefault(resposta['erro'], sql)
+            else:
+                latencias.append(duracao)
+    finally:
+        escritor.close()
+        await escritor.wait_closed()
+    return erros
+
+async def medir_nivel(opcoes, concorrencia):
+    latencias, erros_vistos = [], {}
+    inicio = time.perf_counter()
+    fim = inicio + opcoes.duracao
+    erros = await asyncio.gather(*(_cliente(opcoes, opcoes.semente + i, fim, latencias, erros_vistos)
+                                   for i in range(concorrencia)))
+    decorrido = time.perf_counter() - inicio
+    latencias.sort()
+    for erro, sql in erros_vistos.items():
+        print(f"  ERRO em '{sql}': {erro}", file=sys.stderr)
+    return {
+        'concorrencia': concorrencia,
+        'pedidos': len(latencias),
+        'erros': sum(erros),
+        'pedidos_por_segundo': len(latencias) / decorrido,
+        'latencia_media_ms': 1000 * sum(latencias) / len(latencias) if latencias else 0.0,
+        'latencia_p50_ms': 1000 * _percentil(latencias, 50),
+        'latencia_p95_ms': 1000 * _percentil(latencias, 95),
+        'latencia_p99_ms': 1000 * _percentil(latencias, 99),
+    }
+
+async def _medir(opcoes):
+    resultados = []
+    print(f"{'conc.':>6} {'pedidos':>9} {'erros':>6} {'pedidos/s':>10} {'média ms':>9} {'p50 ms':>8} "
+          f"{'p95 ms':>8} {'p99 ms':>8}")
+    for concorrencia in opcoes.concorrencia:
+        r = await medir_nivel(opcoes, concorrencia)
+        resultados.append(r)
+        print(f"{r['concorrencia']:>6} {r['pedidos']:>9} {r['erros']:>6} {r['pedidos_por_segundo']:>10.1f} "
+              f"{r['latencia_media_ms']:>9.2f} {r['latencia_p50_ms']:>8.2f} {r['latencia_p95_ms']:>8.2f} "
+              f"{r['latencia_p99_ms']:>8.2f}", flush=True)
+    return resultados
+
+def main():
+    argumentos = argparse.ArgumentParser(description="Mede as consultas por segundo do servidor.py.")
+    argumentos.add_argument('--host', default='127.0.0.1')
+    argumentos.add_argument('--porta', type=int, default=_PORTA)
+    argumentos.add_argument('--socket', help="liga-se a um socket Unix em vez de TCP")
+    argumentos.add_argument('--concorrencia', type=int, nargs='+', default=[1, 2, 4, 8],
+                            help="números de ligações simultâneas a medir")
+    argumentos.add_argument('--duracao', type=float, default=5.0, help="segundos de medição por nível")
+    argumentos.add_argument('--consulta', action='append', help="consulta de leitura (repetível)")
+    argumentos.add_argument('--escrita', action='append', default=[], help="instrução de escrita (repetível)")
+    argumentos.add_argument('--fracao-escritas', type=float, default=0.1,
+                            help="probabilidade de cada pedido ser uma das --escrita")
+    argumentos.add_argument('--semente', type=int, default=42)
+    argumentos.add_argument('--saida', help="grava os resultados neste ficheiro JSON")
+    opcoes = argumentos.parse_args()
+    opcoes.consulta = opcoes.consulta or CONSULTAS_PADRAO
+    try:
+        resultados = asyncio.run(_medir(opcoes))
+    except OSError as e:
+        sys.exit(f"ERRO: não foi possível ligar ao servidor: {e}")
+    if opcoes.saida:
+        with open(opcoes.saida, 'w', encoding='utf-8') as f:
+            json.dump(resultados, f, indent=2)
+
+if __name__ == '__main__':
+    main()
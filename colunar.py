@@ -0,0 +1,402 @@
+# Ficheiro colunar de uma tabela ('<tabela>.csv.colunas'), para as leituras repetidas não voltarem a
+# interpretar o texto do CSV.
+#
+# Guarda as linhas do CSV base coluna a coluna (as alterações do log de alterações continuam a ser
+# aplicadas por cima, como na cache de tabelas), cada coluna num vetor contíguo de um tipo fixo:
+#   - 'int': inteiros de 64 bits, quando todos os valores da coluna são inteiros na forma canónica
+#     (str(int(valor)) == valor), para que a conversão de volta dê exatamente o texto do CSV;
+#   - 'float': reais de 64 bits, nas mesmas condições (repr(float(valor)) == valor);
+#   - 'str': codificação por dicionário: cada valor distinto é guardado uma vez (uma lista JSON) e a
+#     coluna guarda o índice de 32 bits do seu valor.
+#   - 'texto': as colunas de texto com demasiados valores distintos para um dicionário (ver
+#     configuracao.COLUNAR_MAXIMO_DISTINTOS) guardam os valores seguidos, em UTF-8, e a posição de 64 bits
+#     onde cada um acaba.
+# As leituras devolvem sempre os valores como texto, tal como viriam do CSV.
+#
+# Formato: b'CSVCOL1\n', o tamanho do cabeçalho (8 bytes), o cabeçalho em JSON e as secções de dados,
+# alinhadas a 8 bytes. O cabeçalho tem a assinatura do CSV a que o ficheiro corresponde (tamanho, mtime,
+# inode), o número de linhas e, para cada coluna, o tipo e a posição das suas secções. O ficheiro é lido
+# através de mmap e só as secções das colunas pedidas são tocadas. Quando o CSV muda (INSERT, VACUUM,
+# alteração externa) a assinatura deixa de coincidir e o ficheiro é ignorado até ser reconstruído.
+# Um CSV com linhas com campos a menos ou a mais não é convertido: o ficheiro fica só com o cabeçalho,
+# marcado como não convertível, para não se voltar a tentar enquanto o CSV não mudar.
+import array
+import itertools
+import json
+import mmap
+import os
+import struct
+import sys
+import tempfile
+
+import configuracao
+from cache_tabelas import assinatura_ficheiro
+from leitor_mmap import ler_cabecalho, varrer_valores
+
+_MAGIA = b'CSVCOL1\n'
+_TAMANHO_INTEIRO = 2 ** 63
+_BYTES_POR_VALOR = {'int': 8, 'float': 8, 'str': 4, 'texto': 8}
+
+def caminho_colunar(arquivo):
+    return f"{arquivo}.colunas"
+
+# Devolve os valores distintos convertidos para o tipo, ou None se algum não tem a forma canónica.
+def _converter(distintos, tipo):
+    convertidos = []
+    for valor in distintos:
+        try:
+            convertido = int(valor) if tipo == 'int' else float(valor)
+        except ValueError:
+            return None
+        canonico = str(convertido) if tipo == 'int' else repr(convertido)
+        if canonico != valor or (tipo == 'int' and not -_TAMANHO_INTEIRO <= convertido < _TAMANHO_INTEIRO):
+            return None
+        convertidos.append(convertido)
+    return convertidos
+
+def _alinhar(posicao):
+    return (posicao + 7) // 8 * 8
+
+def _gravar(arquivo, cabecalho, secoes):
+    # Escreve num ficheiro temporário e só depois o troca pelo definitivo, para nunca deixar um ficheiro a meio.
+    # O temporário leva o pid no nome: dois processos (ex.: trabalhadores do servidor.py) podem estar a
+    # construir o mesmo ficheiro ao mesmo tempo, e o último a terminar fica com o seu.
+    caminho = caminho_colunar(arquivo)
+    temporario = f'{caminho}.{os.getpid()}.tmp'
+    texto_cabecalho = json.dumps(cabecalho).encode('utf-8')
+    inicio_dados = _alinhar(len(_MAGIA) + 8 + len(texto_cabecalho))
+    # O ficheiro é só uma aceleração: se não puder ser gravado (ex.: diretório só de leitura, disco cheio),
+    # devolve False e as leituras continuam a usar o CSV.
+    try:
+        with open(temporario, 'wb') as f:
+            f.write(_MAGIA + struct.pack('<Q', len(texto_cabecalho)) + texto_cabecalho)
+            for pedacos in secoes:
+                f.write(b'\0' * (inicio_dados - f.tell()))
+                for pedaco in pedacos:
+                    f.write(pedaco)
+                inicio_dados = _alinhar(f.tell())
+        os.replace(temporario, caminho)
+    except OSError:
+        try:
+            os.remove(temporario)
+        except OSError:
+            pass
+        return False
+    return True
+
+# Linhas do CSV tratadas de cada vez na construção: os seus códigos (ou textos) são gravados nos ficheiros
+# temporários das colunas e o tamanho dos dicionários é verificado.
+_LINHAS_POR_LOTE = 65536
+# Memória estimada de cada entrada de um dicionário (tabela de hash e código), além do próprio texto, e
+# número de valores medidos para estimar o tamanho médio do texto.
+_MEMORIA_POR_DISTINTO = 100
+_AMOSTRA = 256
+
+# Gera o conteúdo do ficheiro temporário 'ficheiro' como vetores do tipo 'codigo', de até _LINHAS_POR_LOTE valores.
+def _ler_vetores(ficheiro, codigo):
+    ficheiro.seek(0)
+    while True:
+        vetor = array.array(codigo)
+        try:
+            vetor.fromfile(ficheiro, _LINHAS_POR_LOTE)
+        except EOFError:
+            # fromfile guarda os valores que conseguiu ler antes de chegar ao fim.
+            if vetor:
+                yield vetor
+            return
+        yield vetor
+
+# Uma coluna durante a construção do ficheiro colunar. Começa codificada por dicionário, com os códigos
+# gravados num ficheiro temporário à medida que são lidos; se o dicionário passar de
+# configuracao.COLUNAR_MAXIMO_DISTINTOS valores (ou os dicionários juntos do limite de memória), a coluna
+# passa a guardar os valores em texto simples (os bytes UTF-8 seguidos e a posição onde cada um acaba),
+# também em ficheiros temporários, e só continua a ser numérica se todos os valores o permitirem.
+class _ColunaEmConstrucao:
+    def __init__(self, nome):
+        self.nome = nome
+        self.dicionario = {}
+        self.linhas = 0
+        self._codigos = tempfile.TemporaryFile()
+        self._texto = self._fins = None
+        self._tamanho_texto = 0
+        self._tipos = None
+        self._media = None
+
+    def fechar(self):
+        for ficheiro in (self._codigos, self._texto, self._fins):
+            if ficheiro is not None:
+                ficheiro.close()
+
+    # Memória estimada do dicionário (0 em texto simples).
+    def memoria(self):
+        if not self.dicionario:
+            return 0
+        if self._media is None or len(self.dicionario) <= _AMOSTRA:
+            amostra = list(itertools.islice(self.dicionario, _AMOSTRA))
+            self._media = sum(map(sys.getsizeof, amostra)) / len(amostra) + _MEMORIA_POR_DISTINTO
+        return sys.getsizeof(self.dicionario) + len(self.dicionario) * self._media
+
+    def acrescentar(self, valores):
+        self.linhas += len(valores)
+        if self.dicionario is not None:
+            dicionario = self.dicionario
+            array.array('I', [dicionario.setdefault(valor, len(dicionario)) for valor in valores]).tofile(self._codigos)
+            return
+        self._tipos = [tipo for tipo in self._tipos if _converter(set(valores), tipo) is not None]
+        textos = [valor.encode('utf-8') for valor in valores]
+        fins = array.array('Q', itertools.accumulate(map(len, textos), initial=self._tamanho_texto))
+        self._texto.write(b''.join(textos))
+        fins[1:].tofile(self._fins)
+        self._tamanho_texto = fins[-1]
+
+    # Deixa a codificação por dicionário: os valores já lidos são regravados em texto simples.
+    def passar_a_texto(self):
+        distintos = list(self.dicionario)
+        self._tipos = [tipo for tipo in ('int', 'float') if _converter(distintos, tipo) is not None]
+        self.dicionario = None
+        self._texto, self._fins = tempfile.TemporaryFile(), tempfile.TemporaryFile()
+        self.linhas, codigos, self._codigos = 0, self._codigos, None
+        with codigos:
+            for vetor in _ler_vetores(codigos, 'I'):
+                self.acrescentar(list(map(distintos.__getitem__, vetor)))
+
+    # Gera os valores em texto simples, em listas de até _LINHAS_POR_LOTE.
+    def _textos(self):
+        self._texto.seek(0)
+        inicio = 0
+        for fins in _ler_vetores(self._fins, 'Q'):
+            bloco = self._texto.read(fins[-1] - inicio)
+            base = inicio
+            yield [str(bloco[comeco - base:fim - base], 'utf-8') for comeco, fim in zip([inicio, *fins[:-1]], fins)]
+            inicio = fins[-1]
+
+    # Escolhe o tipo da coluna e devolve (info, secoes): a descrição da coluna para o cabeçalho (sem as
+    # posições) e, para os dados e o dicionário, (tamanho, pedaços de bytes).
+    def codificar(self):
+        if self.dicionario is not None:
+            distintos = list(self.dicionario)
+            info = {'nome': self.nome, 'distintos': len(distintos)}
+            for tipo, codigo_array in (('int', 'q'), ('float', 'd')):
+                convertidos = _converter(distintos, tipo)
+                if convertidos is not None:
+                    dados = (array.array(codigo_array, map(convertidos.__getitem__, vetor)).tobytes()
+                             for vetor in _ler_vetores(self._codigos, 'I'))
+                    return dict(info, tipo=tipo), [(self.linhas * 8, dados), (0, ())]
+            dados = (vetor.tobytes() for vetor in _ler_vetores(self._codigos, 'I'))
+            texto_dicionario = json.dumps(distintos, ensure_ascii=False).encode('utf-8')
+            return dict(info, tipo='str'), [(self.linhas * 4, dados), (len(texto_dicionario), (texto_dicionario,))]
+        # Sem dicionário o número de valores distintos não é contado.
+        info = {'nome': self.nome, 'distintos': None}
+        for tipo, codigo_array, converter in (('int', 'q', int), ('float', 'd', float)):
+            if tipo in self._tipos:
+                dados = (array.array(codigo_array, map(converter, textos)).tobytes() for textos in self._textos())
+                return dict(info, tipo=tipo), [(self.linhas * 8, dados), (0, ())]
+        self._texto.seek(0)
+        texto = iter(lambda: self._texto.read(1024 * 1024), b'')
+        fins = (vetor.tobytes() for vetor in _ler_vetores(self._fins, 'Q'))
+        return dict(info, tipo='texto'), [(self.linhas * 8, fins), (self._tamanho_texto, texto)]
+
+# Passa a texto simples as colunas cujo dicionário tem mais de 'maximo_distintos' valores e, enquanto os
+# dicionários juntos passarem de 'memoria_maxima' (bytes estimados), a coluna com o maior.
+def _limitar_dicionarios(colunas, maximo_distintos, memoria_maxima):
+    for coluna in colunas:
+        if maximo_distintos is not None and coluna.dicionario is not None and len(coluna.dicionario) > maximo_distintos:
+            coluna.passar_a_texto()
+    if memoria_maxima is None:
+        return
+    memorias = [coluna.memoria() for coluna in colunas]
+    while sum(memorias) > memoria_maxima:
+        maior = memorias.index(max(memorias))
+        colunas[maior].passar_a_texto()
+        memorias[maior] = 0
+
+# Constrói (ou reconstrói) o ficheiro colunar a partir do CSV e devolve o seu cabeçalho, ou None se o
+# CSV está vazio (sem cabeçalho). O cabeçalho é devolvido mesmo que o ficheiro não tenha podido ser
+# gravado (ver _gravar). Se 'estatisticas' for um dicionário, acumula nele os bytes lidos do CSV.
+# A memória usada fica limitada: os valores são gravados em ficheiros temporários à medida que são lidos
+# e os dicionários pelos limites de configuracao.COLUNAR_MAXIMO_DISTINTOS e MEMORIA_CONSULTA_BYTES.
+def construir(arquivo, estatisticas=None):
+    assinatura = list(assinatura_ficheiro(arquivo))
+    nomes = ler_cabecalho(arquivo)
+    if not nomes:
+        return None
+    maximo_distintos = configuracao.COLUNAR_MAXIMO_DISTINTOS or None
+    memoria_maxima = configuracao.MEMORIA_CONSULTA_BYTES or None
+    colunas = [_ColunaEmConstrucao(nome) for nome in nomes]
+    try:
+        linhas = 0
+        convertivel = True
+        valores = varrer_valores(arquivo, estatisticas=estatisticas)
+        while lote := list(itertools.islice(valores, _LINHAS_POR_LOTE)):
+            if set(map(len, lote)) != {len(nomes)}:
+                convertivel = False
+                break
+            for coluna, valores_coluna in zip(colunas, zip(*lote)):
+                coluna.acrescentar(valores_coluna)
+            linhas += len(lote)
+            _limitar_dicionarios(colunas, maximo_distintos, memoria_maxima)
+
+        cabecalho = {'assinatura': assinatura, 'ordem_bytes': sys.byteorder, 'linhas': linhas, 'colunas': None}
+        secoes = []
+        if convertivel:
+            cabecalho['colunas'] = []
+            posicao = 0
+            for coluna in colunas:
+                info, secoes_coluna = coluna.codificar()
+                for nome_secao, (tamanho, pedacos) in zip(('dados', 'dicionario'), secoes_coluna):
+                    info[nome_secao] = [posicao, tamanho]
+                    secoes.append(pedacos)
+                    posicao = _alinhar(posicao + tamanho)
+                cabecalho['colunas'].append(info)
+        _gravar(arquivo, cabecalho, secoes)
+    finally:
+        for coluna in colunas:
+            coluna.fechar()
+    return cabecalho
+
+# Lê o cabeçalho do ficheiro colunar. Devolve (mapa, cabecalho, inicio_dados) ou None se não existe.
+def _ler(arquivo):
+    try:
+        f = open(caminho_colunar(arquivo), 'rb')
+    except FileNotFoundError:
+        return None
+    with f:
+        if os.fstat(f.fileno()).st_size < len(_MAGIA) + 8:
+            return None
+        mapa = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    if mapa[:len(_MAGIA)] != _MAGIA:
+        return None
+    tamanho = struct.unpack_from('<Q', mapa, len(_MAGIA))[0]
+    inicio_cabecalho = len(_MAGIA) + 8
+    cabecalho = json.loads(mapa[inicio_cabecalho:inicio_cabecalho + tamanho])
+    return mapa, cabecalho, _alinhar(inicio_cabecalho + tamanho)
+
+# Abre o ficheiro colunar da tabela se ele corresponder à versão atual do CSV. Se faltar ou estiver
+# desatualizado, só é construído aqui com 'construir_sempre' (o motor NumPy); as outras leituras usam o
+# CSV e deixam a construção automática para construir_depois_de_ler. Devolve None se não há ficheiro
+# colunar utilizável (a tabela deve ser lida do CSV).
+def abrir(arquivo, estatisticas=None, construir_sempre=False):
+    assinatura = list(assinatura_ficheiro(arquivo))
+    lido = _ler(arquivo)
+    if lido is None or lido[1]['assinatura'] != assinatura:
+        if not construir_sempre:
+            return None
+        construir(arquivo, estatisticas)
+        lido = _ler(arquivo)
+        if lido is None or lido[1]['assinatura'] != assinatura:
+            return None
+    mapa, cabecalho, inicio_dados = lido
+    if cabecalho['colunas'] is None or cabecalho['ordem_bytes'] != sys.byteorder:
+        return None
+    return {'mapa': mapa, 'cabecalho': cabecalho, 'inicio_dados': inicio_dados}
+
+# Indica se a tabela tem um ficheiro colunar utilizável ou se a próxima leitura o vai construir
+# (abrir com o mesmo 'construir_sempre').
+def disponivel(arquivo, construir_sempre=False):
+    lido = _ler(arquivo)
+    if lido is not None and lido[1]['assinatura'] == list(assinatura_ficheiro(arquivo)):
+        return lido[1]['colunas'] is not None and lido[1]['ordem_bytes'] == sys.byteorder
+    return construir_sempre
+
+# Construção automática: chamada no fim de uma leitura que percorreu o CSV inteiro, constrói o ficheiro
+# colunar se a tabela tem pelo menos configuracao.COLUNAR_AUTOMATICO_BYTES e ele falta ou está
+# desatualizado, para que as leituras seguintes já o usem. As leituras interrompidas (ex.: LIMIT) e as
+# que só leem parte da tabela (índice, mapa de zonas) não a fazem.
+def construir_depois_de_ler(arquivo, estatisticas=None):
+    limite = configuracao.COLUNAR_AUTOMATICO_BYTES
+    if limite <= 0 or os.path.getsize(arquivo) < limite:
+        return
+    lido = _ler(arquivo)
+    if lido is None or lido[1]['assinatura'] != list(assinatura_ficheiro(arquivo)):
+        construir(arquivo, estatisticas)
+
+def _secao(tabela, posicao):
+    inicio = tabela['inicio_dados'] + posicao[0]
+    return memoryview(tabela['mapa'])[inicio:inicio + posicao[1]]
+
+def _dicionario(tabela, coluna):
+    return json.loads(bytes(_secao(tabela, coluna['dicionario'])))
+
+# Valores de uma coluna sem dicionário ('texto'), como em _valores_como_texto: cada valor é o texto
+# entre o fim do anterior e o seu.
+def _textos_simples(tabela, coluna, intervalos):
+    fins = _secao(tabela, coluna['dados']).cast('Q')
+    texto = _secao(tabela, coluna['dicionario'])
+    for primeira, fim in intervalos or ((0, len(fins)),):
+        inicio = fins[primeira - 1] if primeira else 0
+        for final in fins[primeira:fim]:
+            yield str(texto[inicio:final], 'utf-8')
+            inicio = final
+
+# Valores de uma coluna como texto, pela ordem das linhas; com 'intervalos' (pares [primeira, fim) de
+# números de linha), só os dessas linhas.
+def _valores_como_texto(tabela, coluna, intervalos=None):
+    if coluna['tipo'] == 'texto':
+        return _textos_simples(tabela, coluna, intervalos)
+    dados = _secao(tabela, coluna['dados'])
+    if coluna['tipo'] == 'int':
+        dados, converter = dados.cast('q'), str
+    elif coluna['tipo'] == 'float':
+        dados, converter = dados.cast('d'), repr
+    else:
+        dados, converter = dados.cast('I'), _dicionario(tabela, coluna).__getitem__
+    if intervalos is None:
+        return map(converter, dados)
+    return itertools.chain.from_iterable(map(converter, dados[primeira:fim]) for primeira, fim in intervalos)
+
+# Devolve (tipo, dados, dicionario) da coluna 'nome', ou None se a tabela não a tem. 'dados' é uma
+# memoryview (sem cópia) dos valores pela ordem das linhas: inteiros 'q', reais 'd' ou, nas colunas de
+# texto, índices 'I' na lista 'dicionario' (None nas colunas numéricas). Nas colunas 'texto', 'dados' são
+# as posições 'Q' onde cada valor acaba e 'dicionario' os bytes dos valores. Se 'estatisticas' for um
+# dicionário, acumula em 'bytes_lidos' o tamanho das secções da coluna.
+def coluna(tabela, nome, estatisticas=None):
+    for info in tabela['cabecalho']['colunas']:
+        if info['nome'] == nome:
+            if estatisticas is not None:
+                lidos = info['dados'][1] + info['dicionario'][1]
+                estatisticas['bytes_lidos'] = estatisticas.get('bytes_lidos', 0) + lidos
+            dados = _secao(tabela, info['dados'])
+            if info['tipo'] == 'str':
+                return 'str', dados.cast('I'), _dicionario(tabela, info)
+            if info['tipo'] == 'texto':
+                return 'texto', dados.cast('Q'), _secao(tabela, info['dicionario'])
+            return info['tipo'], dados.cast('q' if info['tipo'] == 'int' else 'd'), None
+    return None
+
+# Gera os dicionários das linhas a partir dos valores de cada coluna (uma sequência por nome em 'nomes').
+# As linhas são montadas com map e zip, sem um ciclo em Python por linha.
+def montar_linhas(nomes, valores_das_colunas):
+    return map(dict, map(zip, itertools.repeat(nomes), zip(*valores_das_colunas)))
+
+# Gera as linhas da tabela como dicionários só com as 'colunas' pedidas (um conjunto de nomes; None para
+# todas), pela ordem do cabeçalho. Com 'intervalos' (pares [primeira, fim) de números de linha, por ordem),
+# só gera as linhas desses intervalos. Se 'estatisticas' for um dicionário, acumula em 'bytes_lidos' os
+# bytes das secções usadas.
+def linhas(tabela, colunas=None, estatisticas=None, intervalos=None):
+    cabecalho = tabela['cabecalho']
+    escolhidas = [coluna for coluna in cabecalho['colunas'] if colunas is None or coluna['nome'] in colunas]
+    if escolhidas:
+        valores = [_valores_como_texto(tabela, coluna, intervalos) for coluna in escolhidas]
+        geradas = montar_linhas([coluna['nome'] for coluna in escolhidas], valores)
+    else:
+        quantas = cabecalho['linhas'] if intervalos is None else sum(fim - primeira for primeira, fim in intervalos)
+        geradas = (dict() for _ in range(quantas))
+    if estatisticas is None:
+        yield from geradas
+        return
+    produzidas = 0
+    try:
+        for produzidas, linha in enumerate(geradas, 1):
+            yield linha
+    finally:
+        lidos = sum(
+            produzidas * _BYTES_POR_VALOR[coluna['tipo']] + coluna['dicionario'][1] for coluna in escolhidas
+        )
+        estatisticas['bytes_lidos'] = estatisticas.get('bytes_lidos', 0) + lidos
+
+# Apaga o ficheiro colunar (usado quando o CSV é reescrito).
+def invalidar(arquivo):
+    try:
+        os.remove(caminho_colunar(arquivo))
+    except FileNotFoundError:
+        pass
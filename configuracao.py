@@ -0,0 +1,74 @@
+# Parâmetros de configuração do interpretador.
+# Os módulos leem estes valores no momento em que precisam deles, por isso podem ser alterados
+# em tempo de execução (ex.: configuracao.CACHE_TABELAS_BYTES = 0 antes de executar uma consulta).
+
+# Memória máxima (aproximada, em bytes) ocupada pelas tabelas guardadas na cache de tabelas.
+# Quando é ultrapassada, as tabelas usadas há mais tempo são descartadas. 0 desativa a cache.
+CACHE_TABELAS_BYTES = 256 * 1024 * 1024
+
+# Número de processos usados para ler e filtrar uma tabela grande em paralelo num SELECT.
+# 1 (ou menos) desliga a leitura paralela.
+TRABALHADORES_PARALELOS = 1
+
+# Tamanho mínimo do ficheiro CSV (em bytes) para que a leitura paralela compense o custo de lançar os processos.
+LIMIAR_PARALELO_BYTES = 32 * 1024 * 1024
+
+# Grava a tabela de offsets das linhas de cada CSV em '<tabela>.csv.offsets', para ser reaproveitada
+# por outras execuções e processos em vez de ser recalculada.
+PERSISTIR_OFFSETS = True
+
+# Compactação automática do log de alterações ('<tabela>.csv.log', escrito por UPDATE e DELETE):
+# depois de uma escrita, a tabela é compactada (como num VACUUM) quando o log tem pelo menos
+# LOG_COMPACTACAO_MINIMO_BYTES e chega a LOG_COMPACTACAO_FRACAO do tamanho do CSV.
+LOG_COMPACTACAO_MINIMO_BYTES = 1024 * 1024
+LOG_COMPACTACAO_FRACAO = 0.5
+
+# Número máximo de instruções SQL já analisadas guardadas na cache de preparadas.py
+# (as usadas há mais tempo são descartadas). 0 desativa a cache.
+CACHE_INSTRUCOES = 256
+
+# No EXPLAIN ANALYZE, mede o pico de memória de cada etapa com tracemalloc. A medição torna a consulta
+# várias vezes mais lenta (e os tempos de cada etapa menos realistas); False mede só linhas, bytes e tempos.
+EXPLAIN_MEDIR_MEMORIA = True
+
+# Ficheiro colunar ('<tabela>.csv.colunas', ver colunar.py), usado pelas leituras em vez do CSV enquanto
+# corresponder à versão atual do ficheiro. É construído pelo comando ANALYZE tabela e também
+# automaticamente no fim do primeiro SELECT que lê até ao fim o CSV inteiro de uma tabela com pelo menos
+# estes bytes (0 desliga a construção automática); as leituras com LIMIT, índice ou mapa de zonas não o
+# constroem.
+COLUNAR_AUTOMATICO_BYTES = 8 * 1024 * 1024
+
+# Valores distintos que uma coluna de texto pode ter no dicionário do ficheiro colunar. Acima deste número,
+# ou se os dicionários da tabela passarem de MEMORIA_CONSULTA_BYTES durante a construção, a coluna é guardada
+# em texto simples, sem dicionário. 0 não limita o número (o limite de memória continua a valer).
+COLUNAR_MAXIMO_DISTINTOS = 100_000
+
+# Número de linhas distintas cujas chaves o SELECT DISTINCT guarda em memória; as seguintes são guardadas
+# numa base SQLite temporária em disco. 0 guarda todas em memória.
+DISTINCT_CHAVES_EM_MEMORIA = 1_000_000
+
+# Memória máxima (estimada, em bytes) para os resultados intermédios de um SELECT: as linhas do ORDER BY sem
+# LIMIT, os grupos do GROUP BY e as chaves do DISTINCT. Acima dela, a ordenação grava sequências ordenadas
+# em ficheiros temporários e junta-as no fim, o GROUP BY passa as linhas dos grupos novos para partições em
+# disco, agregadas uma de cada vez, e o DISTINCT guarda as chaves seguintes em disco (como acima de
+# DISTINCT_CHAVES_EM_MEMORIA). O hash join, a cache de tabelas, a leitura paralela e o motor NumPy não são
+# limitados por este valor. 0 não limita.
+MEMORIA_CONSULTA_BYTES = 256 * 1024 * 1024
+
+# Motor de execução dos SELECTs sem JOIN: 'linhas' avalia o WHERE e as agregações linha a linha;
+# 'numpy' usa o motor vetorizado de motor_numpy.py (as colunas do ficheiro colunar como vetores NumPy),
+# com os mesmos resultados. Sem o NumPy instalado, as consultas correm sempre no motor de linhas.
+MOTOR_EXECUCAO = 'linhas'
+
+# Numa leitura partilhada por vários SELECT de um lote (lote.py), cada SELECT guarda as suas linhas (ou os
+# seus grupos, no GROUP BY) até ser impresso. Um SELECT que passe deste número de linhas ou grupos desiste
+# da leitura partilhada e é executado sozinho no fim, para que a memória usada fique limitada.
+LOTE_MAXIMO_LINHAS_GUARDADAS = 100_000
+
+# Mapa de zonas ('<tabela>.csv.zonas', ver zonas.py): o mínimo, o máximo e quantos valores não são números
+# de cada coluna, em cada bloco de ZONAS_LINHAS_POR_BLOCO linhas do CSV. As leituras com comparações
+# numéricas no WHERE (ex.: valor > 3000) saltam os blocos que não as podem satisfazer. É construído pelo
+# ANALYZE e automaticamente na primeira leitura com uma dessas comparações de uma tabela com pelo menos
+# ZONAS_AUTOMATICAS_BYTES (0 desliga a construção automática); os INSERT acrescentam-lhe as novas linhas.
+ZONAS_LINHAS_POR_BLOCO = 8192
+ZONAS_AUTOMATICAS_BYTES = 8 * 1024 * 1024
@@ -0,0 +1,149 @@
+# API para obter os resultados das consultas em vez de os imprimir.
+#
+#     cursor = Cursor().execute("SELECT nome, idade FROM usuarios WHERE idade > ?", [20])
+#     cursor.colunas              # ['nome', 'idade']
+#     for nome, idade in cursor: ...
+#     cursor.fetchmany(100)       # lista com até 100 linhas
+#     cursor.escrever(sys.stdout, 'csv')   # ou 'tabela' / 'jsonl'
+#
+# As linhas são tuplos com os valores pela ordem das colunas e são produzidas à medida que são pedidas:
+# o SELECT é a mesma cadeia de geradores usada por executar(), por isso percorrer um resultado grande usa
+# tão pouca memória como imprimi-lo. 'description' segue o formato da DB-API (PEP 249): um tuplo de 7
+# elementos por coluna, em que só o nome é preenchido. As outras instruções (INSERT, UPDATE, EXPLAIN...)
+# são executadas como em executar() e imprimem as suas mensagens; o cursor fica sem linhas.
+#
+# Na linha de comandos, escreve o resultado de um SELECT no stdout, pronto para ser encaminhado:
+#     python cursor.py --formato csv "SELECT * FROM pedidos" > pedidos_copia.csv
+import argparse
+import itertools
+import sys
+
+import leitor_mmap
+import saida
+from executor import construir_select, executar, get_csv_path
+from operadores import preparar_agregacoes
+from preparadas import preparar
+
+# Colunas do resultado quando não há nenhuma linha de onde as tirar (com linhas, são as da primeira).
+def _colunas_previstas(consulta):
+    colunas_solicitadas = consulta['columns']
+    if consulta['group_by'] or any(isinstance(coluna, dict) for coluna in colunas_solicitadas):
+        nomes_agregacoes = [nome for nome, _, _, _ in preparar_agregacoes(colunas_solicitadas)]
+        return list(consulta['group_by'] or []) + nomes_agregacoes
+    if colunas_solicitadas[0] != '*':
+        return list(colunas_solicitadas)
+    colunas = leitor_mmap.ler_cabecalho(get_csv_path(consulta['table']))
+    if consulta['join']:
+        # Numa linha juntada as colunas da tabela secundária vêm primeiro.
+        colunas = leitor_mmap.ler_cabecalho(get_csv_path(consulta['join']['table'])) + colunas
+    return list(dict.fromkeys(colunas))
+
+class Cursor:
+    def __init__(self):
+        self.description = None
+        self.colunas = None
+        self.arraysize = 1
+        self._linhas = iter(())
+        self._varreduras = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *excecao):
+        self.close()
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        try:
+            return next(self._linhas)
+        except StopIteration:
+            self.close()
+            raise
+
+    # Executa uma instrução SQL, com os valores dos parâmetros '?' (sequência) ou ':nome' (dicionário).
+    # Os erros de sintaxe, de parâmetros e de leitura (ex.: tabela não encontrada) são lançados como exceções.
+    # Devolve o próprio cursor.
+    def execute(self, sql, parametros=()):
+        instrucao = preparar(sql)
+        if instrucao is None:
+            raise ValueError(f"erro de sintaxe na instrução: {sql}")
+        return self.executar_consulta(instrucao.ligar(parametros))
+
+    # Executa uma instrução já analisada (o dicionário do parser, com os parâmetros já ligados).
+    def executar_consulta(self, consulta):
+        self.close()
+        self.description = self.colunas = None
+        if consulta['type'] != 'select':
+            executar(consulta)
+            return self
+
+        varreduras = []
+        try:
+            linhas = construir_select(consulta, varreduras)
+            # A primeira linha é lida já, para os erros de leitura surgirem aqui e para saber as colunas.
+            primeira_linha = next(linhas, None)
+            colunas = list(primeira_linha.keys()) if primeira_linha is not None else _colunas_previstas(consulta)
+        except BaseException:
+            for varredura in varreduras:
+                varredura.close()
+            raise
+        if primeira_linha is not None:
+            self._linhas = saida.tuplos(itertools.chain([primeira_linha], linhas), colunas)
+        self._varreduras = varreduras
+        self.colunas = colunas
+        self.description = tuple((nome, None, None, None, None, None, None) for nome in colunas)
+        return self
+
+    def fetchone(self):
+        return next(self, None)
+
+    def fetchmany(self, tamanho=None):
+        if tamanho is None:
+            tamanho = self.arraysize
+        linhas = []
+        for linha in self:
+            linhas.append(linha)
+            if len(linhas) >= tamanho:
+                break
+        return linhas
+
+    def fetchall(self):
+        return list(self)
+
+    # Escreve as linhas que faltam ler no destino, no formato 'tabela', 'csv' ou 'jsonl' (ver saida.py).
+    # Devolve o número de linhas escritas.
+    def escrever(self, destino, formato='tabela'):
+        try:
+            return saida.FORMATOS[formato](destino, self.colunas or [], self)
+        finally:
+            self.close()
+
+    # Fecha as leituras das tabelas que ficaram a meio; as linhas que faltavam deixam de estar disponíveis.
+    def close(self):
+        for varredura in self._varreduras:
+            varredura.close()
+        self._varreduras = []
+        self._linhas = iter(())
+
+# Executa uma instrução e devolve o cursor com o resultado.
+def consultar(sql, parametros=()):
+    return Cursor().execute(sql, parametros)
+
+def main():
+    argumentos = argparse.ArgumentParser(description="Executa um SELECT e escreve o resultado no stdout.")
+    argumentos.add_argument('sql')
+    argumentos.add_argument('--formato', choices=sorted(saida.FORMATOS), default='tabela')
+    opcoes = argumentos.parse_args()
+    try:
+        with consultar(opcoes.sql) as cursor:
+            if cursor.colunas is not None:
+                cursor.escrever(sys.stdout, opcoes.formato)
+    except FileNotFoundError as e:
+        sys.exit(f"ERRO: Tabela não encontrada: {e.filename}")
+    except ValueError as e:
+        sys.exit(f"ERRO: {e}")
+
+if __name__ == '__main__':
+    main()
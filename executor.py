@@ -1,7 +1,25 @@
+import array
 import csv
+import io
 import os
 import re
-from collections import defaultdict
+import sys
+import itertools
+import operator
+import cache_tabelas
+import colunar
+import configuracao
+import explicar
+import indices
+import leitor_mmap
+import log_alteracoes
+import paralelo
+import saida
+import sequencias
+import zonas
+from operadores import (
+    agregar_hash, distinto_hash, escolher_lado_construcao, juntar_hash, ordenar_linhas, preparar_agregacoes
+)
 
 # Retorna o caminho completo para o arquivo CSV de uma tabela.
 def get_csv_path(table_name):
@@ -19,407 +37,966 @@ def executar(consulta):
             executar_update(consulta)
         elif tipo_consulta == 'delete':
             executar_delete(consulta)
+        elif tipo_consulta == 'create_index':
+            executar_create_index(consulta)
+        elif tipo_consulta == 'drop_index':
+            executar_drop_index(consulta)
+        elif tipo_consulta == 'copy':
+            executar_copy(consulta)
+        elif tipo_consulta == 'vacuum':
+            executar_vacuum(consulta)
+        elif tipo_consulta == 'explain':
+            executar_explain(consulta)
+        elif tipo_consulta == 'analyze':
+            executar_analyze(consulta)
     except Exception as e:
         print(f'ERRO: Ocorreu um erro inesperado durante a execução: {e}')
 
-# Executa SELECT com JOINs, WHERE, GROUP BY, agregações...
-def executar_select(consulta):
-    try:
-        # ETAPA 1: CARREGAMENTO DE DADOS E JOIN
-        tabela_principal_nome = consulta['table']
-        info_join = consulta['join']
-
-        with open(get_csv_path(tabela_principal_nome), mode='r', encoding='utf-8') as f:
-            dados_tabela_principal = list(csv.DictReader(f))
-
-        fonte_dados = dados_tabela_principal
-
-        if info_join:
-            tipo_join = info_join.get('type', 'INNER')
-                        
-            tabela_secundaria_nome = info_join['table']
-            
-            with open(get_csv_path(tabela_secundaria_nome), mode='r', encoding='utf-8') as f:
-                dados_tabela_secundaria = list(csv.DictReader(f))
-
-            col_esquerda, col_direita = info_join['on']['left'], info_join['on']['right']
-            dados_juntados = []
-
-            if tipo_join == 'INNER':
-                for linha_esq in dados_tabela_principal:
-                    for linha_dir in dados_tabela_secundaria:
-                        if linha_esq.get(col_esquerda) == linha_dir.get(col_direita):
-                            dados_juntados.append({**linha_dir, **linha_esq})
-            
-            elif tipo_join == 'LEFT':
-                if dados_tabela_secundaria:
-                    cabecalhos_direita = dados_tabela_secundaria[0].keys()
-                else:
-                    cabecalhos_direita = []
-                for linha_esq in dados_tabela_principal:
-                    encontrou_par = False
-                    for linha_dir in dados_tabela_secundaria:
-                        if linha_esq.get(col_esquerda) == linha_dir.get(col_direita):
-                            dados_juntados.append({**linha_dir, **linha_esq})
-                            encontrou_par = True
-                    if not encontrou_par:
-                        linha_preenchida = {}
-                        for cabecalho in cabecalhos_direita:
-                            linha_preenchida[cabecalho] = ''
-                        dados_juntados.append({**linha_preenchida, **linha_esq})
-            
-            fonte_dados = dados_juntados
-
-        # ETAPA 2: FILTRAGEM COM WHERE
-        condicao_where = consulta['where']
-        dados_filtrados = []
-
-        for linha in fonte_dados:
-            if condicao_where is None or verifica_condicao(linha, condicao_where):
-                dados_filtrados.append(linha)
-                
-        if not dados_filtrados:
-            print("Nenhum resultado encontrado.")
+# Percorre as linhas de uma tabela uma a uma, sem a carregar toda para a memória.
+# Se for passada a condição WHERE e houver um índice que a sirva, só são lidas as linhas candidatas
+# (a condição continua a ter de ser aplicada a elas). Senão, se houver um ficheiro colunar atualizado
+# (colunar.py), as linhas vêm dele; se a tabela estiver (ou couber) na cache de tabelas, vêm da cache;
+# caso contrário são lidas do ficheiro mapeado em memória.
+# 'colunas' é o conjunto de colunas de que a consulta precisa (None para todas): as linhas só trazem
+# essas, exceto as lidas através de um índice e as alteradas pelo log, que vêm completas.
+# Se for passado um dicionário em 'leitura', regista nele a fonte usada e os bytes lidos do CSV.
+def varrer_tabela(nome_tabela, condicao=None, leitura=None, colunas=None):
+    for _, linha in varrer_numeradas(nome_tabela, condicao, leitura, colunas, construir_colunar=True):
+        yield linha
+
+# Como varrer_tabela, mas devolve pares (numero, linha), onde numero é a posição da linha no CSV base.
+# As alterações pendentes no log da tabela (UPDATE, DELETE) são aplicadas às linhas lidas.
+# Com 'construir_colunar' (as leituras do SELECT), uma leitura que percorre o CSV inteiro até ao fim
+# constrói depois o ficheiro colunar, se a tabela for grande o suficiente (colunar.construir_depois_de_ler).
+def varrer_numeradas(nome_tabela, condicao=None, leitura=None, colunas=None, construir_colunar=False):
+    arquivo = get_csv_path(nome_tabela)
+    alteracoes = log_alteracoes.carregar(arquivo)
+    if condicao is not None:
+        offsets = indices.procurar(arquivo, condicao)
+        if offsets is not None:
+            if leitura is not None:
+                leitura.update(fonte='índice', linhas_candidatas=len(offsets), bytes_lidos=0)
+            linhas = zip(leitor_mmap.numeros_das_linhas(arquivo, offsets),
+                         leitor_mmap.ler_linhas_nos_offsets(arquivo, offsets, leitura))
+            yield from log_alteracoes.aplicar(linhas, alteracoes)
             return
+    # Sem índice, o mapa de zonas pode deixar saltar os blocos de linhas que não satisfazem a condição.
+    intervalos = intervalos_linhas = None
+    blocos = zonas.blocos_a_ler(arquivo, condicao, alteracoes)
+    if blocos is not None:
+        intervalos, total_blocos, blocos_saltados = blocos
+        intervalos_linhas = [(primeira, fim) for primeira, fim, _, _ in intervalos]
+        if leitura is not None:
+            leitura.update(blocos=total_blocos, blocos_saltados=blocos_saltados)
+    tabela_colunar = colunar.abrir(arquivo, leitura)
+    if tabela_colunar is not None:
+        if leitura is not None:
+            leitura['fonte'] = 'colunar'
+        linhas = _numerar(colunar.linhas(tabela_colunar, colunas, leitura, intervalos_linhas), intervalos_linhas)
+        yield from log_alteracoes.aplicar(linhas, alteracoes)
+        return
+    tabela = cache_tabelas.obter_tabela(arquivo)
+    if leitura is not None:
+        leitura['fonte'] = 'cache' if tabela is not None else 'mmap'
+        leitura['bytes_lidos'] = leitura.get('bytes_lidos', 0)
+    if tabela is not None:
+        linhas = cache_tabelas.linhas_da_tabela(tabela, colunas, intervalos_linhas)
+    elif intervalos is None and cache_tabelas.pode_guardar(arquivo):
+        # Leitura completa de uma tabela que cabe na cache: é guardada enquanto é lida e só fica na cache
+        # se a leitura chegar ao fim (as leituras pelo mapa de zonas não a guardam).
+        if leitura is not None:
+            leitura['fonte'] = 'cache'
+        linhas = cache_tabelas.ler_e_guardar(arquivo, colunas, leitura)
+    elif intervalos is not None:
+        linhas = itertools.chain.from_iterable(
+            leitor_mmap.varrer(arquivo, inicio, fim_bytes, leitura, colunas) for _, _, inicio, fim_bytes in intervalos
+        )
+    else:
+        linhas = leitor_mmap.varrer(arquivo, estatisticas=leitura, colunas=colunas)
+    yield from log_alteracoes.aplicar(_numerar(linhas, intervalos_linhas), alteracoes)
+    if construir_colunar and intervalos is None:
+        colunar.construir_depois_de_ler(arquivo, leitura)
+
+# Junta às linhas o seu número no CSV base: a posição, ou, se só foram lidos os 'intervalos' de linhas
+# (pares [primeira, fim)), os números desses intervalos.
+def _numerar(linhas, intervalos):
+    if intervalos is None:
+        return enumerate(linhas)
+    return zip(itertools.chain.from_iterable(itertools.starmap(range, intervalos)), linhas)
+
+# Prevê, sem ler a tabela, a fonte que varrer_tabela vai usar (para o EXPLAIN).
+def _prever_leitura(arquivo, condicao):
+    # Os índices e o mapa de zonas só entram na previsão se já estiverem atualizados (o EXPLAIN não os
+    # reconstrói).
+    if condicao is not None:
+        offsets = indices.procurar(arquivo, condicao, construir=False)
+        if offsets is not None:
+            return {'fonte': 'índice', 'linhas_candidatas': len(offsets)}
+    leitura = {}
+    blocos = zonas.blocos_a_ler(arquivo, condicao, log_alteracoes.carregar(arquivo), construir=False)
+    if blocos is not None:
+        leitura.update(blocos=blocos[1], blocos_saltados=blocos[2])
+    if colunar.disponivel(arquivo):
+        leitura['fonte'] = 'colunar'
+    elif cache_tabelas.em_cache(arquivo) or (blocos is None and cache_tabelas.pode_guardar(arquivo)):
+        leitura['fonte'] = 'cache'
+    else:
+        leitura['fonte'] = 'mmap'
+    return leitura
+
+# Indica se um SELECT sem JOIN sobre 'arquivo' pode correr no motor vetorizado (ver motor_numpy.py).
+# O módulo só é importado quando o motor está escolhido, porque importar o NumPy é demorado.
+def _motor_numpy_aplicavel(arquivo):
+    import motor_numpy
+    return motor_numpy.aplicavel(arquivo)
+
+# Descrição da leitura de uma tabela para o plano; no EXPLAIN (sem execução) a fonte é prevista.
+def _leitura_para_plano(analise, arquivo, condicao):
+    if analise is None:
+        return None
+    if analise.executar:
+        return {}
+    return _prever_leitura(arquivo, condicao)
+
+# Regista uma etapa do SELECT na análise do EXPLAIN (se houver); sem análise devolve as linhas tal como estão.
+def _etapa(analise, descricao, linhas, entradas=(), leitura=None):
+    if analise is None:
+        return linhas
+    return analise.etapa(descricao, linhas, entradas, leitura)
+
+# Adia a chamada de uma etapa que consome as linhas todas logo que é chamada (agregação, ordenação)
+# até ser pedida a primeira linha, para que o trabalho aconteça dentro da etapa medida e o EXPLAIN
+# sem execução não leia nada.
+def _adiar(funcao, *argumentos):
+    yield from funcao(*argumentos)
+
+def executar_explain(consulta):
+    analise = explicar.Analise(executar=consulta['analyze'])
+    if executar_select(consulta['query'], analise=analise):
+        explicar.imprimir_plano(analise)
+
+# Executa SELECT com JOINs, WHERE, GROUP BY, agregações... e imprime o resultado.
+# Se for passado um dicionário em 'estatisticas', regista nele as decisões tomadas (ex.: lado do hash join).
+# Com uma 'analise' (EXPLAIN), cada etapa é registada na árvore do plano; o resultado não é impresso e,
+# no EXPLAIN ANALYZE, as linhas são consumidas para medir cada etapa. Devolve True se não houve erros.
+def executar_select(consulta, estatisticas=None, analise=None, linhas_calculadas=None):
+    varreduras = []
+    try:
+        linhas = construir_select(consulta, varreduras, estatisticas, analise, linhas_calculadas)
 
-        # ETAPA 3: AGRUPAMENTO (GROUP BY) E AGREGAÇÃO (SUM, COUNT, etc.)
-        colunas_solicitadas = consulta['columns']
-        colunas_group_by = consulta['group_by']
-        funcao_agregacao = False        
-        for coluna in colunas_solicitadas:
-            if isinstance(coluna, dict):
-                funcao_agregacao = True
-                break
-        
-        is_consulta_agregada = funcao_agregacao or colunas_group_by
-        dados_processados = []
+        # ETAPA 5: IMPRESSÃO DO RESULTADO
+        if analise is None:
+            imprimir_resultado(linhas, None)
+        elif analise.executar:
+            analise.consumir(linhas)
+        return True
 
+    except FileNotFoundError as e:
+        print(f"ERRO: Tabela não encontrada: {e.filename}")
+    except Exception as e:
+        print(f"ERRO: Ocorreu um erro inesperado ao executar a consulta: {e}")
+    finally:
+        # Fecha os ficheiros que ficaram por ler (ex.: quando o LIMIT foi atingido).
+        for varredura in varreduras:
+            varredura.close()
+
+# Monta o SELECT como uma cadeia de geradores (leitura -> filtro -> projeção -> limite) e devolve o último,
+# que produz as linhas do resultado como dicionários. Nada é lido antes de ser pedida a primeira linha, e só
+# as etapas que precisam de todas as linhas (agregação, ORDER BY) as guardam em memória. As leituras de
+# tabelas abertas são acrescentadas a 'varreduras', que quem chamou tem de fechar no fim.
+# Os erros (ex.: tabela não encontrada) não são tratados aqui: surgem ao montar ou ao ler as linhas.
+# Com 'linhas_calculadas', as etapas 1 a 3 já foram feitas por quem chamou (ex.: numa leitura partilhada por
+# várias consultas, ver lote.py): são as linhas filtradas e projetadas ou agregadas, e só falta a etapa 4.
+def construir_select(consulta, varreduras, estatisticas=None, analise=None, linhas_calculadas=None):
+    tabela_principal_nome = consulta['table']
+    info_join = consulta['join']
+    condicao_where = consulta['where']
+    colunas_solicitadas = consulta['columns']
+    colunas_group_by = consulta['group_by']
+    funcao_agregacao = False
+    for coluna in colunas_solicitadas:
+        if isinstance(coluna, dict):
+            funcao_agregacao = True
+            break
+    is_consulta_agregada = funcao_agregacao or colunas_group_by
+
+    arquivo_principal = get_csv_path(tabela_principal_nome)
+    # No EXPLAIN sem execução os índices só são consultados, nunca reconstruídos (ver _prever_leitura).
+    so_prever = analise is not None and not analise.executar
+    vetorizar = (linhas_calculadas is None and not info_join and configuracao.MOTOR_EXECUCAO == 'numpy'
+                 and _motor_numpy_aplicavel(arquivo_principal))
+    if linhas_calculadas is not None:
+        linhas = linhas_calculadas
+    # A leitura colunar (se o ficheiro colunar já existe) dispensa a leitura paralela do CSV.
+    elif (not info_join and not vetorizar and paralelo.deve_paralelizar(arquivo_principal)
+            and indices.procurar(arquivo_principal, condicao_where, construir=not so_prever) is None
+            and not colunar.disponivel(arquivo_principal)):
+        # ETAPAS 1 A 3 EM PARALELO: cada processo lê uma parte do ficheiro, filtra e projeta/agrega.
         if is_consulta_agregada:
-            grupos = defaultdict(list)
-            if colunas_group_by:
-                for linha in dados_filtrados:
-                    valores_da_chave = []
-                    for nome_da_coluna in colunas_group_by:
-                        valor_da_celula = linha.get(nome_da_coluna, '')
-                        valor_limpo = valor_da_celula.strip() # Limpa espaços em branco
-                        valores_da_chave.append(valor_limpo)
-
-                    chave_grupo = tuple(valores_da_chave)
-                    grupos[chave_grupo].append(linha)
-            else:
-                grupos['__grupo_unico__'] = dados_filtrados
-
-            for chave, linhas_do_grupo in grupos.items():
-                linha_agregada = {}
+            agregacoes, nomes_colunas_finais = agregacoes_da_consulta(consulta), None
+        else:
+            agregacoes = None
+            nomes_colunas_finais = colunas_solicitadas if colunas_solicitadas[0] != '*' else None
+        linhas = paralelo.varrer_paralelo(
+            arquivo_principal, condicao_where, nomes_colunas_finais, colunas_group_by, agregacoes
+        )
+        varreduras.append(linhas)
+        if estatisticas is not None:
+            estatisticas['trabalhadores_paralelos'] = configuracao.TRABALHADORES_PARALELOS
+        if analise is not None:
+            trabalho = [_descrever_projecao(colunas_solicitadas, colunas_group_by, is_consulta_agregada)]
+            if condicao_where is not None:
+                trabalho.insert(0, f"filtro: {explicar.condicao_em_texto(condicao_where)}")
+            linhas = _etapa(
+                analise,
+                f"Leitura paralela de {tabela_principal_nome} "
+                f"({configuracao.TRABALHADORES_PARALELOS} processos; {'; '.join(trabalho)})",
+                linhas, leitura={'fonte': 'mmap', 'bytes_lidos': os.path.getsize(arquivo_principal)}
+            )
+    else:
+        plano = consulta.get('plano')
+        colunas = plano['colunas'] if plano is not None else colunas_referenciadas(consulta)
+        if vetorizar:
+            # ETAPAS 1 E 2 (E 3, NAS AGREGAÇÕES) VETORIZADAS: ver motor_numpy.py. Se a consulta não puder
+            # ser vetorizada, as linhas vêm do motor de linhas (sem etapas próprias no plano do EXPLAIN).
+            import motor_numpy
+            leitura = None
+            if analise is not None:
+                leitura = {} if analise.executar else {'fonte': 'colunar (NumPy)'}
+            alternativa = lambda: _ler_e_filtrar(consulta, colunas, varreduras)
+            trabalho = ['NumPy']
+            if condicao_where is not None:
+                trabalho.append(f"filtro: {explicar.condicao_em_texto(condicao_where)}")
+            if is_consulta_agregada:
+                agregacoes = agregacoes_da_consulta(consulta)
+                linhas = motor_numpy.agregar(
+                    arquivo_principal, condicao_where, colunas_group_by, agregacoes,
+                    lambda: agregar_resultado(alternativa(), colunas_solicitadas, colunas_group_by, agregacoes),
+                    leitura
+                )
                 if colunas_group_by:
-                    for i, nome_coluna in enumerate(colunas_group_by):
-                        linha_agregada[nome_coluna] = chave[i]
-                
-                for info_coluna in colunas_solicitadas:
-                    if isinstance(info_coluna, dict) and 'aggregate' in info_coluna:
-                        funcao, coluna_alvo = info_coluna['aggregate'], info_coluna['column']
-                        nome_coluna_resultado = f"{funcao}({coluna_alvo})"
-                        
-                        if funcao == 'COUNT':
-                            if coluna_alvo == '*':
-                                # COUNT(*)  
-                                # Conta o numero total de linhas que pertencem a este grupo
-                                contagem_total = len(linhas_do_grupo)
-                                linha_agregada[nome_coluna_resultado] = contagem_total
-
-                            else:
-                                # COUNT(nome_da_coluna) 
-                                # Contar apenas as linhas onde essa coluna tem um valor
-                                contador_de_valores_nao_nulos = 0
-
-                                for linha in linhas_do_grupo:
-                                    if linha.get(coluna_alvo):
-                                        contador_de_valores_nao_nulos += 1
-                                        
-                                linha_agregada[nome_coluna_resultado] = contador_de_valores_nao_nulos
-                                
-                        elif funcao in ['SUM', 'AVG']:
-                            valores_numericos = []
-                            for linha in linhas_do_grupo:
-                                
-                                # Verifica se a coluna existe
-                                if linha.get(coluna_alvo):
-                                    
-                                    # Pegamos o valor da coluna
-                                    valor_da_celula = linha[coluna_alvo]
-                                    
-                                    # Tenta converter para float
-                                    try:
-                                        valor_convertido = float(valor_da_celula)
-                                        valores_numericos.append(valor_convertido)
-                                        
-                                    except (ValueError, TypeError):
-                                        continue
-                                    
-                            if funcao == 'SUM':
-                                linha_agregada[nome_coluna_resultado] = sum(valores_numericos)
-                            elif funcao == 'AVG':
-                                if valores_numericos:
-                                    linha_agregada[nome_coluna_resultado] = sum(valores_numericos) / len(valores_numericos)
-                                else:
-                                    linha_agregada[nome_coluna_resultado] = 0
-                                
-                dados_processados.append(linha_agregada)
+                    trabalho.append(f"GROUP BY {', '.join(colunas_group_by)}")
+                trabalho.append(', '.join(nome for nome, _, _, _ in agregacoes))
+            else:
+                linhas = motor_numpy.filtrar(arquivo_principal, condicao_where, colunas, alternativa, leitura)
+            varreduras.append(linhas)
+            linhas = _etapa(
+                analise, f"Execução vetorizada em {tabela_principal_nome} ({'; '.join(trabalho)})", linhas,
+                leitura=leitura
+            )
         else:
-            if colunas_solicitadas[0] != '*':
-                nomes_colunas_finais = colunas_solicitadas
-                
+            linhas = _ler_e_filtrar(consulta, colunas, varreduras, estatisticas, analise)
+
+        # ETAPA 3: AGRUPAMENTO (GROUP BY) E AGREGAÇÃO (SUM, COUNT, etc.) OU PROJEÇÃO
+        # Com SELECT *, as colunas do resultado são as da primeira linha.
+        if not (vetorizar and is_consulta_agregada):
+            entrada = linhas
+            if is_consulta_agregada:
+                linhas = _adiar(agregar_resultado, linhas, colunas_solicitadas, colunas_group_by,
+                                agregacoes_da_consulta(consulta))
             else:
-                nomes_colunas_finais = list(dados_filtrados[0].keys())
-            for linha in dados_filtrados:
-                linha_de_resultado = {}
-                for nome_da_coluna in nomes_colunas_finais:
-                    valor_da_coluna = linha.get(nome_da_coluna)
-                    linha_de_resultado[nome_da_coluna] = valor_da_coluna
-
-                dados_processados.append(linha_de_resultado)
-
-        # ETAPA 4: PROCESSAMENTO FINAL (DISTINCT, ORDER BY, LIMIT)
-        dados_finais = dados_processados
-        if consulta.get('distinct'):
-            vistos, resultado_distinto = set(), []
-            for d in dados_finais:
-                tupla_ordenada = tuple(sorted(d.items()))
-                if tupla_ordenada not in vistos:
-                    vistos.add(tupla_ordenada)
-                    resultado_distinto.append(d)
-            dados_finais = resultado_distinto
-
-        if consulta.get('order_by'):
-            dados_finais = ordenar_resultado(dados_finais, consulta['order_by'])
-        
+                nomes_colunas_finais = colunas_solicitadas if colunas_solicitadas[0] != '*' else None
+                linhas = projetar_linhas(linhas, nomes_colunas_finais)
+            descricao = _descrever_projecao(colunas_solicitadas, colunas_group_by, is_consulta_agregada)
+            linhas = _etapa(analise, descricao[0].upper() + descricao[1:], linhas, (entrada,))
+
+    # ETAPA 4: PROCESSAMENTO FINAL (DISTINCT, ORDER BY, LIMIT)
+    if consulta.get('distinct'):
+        entrada = linhas
+        linhas = _etapa(analise, "DISTINCT (hash)", remover_duplicados(linhas), (entrada,))
+
+    # Com ORDER BY e LIMIT só as primeiras 'limit' linhas são guardadas (top-K).
+    entrada = linhas
+    if consulta.get('order_by'):
+        ordem = ', '.join(f"{item['column']} {item['direction']}" for item in consulta['order_by'])
         if consulta.get('limit') is not None:
-            dados_finais = dados_finais[:consulta['limit']]
+            descricao = f"Ordenação top-K (ORDER BY {ordem}; LIMIT {consulta['limit']})"
+        else:
+            descricao = f"Ordenação (ORDER BY {ordem})"
+        linhas = _adiar(ordenar_resultado, linhas, consulta['order_by'], consulta.get('limit'))
+        linhas = _etapa(analise, descricao, linhas, (entrada,))
+    elif consulta.get('limit') is not None:
+        linhas = itertools.islice(linhas, consulta['limit'])
+        linhas = _etapa(analise, f"LIMIT {consulta['limit']}", linhas, (entrada,))
+    return linhas
+
+# Etapas 1 e 2 do SELECT no motor de linhas: leitura das tabelas (com o JOIN) e filtragem com o WHERE.
+# Devolve as linhas filtradas, com as 'colunas' lidas de cada tabela (None para todas).
+# Num JOIN, as partes do WHERE que só dependem de uma das tabelas são aplicadas na leitura dessa tabela
+# (ver dividir_condicao), para que o JOIN receba e construa menos linhas.
+def _ler_e_filtrar(consulta, colunas, varreduras, estatisticas=None, analise=None):
+    tabela_principal_nome = consulta['table']
+    info_join = consulta['join']
+    condicao_where = consulta['where']
+    arquivo_principal = get_csv_path(tabela_principal_nome)
+    condicao_principal, condicao_secundaria = condicao_where, None
+    falhas = None
+    if info_join:
+        falhas = []
+        tipo_join = info_join.get('type', 'INNER')
+        tabela_secundaria_nome = info_join['table']
+        arquivo_secundario = get_csv_path(tabela_secundaria_nome)
+        condicao_principal, condicao_secundaria, condicao_where = dividir_condicao(
+            condicao_where, leitor_mmap.ler_cabecalho(arquivo_principal),
+            leitor_mmap.ler_cabecalho(arquivo_secundario), tipo_join
+        )
+
+    # ETAPA 1: LEITURA DOS DADOS E JOIN
+    # A tabela principal pode usar os seus índices para a sua parte da condição WHERE: numa linha
+    # juntada, as colunas da tabela principal têm sempre o valor da linha original.
+    linhas = _ler_tabela(
+        tabela_principal_nome, arquivo_principal, condicao_principal, colunas, varreduras, analise, falhas,
+        None if info_join else filtro_da_consulta(consulta)
+    )
+
+    if info_join:
+        linhas_secundarias = _ler_tabela(
+            tabela_secundaria_nome, arquivo_secundario, condicao_secundaria, colunas, varreduras, analise, falhas
+        )
+
+        # O lado da tabela hash é escolhido pelo tamanho dos ficheiros, sem ler as tabelas.
+        lado_construcao = escolher_lado_construcao(
+            os.path.getsize(arquivo_principal),
+            os.path.getsize(arquivo_secundario)
+        )
+        col_esquerda, col_direita = info_join['on']['left'], info_join['on']['right']
+        entradas = (linhas, linhas_secundarias)
+        lado_construcao, linhas = juntar_hash(
+            linhas, linhas_secundarias,
+            col_esquerda, col_direita, tipo_join, lado_construcao
+        )
+        if estatisticas is not None:
+            estatisticas['join_construcao'] = lado_construcao
+        linhas = _etapa(
+            analise,
+            f"Hash join {tipo_join} ({col_esquerda} = {col_direita}; tabela hash: {lado_construcao})",
+            linhas, entradas
+        )
+
+    # ETAPA 2: FILTRAGEM COM WHERE (o que não foi aplicado na leitura das tabelas)
+    if not info_join:
+        return linhas
+    filtro = _filtro_depois_do_join(condicao_where, consulta['where'], falhas)
+    if filtro is None:
+        return linhas
+    return _filtrar(linhas, filtro, condicao_where, analise)
+
+# Lê uma tabela do SELECT (usando os índices da 'condicao', se houver) e aplica-lhe a condição.
+# Com uma lista em 'falhas' (leitura de uma tabela de um JOIN), a condição é aplicada com
+# _filtro_antecipado. O 'filtro' da condição pode ser passado já compilado.
+def _ler_tabela(nome_tabela, arquivo, condicao, colunas, varreduras, analise, falhas=None, filtro=None):
+    leitura = _leitura_para_plano(analise, arquivo, condicao)
+    linhas = varrer_tabela(nome_tabela, condicao, leitura, colunas)
+    varreduras.append(linhas)
+    linhas = _etapa(analise, f"Leitura de {nome_tabela}", linhas, leitura=leitura)
+    if condicao is None:
+        return linhas
+    if filtro is None:
+        filtro = compilar_condicao(condicao) if falhas is None else _filtro_antecipado(condicao, falhas)
+    return _filtrar(linhas, filtro, condicao, analise)
+
+def _filtrar(linhas, filtro, condicao, analise):
+    entrada = linhas
+    linhas = filter(filtro, linhas)
+    if condicao is None:
+        return linhas
+    return _etapa(analise, f"Filtro: {explicar.condicao_em_texto(condicao)}", linhas, (entrada,))
+
+# Filtro de uma parte do WHERE aplicada na leitura de uma tabela do JOIN. Essa leitura também vê linhas
+# que não teriam par no JOIN: se a condição falhar numa linha (ex.: ao comparar texto com um número),
+# a linha não é descartada e fica registado em 'falhas' que o WHERE tem de voltar a ser avaliado
+# depois do JOIN, onde o erro só surge se a linha tiver par, como sem a divisão da condição.
+def _filtro_antecipado(condicao, falhas):
+    avaliar = compilar_condicao(condicao)
+    def filtro(linha):
+        try:
+            return avaliar(linha)
+        except Exception:
+            falhas.append(linha)
+            return True
+    return filtro
+
+# Filtro das linhas juntadas: a parte 'restante' do WHERE ou, se a avaliação antecipada de alguma linha
+# falhou, a condição 'completa'. As duas leituras terminam (ou chegam à linha em causa) antes de
+# o JOIN produzir as linhas juntadas com ela, por isso 'falhas' já está preenchida quando elas chegam
+# aqui. Devolve None se não há nada a filtrar.
+def _filtro_depois_do_join(restante, completa, falhas):
+    if completa is None:
+        return None
+    avaliar_completa = compilar_condicao(completa)
+    avaliar_restante = compilar_condicao(restante) if restante is not None else None
+    def filtro(linha):
+        if falhas:
+            return avaliar_completa(linha)
+        return avaliar_restante is None or avaliar_restante(linha)
+    return filtro
+
+# Divide a condição WHERE de um JOIN pelas tabelas de que cada parte depende. A condição é partida nas
+# partes ligadas por AND (cada uma pode ser qualquer condição, ex.: um OR) e cada parte vai para:
+#   - a tabela principal, se todas as suas colunas forem da principal (ou de nenhuma das tabelas): numa
+#     linha juntada, essas colunas têm o valor da linha da principal, que se sobrepõe ao da secundária;
+#   - a tabela secundária, se todas as suas colunas só existirem na secundária e o JOIN for INNER (no
+#     LEFT JOIN, as linhas da principal sem par têm de continuar a ser filtradas depois do JOIN);
+#   - o filtro depois do JOIN, nos outros casos.
+# Devolve (condicao_principal, condicao_secundaria, condicao_restante); cada uma é None se ficar vazia.
+def dividir_condicao(condicao, colunas_principal, colunas_secundaria, tipo_join='INNER'):
+    if condicao is None:
+        return None, None, None
+    so_secundaria = set(colunas_secundaria) - set(colunas_principal)
+    partes = ([], [], [])
+    for parte in _partes_do_and(condicao):
+        colunas = _colunas_da_condicao(parte)
+        if not colunas & so_secundaria:
+            partes[0].append(parte)
+        elif colunas <= so_secundaria and tipo_join == 'INNER':
+            partes[1].append(parte)
+        else:
+            partes[2].append(parte)
+    return tuple(_juntar_com_and(lista) for lista in partes)
+
+def _partes_do_and(condicao):
+    if condicao['operator'] == 'AND':
+        return _partes_do_and(condicao['left']) + _partes_do_and(condicao['right'])
+    return [condicao]
+
+def _juntar_com_and(partes):
+    if not partes:
+        return None
+    condicao = partes[0]
+    for parte in partes[1:]:
+        condicao = {'operator': 'AND', 'left': condicao, 'right': parte}
+    return condicao
+
+# Devolve o conjunto das colunas usadas por uma condição WHERE.
+def _colunas_da_condicao(condicao):
+    colunas = set()
+    condicoes = [condicao]
+    while condicoes:
+        cond = condicoes.pop()
+        if cond['operator'] in ('AND', 'OR'):
+            condicoes.extend((cond['left'], cond['right']))
+        elif cond['operator'] == 'NOT':
+            condicoes.append(cond['condition'])
+        else:
+            colunas.add(cond['column'])
+    return colunas
+
+# Devolve o conjunto das colunas usadas pelo SELECT (na lista de colunas, agregações, JOIN, WHERE,
+# GROUP BY e ORDER BY), ou None se a consulta usa todas (SELECT *). As colunas não têm o nome da
+# tabela, por isso num JOIN o mesmo conjunto serve para as duas tabelas.
+def colunas_referenciadas(consulta):
+    colunas = set()
+    for coluna in consulta['columns']:
+        if coluna == '*':
+            return None
+        if isinstance(coluna, dict):
+            if coluna['column'] != '*':
+                colunas.add(coluna['column'])
+        else:
+            colunas.add(coluna)
+    if consulta['join']:
+        colunas.update((consulta['join']['on']['left'], consulta['join']['on']['right']))
+    if consulta['where']:
+        colunas.update(_colunas_da_condicao(consulta['where']))
+    colunas.update(consulta['group_by'] or ())
+    colunas.update(item['column'] for item in consulta.get('order_by') or ())
+    return colunas
+
+# Plano de uma instrução preparada (ver preparadas.py): o que o executor calcula a partir da árvore e não
+# depende dos valores dos parâmetros é calculado aqui uma só vez. Devolve uma função que recebe os valores
+# ({posição do parâmetro: valor}) e devolve o plano com eles, que preparadas.py guarda na chave 'plano'
+# da árvore ligada:
+#   'filtro': o WHERE compilado (None sem WHERE);
+#   'colunas' e 'agregacoes' (só no SELECT): colunas_referenciadas e preparar_agregacoes da consulta.
+# Devolve None para as instruções sem plano.
+def preparar_plano(consulta):
+    if consulta['type'] not in ('select', 'update', 'delete'):
+        return None
+    ligar_filtro = preparar_condicao(consulta['where']) if consulta['where'] is not None else None
+    fixo = {}
+    if consulta['type'] == 'select':
+        fixo['colunas'] = colunas_referenciadas(consulta)
+        fixo['agregacoes'] = preparar_agregacoes(consulta['columns'])
+    def ligar(valores):
+        return dict(fixo, filtro=ligar_filtro(valores) if ligar_filtro is not None else None)
+    return ligar
+
+# Filtro do WHERE de uma consulta: o do plano, se a consulta foi preparada, ou compilado agora.
+def filtro_da_consulta(consulta):
+    plano = consulta.get('plano')
+    if plano is not None:
+        return plano['filtro']
+    return compilar_condicao(consulta['where']) if consulta['where'] is not None else None
+
+# Descreve a etapa de projeção ou agregação para o plano do EXPLAIN.
+def _descrever_projecao(colunas_solicitadas, colunas_group_by, is_consulta_agregada):
+    if not is_consulta_agregada:
+        return f"projeção: {', '.join(colunas_solicitadas)}"
+    funcoes = ', '.join(nome for nome, _, _, _ in preparar_agregacoes(colunas_solicitadas))
+    if colunas_group_by:
+        return f"agregação hash (GROUP BY {', '.join(colunas_group_by)}; {funcoes})"
+    return f"agregação ({funcoes})"
+
+# Mantém apenas as colunas pedidas, linha a linha.
+# Se nomes_colunas_finais for None (SELECT *), usa as colunas da primeira linha.
+def projetar_linhas(linhas, nomes_colunas_finais):
+    for linha in linhas:
+        if nomes_colunas_finais is None:
+            nomes_colunas_finais = list(linha.keys())
+        linha_de_resultado = {}
+        for nome_da_coluna in nomes_colunas_finais:
+            valor_da_coluna = linha.get(nome_da_coluna)
+            linha_de_resultado[nome_da_coluna] = valor_da_coluna
+        yield linha_de_resultado
+
+# Elimina linhas repetidas, mantendo a primeira ocorrência de cada uma (ver operadores.distinto_hash).
+def remover_duplicados(linhas):
+    return distinto_hash(linhas, configuracao.DISTINCT_CHAVES_EM_MEMORIA or None,
+                         configuracao.MEMORIA_CONSULTA_BYTES or None)
+
+# Agrupa as linhas (GROUP BY) e calcula as funções de agregação pedidas no SELECT.
+# As linhas são consumidas uma a uma; só os acumuladores de cada grupo ficam em memória (os que
+# passam de configuracao.MEMORIA_CONSULTA_BYTES são agregados em partições em disco).
+# As 'agregacoes' já preparadas (ver preparar_agregacoes) podem ser passadas por quem as tem.
+def agregar_resultado(linhas, colunas_solicitadas, colunas_group_by, agregacoes=None):
+    if agregacoes is None:
+        agregacoes = preparar_agregacoes(colunas_solicitadas)
+    return agregar_hash(linhas, colunas_group_by, agregacoes, configuracao.MEMORIA_CONSULTA_BYTES or None)
+
+def agregacoes_da_consulta(consulta):
+    plano = consulta.get('plano')
+    return plano['agregacoes'] if plano is not None else preparar_agregacoes(consulta['columns'])
 
-        # ETAPA 5: IMPRESSÃO DO RESULTADO
-        if not dados_finais:
-            print("Nenhum resultado encontrado.")
-            return
-            
-        colunas_para_imprimir = list(dados_finais[0].keys())
-        imprimir_resultado(dados_finais, colunas_para_imprimir)
+def executar_insert(consulta):
+    # Executa INSERT (uma ou mais linhas em VALUES), gerando IDs únicos automaticamente
+    try:
+        inseridos = _inserir_linhas(consulta['table'], consulta['columns'], consulta['values'])
+        if inseridos is not None:
+            _imprimir_inseridos(inseridos)
+    except Exception as e:
+        print(f'ERRO durante inserção: {e}')
 
-    except FileNotFoundError as e:
-        print(f"ERRO: Tabela não encontrada: {e.filename}")
+def executar_copy(consulta):
+    # Executa COPY tabela FROM 'ficheiro.csv': acrescenta as linhas de um CSV com cabeçalho,
+    # fazendo corresponder as colunas pelo nome
+    table_name, origem = consulta['table'], consulta['file']
+    try:
+        f = open(origem, newline='', encoding='utf-8')
+    except FileNotFoundError:
+        print(f"ERRO: Ficheiro '{origem}' não encontrado.")
+        return
+    try:
+        with f:
+            leitor = csv.reader(f)
+            colunas = next(leitor, None)
+            if not colunas:
+                print(f"ERRO: O ficheiro '{origem}' não tem cabeçalho.")
+                return
+            inseridos = _inserir_linhas(table_name, colunas, (valores for valores in leitor if valores))
+        if inseridos is not None:
+            _imprimir_inseridos(inseridos)
     except Exception as e:
-        print(f"ERRO: Ocorreu um erro inesperado ao executar a consulta: {e}")
+        print(f'ERRO durante inserção: {e}')
 
-def _get_pk_column(fieldnames):
-    # Determina o nome da coluna de chave primária procurando por id ou sufixos _id
-    if not fieldnames: return 'id'
-    if 'id' in fieldnames: return 'id'
-    for name in fieldnames:
-        if name.endswith('_id'): return name
-    return fieldnames[0]
+def _imprimir_inseridos(inseridos):
+    if inseridos == 1:
+        print("1 registro inserido.")
+    else:
+        print(f"{inseridos} registro(s) inserido(s).")
 
-def executar_insert(consulta):
-    # Executa INSERT, gerando um ID único automaticamente
-    table_name = consulta['table']
-    arquivo = get_csv_path(table_name)
-    colunas_usuario = consulta['columns']
-    valores_usuario = consulta['values']
+# Tamanho dos blocos (em bytes) em que as linhas inseridas são escritas no ficheiro.
+_BLOCO_ESCRITA = 1024 * 1024
 
+# Acrescenta as linhas (listas de valores pela ordem de 'colunas_usuario', ou do cabeçalho se for None)
+# ao fim da tabela, criando-a se não existir. O ficheiro é aberto uma só vez, as linhas são escritas em
+# blocos e os IDs saem de uma única consulta à sequência da tabela. Se alguma linha falhar, o ficheiro
+# volta ao tamanho anterior e nenhuma linha fica inserida. Devolve o número de linhas inseridas, ou None
+# se a inserção não foi possível (a mensagem de erro já foi impressa).
+def _inserir_linhas(table_name, colunas_usuario, linhas_valores):
+    arquivo = get_csv_path(table_name)
+    fieldnames, novo_id = [], 1
+    # O cabeçalho e o próximo ID vêm da sequência da tabela, sem ler as linhas.
     try:
-        fieldnames, novo_id = [], 1
-        try:
-            with open(arquivo, 'r', newline='', encoding='utf-8') as f:
-                leitor = csv.reader(f)
-                fieldnames = next(leitor)
-                
-                f.seek(0)
-                dict_leitor = csv.DictReader(f)
-                pk_column_name = _get_pk_column(fieldnames)
-                ids_existentes = []
-                for linha in dict_leitor:
-                    if pk_column_name in linha:
-                        id_como_texto = linha[pk_column_name]
-                        if id_como_texto.isdigit():
-                            id_numerico = int(id_como_texto)
-                            ids_existentes.append(id_numerico)
-                if ids_existentes:
-                    novo_id = max(ids_existentes) + 1
-        except (FileNotFoundError, StopIteration):
-            if colunas_usuario:
-                fieldnames = colunas_usuario[:]
-                tem_coluna_id = 'id' in fieldnames
-                tem_coluna_com_sufixo_id = False
-                for nome_coluna in fieldnames:
-                    if nome_coluna.endswith('_id'):
-                        tem_coluna_com_sufixo_id = True
-                        break
-
-                if not tem_coluna_id and not tem_coluna_com_sufixo_id:
-                    fieldnames.insert(0, 'id')
-                    fieldnames.insert(0, 'id')
-            else:
-                print("ERRO: INSERT em tabela nova sem especificar colunas.")
-                return
-
-        pk_column_name = _get_pk_column(fieldnames)
+        sequencia = sequencias.obter(arquivo)
+    except FileNotFoundError:
+        sequencia = None
+    if sequencia is not None:
+        fieldnames, novo_id = sequencia['cabecalho'], sequencia['proximo_id']
+    else:
         if colunas_usuario:
-            linha_para_inserir = dict(zip(colunas_usuario, valores_usuario))
+            fieldnames = colunas_usuario[:]
+            tem_coluna_id = 'id' in fieldnames
+            tem_coluna_com_sufixo_id = False
+            for nome_coluna in fieldnames:
+                if nome_coluna.endswith('_id'):
+                    tem_coluna_com_sufixo_id = True
+                    break
+
+            if not tem_coluna_id and not tem_coluna_com_sufixo_id:
+                fieldnames.insert(0, 'id')
+                fieldnames.insert(0, 'id')
         else:
-            linha_para_inserir = dict(zip(fieldnames, valores_usuario))
-        linha_para_inserir[pk_column_name] = novo_id
-        
-        file_exists = os.path.isfile(arquivo) and os.path.getsize(arquivo) > 0
-        with open(arquivo, 'a', newline='', encoding='utf-8') as csvfile:
-            writer = csv.DictWriter(csvfile, fieldnames=fieldnames)
+            print("ERRO: INSERT em tabela nova sem especificar colunas.")
+            return None
+
+    pk_column_name = sequencias.coluna_chave(fieldnames)
+    colunas_linha = colunas_usuario if colunas_usuario else fieldnames
+    # O cabeçalho é verificado uma só vez, em vez de linha a linha.
+    desconhecidas = [coluna for coluna in colunas_linha if coluna not in fieldnames]
+    if desconhecidas:
+        raise ValueError(f"coluna(s) inexistente(s) na tabela '{table_name}': {', '.join(desconhecidas)}")
+
+    file_exists = os.path.isfile(arquivo) and os.path.getsize(arquivo) > 0
+    if file_exists:
+        assinatura_anterior = cache_tabelas.assinatura_ficheiro(arquivo)
+        _garantir_quebra_de_linha_final(arquivo)
+    # Os valores das novas linhas só são guardados se a tabela estiver na cache ou tiver mapa de zonas
+    # (para os atualizar).
+    guardar_valores = file_exists and (cache_tabelas.em_cache(arquivo) or zonas.existe(arquivo))
+    valores_escritos, novos_offsets = [], array.array('Q')
+
+    texto_linha = io.StringIO(newline='')
+    escritor = csv.writer(texto_linha)
+    def codificar(valores):
+        escritor.writerow(valores)
+        dados = texto_linha.getvalue().encode('utf-8')
+        texto_linha.seek(0)
+        texto_linha.truncate()
+        return dados
+
+    inseridos = 0
+    with open(arquivo, 'ab') as f:
+        tamanho_original = posicao = f.tell()
+        try:
+            blocos, tamanho_blocos = [], 0
             if not file_exists:
-                writer.writeheader()
-            writer.writerow(linha_para_inserir)
-        print("1 registro inserido.")
-
-    except Exception as e:
-        print(f'ERRO durante inserção: {e}')
+                blocos.append(codificar(fieldnames))
+                tamanho_blocos = len(blocos[0])
+            for valores_usuario in linhas_valores:
+                linha_para_inserir = dict(zip(colunas_linha, valores_usuario))
+                linha_para_inserir[pk_column_name] = novo_id + inseridos
+                valores = [linha_para_inserir.get(coluna) for coluna in fieldnames]
+                if guardar_valores:
+                    valores_escritos.append(['' if valor is None else str(valor) for valor in valores])
+
+                dados = codificar(valores)
+                novos_offsets.append(posicao + tamanho_blocos)
+                blocos.append(dados)
+                tamanho_blocos += len(dados)
+                inseridos += 1
+                if tamanho_blocos >= _BLOCO_ESCRITA:
+                    f.write(b''.join(blocos))
+                    posicao += tamanho_blocos
+                    blocos, tamanho_blocos = [], 0
+            f.write(b''.join(blocos))
+        except BaseException:
+            # Desfaz as linhas já escritas, para a inserção ser tudo ou nada.
+            f.truncate(tamanho_original)
+            raise
+
+    if file_exists:
+        _linhas_acrescentadas(arquivo, assinatura_anterior, valores_escritos, novos_offsets)
+    else:
+        _tabela_reescrita(arquivo)
+    if inseridos:
+        sequencias.registrar_insercao(arquivo, fieldnames, pk_column_name, novo_id + inseridos - 1)
+    return inseridos
+
+# Avisa as estruturas auxiliares da tabela (cache, tabela de offsets, índices) de que o ficheiro foi reescrito.
+def _tabela_reescrita(arquivo):
+    cache_tabelas.invalidar(arquivo)
+    leitor_mmap.invalidar(arquivo)
+    indices.marcar_desatualizados(arquivo)
+    sequencias.invalidar(arquivo)
+    colunar.invalidar(arquivo)
+    zonas.invalidar(arquivo)
+
+# Avisa as estruturas auxiliares de que foram acrescentadas linhas no fim do ficheiro.
+# 'assinatura_anterior' é a assinatura do ficheiro antes da escrita; 'offsets' são os inícios das novas linhas.
+def _linhas_acrescentadas(arquivo, assinatura_anterior, linhas_valores, offsets):
+    cache_tabelas.registrar_insercao(arquivo, assinatura_anterior, linhas_valores)
+    leitor_mmap.registrar_insercao(arquivo, assinatura_anterior, offsets)
+    zonas.registrar_insercao(arquivo, assinatura_anterior, linhas_valores, offsets)
+    indices.marcar_desatualizados(arquivo)
+
+# Avisa as estruturas auxiliares de que foram acrescentados registos ao log de alterações da tabela
+# (o CSV não mudou, por isso a cache e a tabela de offsets continuam válidas). 'assinatura_anterior' é a
+# assinatura da tabela antes da escrita; se a escrita não mexeu nos IDs, a sequência continua válida.
+# Se o log já for grande em relação ao CSV, compacta a tabela.
+def _log_acrescentado(arquivo, assinatura_anterior, ids_alterados=True):
+    indices.marcar_desatualizados(arquivo)
+    if ids_alterados:
+        sequencias.invalidar(arquivo)
+    else:
+        sequencias.registrar_escrita_sem_chave(arquivo, assinatura_anterior)
+    if log_alteracoes.precisa_compactar(arquivo):
+        log_alteracoes.compactar(arquivo)
+        _tabela_reescrita(arquivo)
+
+# Garante que o ficheiro termina com uma quebra de linha, para que a linha acrescentada a seguir
+# não fique colada à última (por exemplo, os CSV de exemplo não terminam com '\n').
+def _garantir_quebra_de_linha_final(arquivo):
+    with open(arquivo, 'rb+') as f:
+        f.seek(0, os.SEEK_END)
+        if f.tell() == 0:
+            return
+        f.seek(-1, os.SEEK_END)
+        if f.read(1) != b'\n':
+            f.write(b'\r\n')
 
 def executar_update(consulta):
-    # Executa UPDATE
+    # Executa UPDATE: os novos valores das linhas alteradas são acrescentados ao log da tabela
     table_name, set_list, condicao = consulta['table'], consulta['set'], consulta['where']
     arquivo = get_csv_path(table_name)
     try:
-        with open(arquivo, 'r', newline='', encoding='utf-8') as f:
-            leitor = csv.DictReader(f)
-            linhas = list(leitor)
-            fieldnames = leitor.fieldnames
+        # Se um índice mostrar que nenhuma linha satisfaz o WHERE, não é preciso ler a tabela.
+        if indices.procurar(arquivo, condicao) == []:
+            print("0 registro(s) atualizado(s).")
+            return
+
+        fieldnames = leitor_mmap.ler_cabecalho(arquivo)
         
         for coluna_a_atualizar in set_list.keys():
             if coluna_a_atualizar not in fieldnames:
                 print(f"ERRO: A coluna '{coluna_a_atualizar}' não existe na tabela '{table_name}'. Operação de UPDATE cancelada.")
                 return
 
-        atualizados = 0
-        for linha in linhas:
-            if condicao is None or verifica_condicao(linha, condicao):
+        filtro = filtro_da_consulta(consulta)
+        assinatura_anterior = log_alteracoes.assinatura_tabela(arquivo)
+        atualizacoes = []
+        for numero, linha in varrer_numeradas(table_name, condicao):
+            if filtro is None or filtro(linha):
                 for coluna, novo_valor in set_list.items():
                     linha[coluna] = novo_valor
-                atualizados += 1
-        
-        with open(arquivo, 'w', newline='', encoding='utf-8') as f:
-            writer = csv.DictWriter(f, fieldnames=fieldnames)
-            writer.writeheader()
-            writer.writerows(linhas)
+                # Guarda os valores como texto, tal como ficariam escritos no CSV.
+                valores = {coluna: '' if linha.get(coluna) is None else str(linha[coluna]) for coluna in fieldnames}
+                atualizacoes.append((numero, valores))
+
+        log_alteracoes.registrar_atualizacoes(arquivo, atualizacoes)
+        if atualizacoes:
+            _log_acrescentado(arquivo, assinatura_anterior, sequencias.coluna_chave(fieldnames) in set_list)
         
-        print(f"{atualizados} registro(s) atualizado(s).")
+        print(f"{len(atualizacoes)} registro(s) atualizado(s).")
     except FileNotFoundError:
         print(f'ERRO: Tabela "{table_name}" não encontrada.')
 
 def executar_delete(consulta):
-    # Executa DELETE
+    # Executa DELETE: os números das linhas removidas são acrescentados ao log da tabela
     table_name, condicao = consulta['table'], consulta['where']
     arquivo = get_csv_path(table_name)
     try:
-        with open(arquivo, 'r', newline='', encoding='utf-8') as f:
-            linhas = list(csv.DictReader(f))
-            if linhas:
-                primeira_linha = linhas[0]
-                fieldnames = primeira_linha.keys()
-            else:
-                fieldnames = []
-
-        linhas_mantidas = []
-        for linha in linhas:
-            deve_ser_deletada = False
-            if condicao is None:
-                deve_ser_deletada = True
-            elif verifica_condicao(linha, condicao):
-                deve_ser_deletada = True
-
-            if not deve_ser_deletada:
-                linhas_mantidas.append(linha)
-        removidos = len(linhas) - len(linhas_mantidas)
-        
-        with open(arquivo, 'w', newline='', encoding='utf-8') as f:
-            writer = csv.DictWriter(f, fieldnames=fieldnames)
-            writer.writeheader()
-            writer.writerows(linhas_mantidas)
+        if indices.procurar(arquivo, condicao) == []:
+            print("0 registro(s) removido(s).")
+            return
+
+        filtro = filtro_da_consulta(consulta)
+        assinatura_anterior = log_alteracoes.assinatura_tabela(arquivo)
+        removidas = []
+        for numero, linha in varrer_numeradas(table_name, condicao):
+            if filtro is None or filtro(linha):
+                removidas.append(numero)
+
+        log_alteracoes.registrar_remocoes(arquivo, removidas)
+        if removidas:
+            # Remover a linha com o maior ID muda o próximo ID.
+            _log_acrescentado(arquivo, assinatura_anterior)
             
-        print(f"{removidos} registro(s) removido(s).")
+        print(f"{len(removidas)} registro(s) removido(s).")
     except FileNotFoundError:
         print(f'ERRO: Tabela "{table_name}" não encontrada.')
 
+def executar_vacuum(consulta):
+    # Executa VACUUM: aplica o log de alterações ao CSV e apaga o log
+    table_name = consulta['table']
+    arquivo = get_csv_path(table_name)
+    try:
+        total = log_alteracoes.compactar(arquivo)
+        _tabela_reescrita(arquivo)
+        print(f"Tabela {table_name} compactada: {total} registro(s).")
+    except FileNotFoundError:
+        print(f'ERRO: Tabela "{table_name}" não encontrada.')
 
-# Verifica se uma linha satisfaz uma condição (simples ou aninhada)
-def verifica_condicao(linha, cond):
-    if 'operator' in cond and cond['operator'] in ['AND', 'OR', 'NOT']:
-        if cond['operator'] == 'AND':
-            return verifica_condicao(linha, cond['left']) and verifica_condicao(linha, cond['right'])
-        elif cond['operator'] == 'OR':
-            return verifica_condicao(linha, cond['left']) or verifica_condicao(linha, cond['right'])
-        elif cond['operator'] == 'NOT':
-            return not verifica_condicao(linha, cond['condition'])
+_NOMES_TIPOS = {'int': 'inteiro', 'float': 'real', 'str': 'texto', 'texto': 'texto'}
+
+def executar_analyze(consulta):
+    # Executa ANALYZE: (re)constrói o ficheiro colunar e o mapa de zonas da tabela e mostra o tipo de cada coluna
+    table_name = consulta['table']
+    arquivo = get_csv_path(table_name)
+    try:
+        cabecalho = colunar.construir(arquivo)
+    except FileNotFoundError:
+        print(f'ERRO: Tabela "{table_name}" não encontrada.')
+        return
+    if cabecalho is None:
+        print(f"ERRO: A tabela {table_name} está vazia (sem cabeçalho).")
+    elif cabecalho['colunas'] is None:
+        print(f"A tabela {table_name} tem linhas com um número de campos diferente do cabeçalho: "
+              f"não foi convertida para o formato colunar.")
     else:
-        operador, coluna, valor_condicao = cond['operator'], cond['column'], cond['value']
-        if coluna not in linha: return False
-        valor_linha = linha[coluna]
+        print(f"Tabela {table_name} analisada: {cabecalho['linhas']} registro(s).")
+        for coluna in cabecalho['colunas']:
+            if coluna['distintos'] is None:
+                distintos = 'demasiados valores distintos para contar'
+            else:
+                distintos = f"{coluna['distintos']} valor(es) distinto(s)"
+            print(f"  {coluna['nome']}: {_NOMES_TIPOS[coluna['tipo']]}, {distintos}")
+        if not colunar.disponivel(arquivo):
+            print("Não foi possível gravar o ficheiro colunar; as leituras continuam a usar o CSV.")
+    if cabecalho is not None:
+        mapa = zonas.construir(arquivo)
+        if mapa is None:
+            print("Mapa de zonas: não foi possível gravar o ficheiro; as leituras percorrem a tabela toda.")
+        else:
+            print(f"Mapa de zonas: {len(mapa['blocos'])} bloco(s) de até {mapa['linhas_por_bloco']} linhas.")
 
-        if operador == 'LIKE':
-            padrao_regex = str(valor_condicao).replace('%', '.*').replace('_', '.')
-            return bool(re.match(f"^{padrao_regex}$", str(valor_linha), re.IGNORECASE))
+def executar_create_index(consulta):
+    # Executa CREATE INDEX ON tabela(coluna)
+    table_name, coluna = consulta['table'], consulta['column']
+    try:
+        indices.criar_indice(get_csv_path(table_name), coluna)
+        print(f"Índice criado em {table_name}({coluna}).")
+    except FileNotFoundError:
+        print(f'ERRO: Tabela "{table_name}" não encontrada.')
+    except ValueError as e:
+        print(f"ERRO: Não foi possível criar o índice em {table_name}({coluna}): {e}")
+
+def executar_drop_index(consulta):
+    # Executa DROP INDEX ON tabela(coluna)
+    table_name, coluna = consulta['table'], consulta['column']
+    if indices.remover_indice(get_csv_path(table_name), coluna):
+        print(f"Índice removido de {table_name}({coluna}).")
+    else:
+        print(f"ERRO: Não existe índice em {table_name}({coluna}).")
+
+_COMPARADORES = {
+    '=': operator.eq,
+    '!=': operator.ne,
+    '>': operator.gt,
+    '<': operator.lt,
+    '>=': operator.ge,
+    '<=': operator.le
+}
+
+# Marca uma coluna que não existe na linha (diferente de uma coluna com valor None).
+_AUSENTE = object()
+
+# Verifica se uma linha satisfaz uma condição (simples ou aninhada).
+# Para filtrar muitas linhas use compilar_condicao, que faz este trabalho uma única vez.
+def verifica_condicao(linha, cond):
+    return compilar_condicao(cond)(linha)
+
+# Compila a condição WHERE produzida pelo parser numa única função linha -> bool.
+# As constantes são convertidas, o operador é escolhido e os padrões LIKE são compilados
+# uma só vez por consulta, em vez de a cada linha.
+def compilar_condicao(cond):
+    operador = cond['operator']
+    if operador == 'AND':
+        return _e(compilar_condicao(cond['left']), compilar_condicao(cond['right']))
+    elif operador == 'OR':
+        return _ou(compilar_condicao(cond['left']), compilar_condicao(cond['right']))
+    elif operador == 'NOT':
+        return _nao(compilar_condicao(cond['condition']))
+    return _compilar_comparacao(operador, cond['column'], cond['value'])
+
+def _e(esquerda, direita):
+    return lambda linha: esquerda(linha) and direita(linha)
+
+def _ou(esquerda, direita):
+    return lambda linha: esquerda(linha) or direita(linha)
+
+def _nao(interna):
+    return lambda linha: not interna(linha)
+
+# Prepara uma condição WHERE que pode ter parâmetros (nós {'parametro', 'posicao'} no lugar dos valores,
+# ver preparadas.py): devolve uma função que recebe os valores ({posição do parâmetro: valor}) e devolve
+# o filtro da condição com esses valores. As partes sem parâmetros são compiladas aqui uma só vez e
+# partilhadas pelos filtros; ao ligar os valores só se compilam as comparações com parâmetros.
+def preparar_condicao(cond):
+    if not _tem_parametros(cond):
+        filtro = compilar_condicao(cond)
+        return lambda valores: filtro
+    operador = cond['operator']
+    if operador in ('AND', 'OR'):
+        juntar = _e if operador == 'AND' else _ou
+        ligar_esquerda, ligar_direita = preparar_condicao(cond['left']), preparar_condicao(cond['right'])
+        return lambda valores: juntar(ligar_esquerda(valores), ligar_direita(valores))
+    elif operador == 'NOT':
+        ligar_interna = preparar_condicao(cond['condition'])
+        return lambda valores: _nao(ligar_interna(valores))
+    coluna, posicao = cond['column'], cond['value']['posicao']
+    return lambda valores: _compilar_comparacao(operador, coluna, valores[posicao])
+
+def _tem_parametros(cond):
+    if cond['operator'] in ('AND', 'OR'):
+        return _tem_parametros(cond['left']) or _tem_parametros(cond['right'])
+    elif cond['operator'] == 'NOT':
+        return _tem_parametros(cond['condition'])
+    return isinstance(cond['value'], dict)
+
+# Compila uma comparação simples (coluna operador valor) numa função linha -> bool.
+def _compilar_comparacao(operador, coluna, valor_condicao):
+    if operador == 'LIKE':
+        padrao = re.compile(_like_para_regex(str(valor_condicao)), re.IGNORECASE)
+        def condicao_like(linha):
+            valor_linha = linha.get(coluna, _AUSENTE)
+            if valor_linha is _AUSENTE: return False
+            return padrao.match(str(valor_linha)) is not None
+        return condicao_like
+
+    comparar = _COMPARADORES.get(operador)
+    if comparar is None:
+        return lambda linha: False
 
+    try:
+        valor_condicao_num = float(valor_condicao)
+    except (ValueError, TypeError):
+        valor_condicao_num = None
+
+    if valor_condicao_num is None:
+        # Constante não numérica: a comparação é sempre feita entre os valores originais.
+        def condicao_texto(linha):
+            valor_linha = linha.get(coluna, _AUSENTE)
+            if valor_linha is _AUSENTE: return False
+            return comparar(valor_linha, valor_condicao)
+        return condicao_texto
+
+    # Constante numérica: compara como número sempre que o valor da linha também o for.
+    def condicao_numerica(linha):
+        valor_linha = linha.get(coluna, _AUSENTE)
+        if valor_linha is _AUSENTE: return False
         try:
-            valor_linha_num, valor_condicao_num = float(valor_linha), float(valor_condicao)
-            valor_linha, valor_condicao = valor_linha_num, valor_condicao_num
-        except (ValueError, TypeError): pass
-
-        if operador == '=': return valor_linha == valor_condicao
-        elif operador == '!=': return valor_linha != valor_condicao
-        elif operador == '>': return valor_linha > valor_condicao
-        elif operador == '<': return valor_linha < valor_condicao
-        elif operador == '>=': return valor_linha >= valor_condicao
-        elif operador == '<=': return valor_linha <= valor_condicao
-        return False
-
-def ordenar_resultado(resultado, order_by):
-    # Ordena as linhas com base nas colunas e direcoes especificadas
-    for ordem in reversed(order_by):
-        coluna, direcao = ordem['column'], ordem['direction']
-        def sort_key(x):
-            val = x.get(coluna, 0)
-            try: return float(val)
-            except (ValueError, TypeError): return val
-        
-        resultado.sort(key=sort_key, reverse=(direcao == 'DESC'))
-    return resultado
+            valor_linha_num = float(valor_linha)
+        except (ValueError, TypeError):
+            return comparar(valor_linha, valor_condicao)
+        return comparar(valor_linha_num, valor_condicao_num)
+    return condicao_numerica
+
+# Converte um padrão LIKE numa expressão regular: % -> .*, _ -> . e o resto é escapado.
+def _like_para_regex(padrao_like):
+    partes = []
+    for caractere in padrao_like:
+        if caractere == '%':
+            partes.append('.*')
+        elif caractere == '_':
+            partes.append('.')
+        else:
+            partes.append(re.escape(caractere))
+    return '^' + ''.join(partes) + '$'
+
+def ordenar_resultado(resultado, order_by, limite=None):
+    # Ordena as linhas com base nas colunas e direcoes especificadas (numa única passagem); sem LIMIT, as
+    # que passam de configuracao.MEMORIA_CONSULTA_BYTES são ordenadas em disco
+    return ordenar_linhas(resultado, order_by, limite, configuracao.MEMORIA_CONSULTA_BYTES or None)
 
 def imprimir_resultado(linhas, colunas):
-    # Imprime uma lista de resultados
-    if not linhas:
+    # Imprime os resultados à medida que vão sendo produzidos (aceita uma lista ou um gerador),
+    # escrevendo no stdout em blocos de linhas em vez de uma chamada a print por linha
+    linhas = iter(linhas)
+    primeira_linha = next(linhas, None)
+    if primeira_linha is None:
         print("Nenhum resultado encontrado.")
         return
     if not colunas:
-        colunas = list(linhas[0].keys())
-
-    print(" | ".join(map(str, colunas)))
-    
-    largura_total_dos_nomes = 0
-    for nome_coluna in colunas:
-        largura_total_dos_nomes += len(str(nome_coluna))
-        
-    numero_de_colunas = len(colunas)
-    if numero_de_colunas > 0:
-        numero_de_separadores = numero_de_colunas - 1
-    else:
-        numero_de_separadores = 0
-
-    largura_total_dos_separadores = 3 * numero_de_separadores
-    comprimento_total = largura_total_dos_nomes + largura_total_dos_separadores
-    linha_separadora = "-" * comprimento_total
-
-    print(linha_separadora)
-    
-    for linha in linhas:
-        valores_desta_linha = []
-        for nome_da_coluna in colunas:
-            valor_da_celula = linha.get(nome_da_coluna, '')
-            valor_em_texto = str(valor_da_celula)
-            valores_desta_linha.append(valor_em_texto)
-
-        linha_formatada_para_impressao = " | ".join(valores_desta_linha)
-
-        print(linha_formatada_para_impressao)
+        colunas = list(primeira_linha.keys())
+    linhas = itertools.chain([primeira_linha], linhas)
+    saida.escrever_tabela(sys.stdout, colunas, saida.tuplos(linhas, colunas))
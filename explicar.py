@@ -0,0 +1,151 @@
+# EXPLAIN e EXPLAIN ANALYZE: a árvore de operadores de um SELECT e, opcionalmente, medições por etapa.
+#
+# O executor constrói o SELECT como uma cadeia de geradores; com uma Analise, cada etapa é embrulhada
+# num iterador que regista o nó da etapa na árvore e, no EXPLAIN ANALYZE, mede:
+#   - as linhas que a etapa produz (as que recebe são as produzidas pelas etapas de entrada);
+#   - o tempo passado dentro da etapa (total, e próprio = total menos o das etapas de entrada);
+#   - o pico de memória alocada enquanto a etapa (ou uma das suas entradas) estava a trabalhar, medido
+#     com tracemalloc. Como as etapas se chamam umas às outras, é mantida uma pilha: ao entrar numa etapa
+#     o pico atual é guardado na etapa que a chamou e o contador do tracemalloc é reiniciado;
+#   - nas leituras de tabelas, a fonte usada (índice, cache ou mmap) e os bytes lidos do CSV.
+# O tracemalloc torna a execução várias vezes mais lenta, por isso, com a medição de memória ligada
+# (configuracao.EXPLAIN_MEDIR_MEMORIA), os tempos servem para comparar etapas entre si e não como
+# tempo real da consulta.
+import time
+import tracemalloc
+
+import configuracao
+
+class Analise:
+    # 'executar' é False no EXPLAIN (só a árvore) e True no EXPLAIN ANALYZE.
+    def __init__(self, executar=False):
+        self.executar = executar
+        self.raiz = None
+        self.linhas_devolvidas = 0
+        self.tempo_total = 0.0
+        self.medir_memoria = False
+        self._pilha = []
+        self._memoria_inicial = 0
+
+    # Regista uma etapa cujas linhas de entrada vêm dos iteradores (já embrulhados) em 'entradas'.
+    # 'leitura' é o dicionário onde uma leitura de tabela regista a fonte e os bytes lidos.
+    def etapa(self, descricao, linhas, entradas=(), leitura=None):
+        no = {
+            'descricao': descricao,
+            'filhos': [entrada.no for entrada in entradas if isinstance(entrada, _EtapaMedida)],
+            'leitura': leitura,
+            'linhas_saida': 0,
+            'tempo': 0.0,
+            'pico_memoria': 0
+        }
+        self.raiz = no
+        return _EtapaMedida(self, no, linhas)
+
+    # Consome as linhas da última etapa (EXPLAIN ANALYZE), sem as imprimir.
+    def consumir(self, linhas):
+        ja_ativo = tracemalloc.is_tracing()
+        self.medir_memoria = configuracao.EXPLAIN_MEDIR_MEMORIA or ja_ativo
+        if self.medir_memoria and not ja_ativo:
+            tracemalloc.start()
+        self._memoria_inicial = tracemalloc.get_traced_memory()[0]
+        inicio = time.perf_counter()
+        try:
+            for _ in linhas:
+                self.linhas_devolvidas += 1
+        finally:
+            self.tempo_total = time.perf_counter() - inicio
+            if self.medir_memoria and not ja_ativo:
+                tracemalloc.stop()
+
+    def _entrar(self):
+        if not tracemalloc.is_tracing():
+            return
+        if self._pilha:
+            self._pilha[-1] = max(self._pilha[-1], tracemalloc.get_traced_memory()[1])
+        tracemalloc.reset_peak()
+        self._pilha.append(0)
+
+    def _sair(self, no):
+        if not tracemalloc.is_tracing() or not self._pilha:
+            return
+        pico = max(self._pilha.pop(), tracemalloc.get_traced_memory()[1])
+        no['pico_memoria'] = max(no['pico_memoria'], pico - self._memoria_inicial)
+        if self._pilha:
+            self._pilha[-1] = max(self._pilha[-1], pico)
+
+# Iterador que embrulha uma etapa e acumula as suas medições no nó correspondente.
+class _EtapaMedida:
+    def __init__(self, analise, no, linhas):
+        self.no = no
+        self._analise = analise
+        self._linhas = iter(linhas)
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        self._analise._entrar()
+        inicio = time.perf_counter()
+        try:
+            linha = next(self._linhas)
+        finally:
+            self.no['tempo'] += time.perf_counter() - inicio
+            self._analise._sair(self.no)
+        self.no['linhas_saida'] += 1
+        return linha
+
+def _formatar_bytes(numero):
+    for unidade in ('B', 'KB', 'MB'):
+        if numero < 1024:
+            return f"{numero:.0f} {unidade}" if unidade == 'B' else f"{numero:.1f} {unidade}"
+        numero /= 1024
+    return f"{numero:.1f} GB"
+
+def _detalhes_leitura(leitura):
+    partes = [f"fonte: {leitura['fonte']}"]
+    if 'linhas_candidatas' in leitura:
+        partes.append(f"linhas candidatas: {leitura['linhas_candidatas']}")
+    if 'blocos' in leitura:
+        partes.append(f"blocos saltados (mapa de zonas): {leitura['blocos_saltados']} de {leitura['blocos']}")
+    if 'bytes_lidos' in leitura:
+        partes.append(f"lidos: {_formatar_bytes(leitura['bytes_lidos'])}")
+    return partes
+
+def _imprimir_no(analise, no, nivel):
+    texto = no['descricao'] if nivel == 0 else '  ' * (nivel - 1) + '-> ' + no['descricao']
+    detalhes = _detalhes_leitura(no['leitura']) if no['leitura'] else []
+    if analise.executar:
+        linhas_entrada = sum(filho['linhas_saida'] for filho in no['filhos'])
+        tempo_proprio = no['tempo'] - sum(filho['tempo'] for filho in no['filhos'])
+        if no['filhos']:
+            detalhes.append(f"linhas: {linhas_entrada} -> {no['linhas_saida']}")
+        else:
+            detalhes.append(f"linhas: {no['linhas_saida']}")
+        detalhes.append(f"tempo: {no['tempo'] * 1000:.3f} ms (próprio {max(tempo_proprio, 0) * 1000:.3f} ms)")
+        if analise.medir_memoria:
+            detalhes.append(f"pico de memória: {_formatar_bytes(no['pico_memoria'])}")
+    if detalhes:
+        texto += f"  ({', '.join(detalhes)})"
+    print(texto)
+    for filho in no['filhos']:
+        _imprimir_no(analise, filho, nivel + 1)
+
+# Imprime a árvore de operadores (e as medições, no EXPLAIN ANALYZE).
+def imprimir_plano(analise):
+    if analise.raiz is None:
+        return
+    _imprimir_no(analise, analise.raiz, 0)
+    if analise.executar:
+        print(f"Linhas devolvidas: {analise.linhas_devolvidas}")
+        print(f"Tempo total: {analise.tempo_total * 1000:.3f} ms")
+
+# Converte uma condição WHERE da AST em texto SQL.
+def condicao_em_texto(cond):
+    operador = cond['operator']
+    if operador in ('AND', 'OR'):
+        return f"({condicao_em_texto(cond['left'])} {operador} {condicao_em_texto(cond['right'])})"
+    if operador == 'NOT':
+        return f"NOT {condicao_em_texto(cond['condition'])}"
+    valor = cond['value']
+    valor = f"'{valor}'" if isinstance(valor, str) else valor
+    return f"{cond['column']} {operador} {valor}"
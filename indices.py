@@ -0,0 +1,197 @@
+# Índices secundários sobre colunas de tabelas CSV (CREATE INDEX ON tabela(coluna)).
+#
+# Os índices declarados de cada tabela ficam registados em '<tabela>.csv.indices' (lista de colunas).
+# Os dados de cada índice ficam em '<tabela>.csv.<coluna>.idx': os valores da coluna ordenados, cada um com
+# o offset (em bytes) do início da sua linha no CSV, para servir igualdades e intervalos por pesquisa binária.
+# O índice reflete as linhas atuais da tabela, isto é, o CSV com o log de alterações (log_alteracoes) aplicado:
+# uma linha atualizada fica indexada pelo valor novo, com o offset da sua versão original no CSV.
+# O ficheiro de dados guarda as assinaturas do CSV e do log a partir dos quais foi construído; se algum
+# mudar (ou uma escrita do executor o marcar como desatualizado), o índice é reconstruído na próxima utilização.
+import bisect
+import json
+import os
+
+from leitor_mmap import ler_cabecalho, obter_offsets
+from log_alteracoes import assinatura_tabela, varrer_mescladas
+
+# caminho do ficheiro de dados do índice -> dados já carregados
+_carregados = {}
+
+def _caminho_catalogo(arquivo):
+    return f"{arquivo}.indices"
+
+def caminho_indice(arquivo, coluna):
+    return f"{arquivo}.{coluna}.idx"
+
+# Devolve a lista de colunas indexadas de uma tabela.
+def colunas_indexadas(arquivo):
+    try:
+        with open(_caminho_catalogo(arquivo), encoding='utf-8') as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return []
+
+def _gravar_json(caminho, dados):
+    # Escreve num ficheiro temporário e só depois o troca pelo definitivo, para nunca deixar um ficheiro a meio.
+    temporario = f'{caminho}.{os.getpid()}.tmp'
+    with open(temporario, 'w', encoding='utf-8') as f:
+        json.dump(dados, f)
+    os.replace(temporario, caminho)
+
+def _construir(arquivo, coluna):
+    numericos, textos = [], []
+    assinatura = assinatura_tabela(arquivo)
+    offsets = obter_offsets(arquivo)
+    for numero, linha in varrer_mescladas(arquivo):
+        offset = offsets[numero]
+        valor = linha.get(coluna)
+        if valor is None:
+            raise ValueError(f"a linha no byte {offset} não tem valor para a coluna '{coluna}'")
+        try:
+            valor_num = float(valor)
+        except ValueError:
+            textos.append((valor, offset))
+            continue
+        if valor_num != valor_num:  # NaN não pode ser ordenado; fica junto dos textos
+            textos.append((valor, offset))
+        else:
+            numericos.append((valor_num, offset))
+    numericos.sort()
+    textos.sort()
+    dados = {
+        'coluna': coluna,
+        'assinatura': assinatura,
+        'numericos_valores': [valor for valor, _ in numericos],
+        'numericos_offsets': [offset for _, offset in numericos],
+        'textos_valores': [valor for valor, _ in textos],
+        'textos_offsets': [offset for _, offset in textos]
+    }
+    _gravar_json(caminho_indice(arquivo, coluna), dados)
+    _carregados[caminho_indice(arquivo, coluna)] = dados
+    return dados
+
+# Devolve os dados atualizados do índice, reconstruindo-o se o CSV mudou desde a última construção.
+# Com construir=False, um índice desatualizado não é reconstruído e o resultado é None.
+def _obter(arquivo, coluna, construir=True):
+    caminho = caminho_indice(arquivo, coluna)
+    assinatura = assinatura_tabela(arquivo)
+    dados = _carregados.get(caminho)
+    if dados is None or dados['assinatura'] != assinatura:
+        try:
+            with open(caminho, encoding='utf-8') as f:
+                dados = json.load(f)
+        except (FileNotFoundError, ValueError):
+            dados = None
+        if dados is None or dados['assinatura'] != assinatura:
+            return _construir(arquivo, coluna) if construir else None
+        _carregados[caminho] = dados
+    return dados
+
+# CREATE INDEX: regista o índice no catálogo da tabela e constrói-o.
+def criar_indice(arquivo, coluna):
+    if coluna not in ler_cabecalho(arquivo):
+        raise ValueError(f"a coluna '{coluna}' não existe")
+    _construir(arquivo, coluna)
+    colunas = colunas_indexadas(arquivo)
+    if coluna not in colunas:
+        _gravar_json(_caminho_catalogo(arquivo), colunas + [coluna])
+
+# DROP INDEX: retira o índice do catálogo e apaga os seus dados. Devolve False se o índice não existia.
+def remover_indice(arquivo, coluna):
+    colunas = colunas_indexadas(arquivo)
+    if coluna not in colunas:
+        return False
+    colunas.remove(coluna)
+    if colunas:
+        _gravar_json(_caminho_catalogo(arquivo), colunas)
+    else:
+        os.remove(_caminho_catalogo(arquivo))
+    _apagar_dados(arquivo, coluna)
+    return True
+
+def _apagar_dados(arquivo, coluna):
+    caminho = caminho_indice(arquivo, coluna)
+    _carregados.pop(caminho, None)
+    try:
+        os.remove(caminho)
+    except FileNotFoundError:
+        pass
+
+# Marca os índices da tabela como desatualizados depois de uma escrita: os dados são apagados
+# e reconstruídos na próxima consulta que precise deles.
+def marcar_desatualizados(arquivo):
+    for coluna in colunas_indexadas(arquivo):
+        _apagar_dados(arquivo, coluna)
+
+# Offsets das linhas cujo valor indexado pode satisfazer 'coluna operador valor'.
+# Devolve None quando o índice não consegue responder exatamente como a comparação linha a linha
+# (ex.: '!=', LIKE, ou um intervalo numérico numa coluna que também tem textos).
+def _offsets_comparacao(dados, operador, valor_condicao):
+    try:
+        valor_num = float(valor_condicao)
+    except (ValueError, TypeError):
+        valor_num = None
+
+    if valor_num is None:
+        # Constante de texto: só a igualdade se resolve, e só os textos podem ser iguais a ela.
+        if operador != '=':
+            return None
+        valores = dados['textos_valores']
+        inicio = bisect.bisect_left(valores, valor_condicao)
+        fim = bisect.bisect_right(valores, valor_condicao)
+        return dados['textos_offsets'][inicio:fim]
+
+    if valor_num != valor_num:
+        return None
+    valores = dados['numericos_valores']
+    if operador == '=':
+        inicio, fim = bisect.bisect_left(valores, valor_num), bisect.bisect_right(valores, valor_num)
+    elif dados['textos_valores']:
+        # Comparar um texto com um número falha na consulta linha a linha; deixa-a decidir.
+        return None
+    elif operador == '>':
+        inicio, fim = bisect.bisect_right(valores, valor_num), len(valores)
+    elif operador == '>=':
+        inicio, fim = bisect.bisect_left(valores, valor_num), len(valores)
+    elif operador == '<':
+        inicio, fim = 0, bisect.bisect_left(valores, valor_num)
+    elif operador == '<=':
+        inicio, fim = 0, bisect.bisect_right(valores, valor_num)
+    else:
+        return None
+    return dados['numericos_offsets'][inicio:fim]
+
+def _candidatos(arquivo, colunas, cond, construir):
+    operador = cond['operator']
+    if operador in ('AND', 'OR'):
+        esquerda = _candidatos(arquivo, colunas, cond['left'], construir)
+        direita = _candidatos(arquivo, colunas, cond['right'], construir)
+        if operador == 'AND':
+            if esquerda is None or direita is None:
+                return direita if esquerda is None else esquerda
+            return esquerda & direita
+        if esquerda is None or direita is None:
+            return None
+        return esquerda | direita
+    if operador == 'NOT' or cond['column'] not in colunas:
+        return None
+    dados = _obter(arquivo, cond['column'], construir)
+    if dados is None:
+        return None
+    offsets = _offsets_comparacao(dados, operador, cond['value'])
+    return None if offsets is None else set(offsets)
+
+# Usa os índices da tabela para encontrar as linhas que podem satisfazer a condição WHERE.
+# Devolve os offsets dessas linhas pela ordem do ficheiro, ou None se nenhum índice se aplica
+# (nesse caso é preciso ler a tabela toda). A condição completa continua a ter de ser verificada
+# em cada linha devolvida.
+# Com construir=False (ex.: no EXPLAIN) os índices só são consultados: os desatualizados contam como se
+# não existissem, em vez de serem reconstruídos e gravados.
+def procurar(arquivo, cond, construir=True):
+    colunas = colunas_indexadas(arquivo)
+    if not colunas or cond is None:
+        return None
+    candidatos = _candidatos(arquivo, colunas, cond, construir)
+    if candidatos is None:
+        return None
+    return sorted(candidatos)
@@ -0,0 +1,278 @@
+# Leitura de tabelas CSV através de mmap e tabela de offsets das linhas.
+#
+# O ficheiro é mapeado em memória (mmap) e as linhas são lidas diretamente do mapa: vários processos que
+# leem a mesma tabela partilham as mesmas páginas da cache do sistema operativo em vez de cada um
+# guardar a sua cópia.
+#
+# A tabela de offsets guarda, para cada linha de dados (pela ordem do ficheiro, sem contar as linhas em
+# branco), o byte onde ela começa. Com ela é possível ir diretamente à linha N, ler só um intervalo de
+# linhas ou dividir a tabela em partes exatas para a leitura paralela. A tabela pode ser gravada em
+# '<tabela>.csv.offsets' (configuracao.PERSISTIR_OFFSETS) e é carregada, também por mmap, nas execuções
+# seguintes enquanto a assinatura do CSV (tamanho, mtime, inode) não mudar.
+import array
+import bisect
+import csv
+import io
+import mmap
+import os
+import struct
+
+import configuracao
+from cache_tabelas import assinatura_ficheiro
+
+_MAGICO = b'CSVOFS01'
+_CABECALHO_OFFSETS = struct.Struct('<8sQQQ')
+
+# caminho do CSV -> (assinatura, offsets)
+_carregados = {}
+
+def caminho_offsets(arquivo):
+    return f"{arquivo}.offsets"
+
+# Converte os valores de uma linha num dicionário, com as mesmas regras do csv.DictReader.
+def linha_como_dicionario(cabecalho, valores):
+    linha = dict(zip(cabecalho, valores))
+    if len(valores) > len(cabecalho):
+        linha[None] = valores[len(cabecalho):]
+    elif len(valores) < len(cabecalho):
+        for coluna in cabecalho[len(valores):]:
+            linha[coluna] = None
+    return linha
+
+# Devolve uma função que converte os valores de uma linha num dicionário só com as colunas do cabeçalho
+# que estão em 'colunas' (um conjunto de nomes; None para todas). Os pares (nome, posição) dessas colunas
+# são escolhidos uma só vez, o que é bem mais rápido do que montar a linha completa. As linhas com campos
+# a menos ou a mais ficam completas, como em linha_como_dicionario.
+def projetor_de_linhas(cabecalho, colunas=None):
+    if colunas is None:
+        return lambda valores: linha_como_dicionario(cabecalho, valores)
+    escolhidas = [(nome, i) for i, nome in enumerate(cabecalho) if nome in colunas]
+    numero_colunas = len(cabecalho)
+    def converter(valores):
+        if len(valores) == numero_colunas:
+            return {nome: valores[i] for nome, i in escolhidas}
+        return linha_como_dicionario(cabecalho, valores)
+    return converter
+
+def _mapear(f):
+    # Um ficheiro vazio não pode ser mapeado.
+    if os.fstat(f.fileno()).st_size == 0:
+        return None
+    return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+def _ler_cabecalho(mapa):
+    mapa.seek(0)
+    primeira_linha = mapa.readline()
+    return next(csv.reader([primeira_linha.decode('utf-8')]), []), mapa.tell()
+
+# Devolve o cabeçalho (lista de colunas) de uma tabela.
+def ler_cabecalho(arquivo):
+    with open(arquivo, 'rb') as f:
+        mapa = _mapear(f)
+        if mapa is None:
+            return []
+        with mapa:
+            return _ler_cabecalho(mapa)[0]
+
+# Lê as linhas de dados entre os bytes 'inicio' e 'fim' (por omissão, a tabela toda) como dicionários.
+# 'inicio' e 'fim' têm de ser inícios de linhas de dados (ex.: valores da tabela de offsets).
+# Com 'colunas' (um conjunto de nomes), as linhas só têm essas colunas (ver projetor_de_linhas).
+# Se for passado um dicionário em 'estatisticas', acumula em 'bytes_lidos' os bytes lidos do ficheiro.
+def varrer(arquivo, inicio=None, fim=None, estatisticas=None, colunas=None):
+    converter = None
+    for valores in varrer_valores(arquivo, inicio, fim, estatisticas):
+        if converter is None:
+            converter = projetor_de_linhas(ler_cabecalho(arquivo), colunas)
+        yield converter(valores)
+
+# Como varrer, mas devolve a lista de valores de cada linha (sem a converter num dicionário).
+def varrer_valores(arquivo, inicio=None, fim=None, estatisticas=None):
+    with open(arquivo, 'rb') as f:
+        mapa = _mapear(f)
+        if mapa is None:
+            return
+        with mapa:
+            _, fim_cabecalho = _ler_cabecalho(mapa)
+            mapa.seek(fim_cabecalho if inicio is None else inicio)
+            limite = len(mapa) if fim is None else fim
+
+            def linhas_de_texto():
+                while mapa.tell() < limite:
+                    yield mapa.readline().decode('utf-8')
+
+            try:
+                for valores in csv.reader(linhas_de_texto()):
+                    if valores:
+                        yield valores
+            finally:
+                if estatisticas is not None:
+                    lidos = mapa.tell() - (0 if inicio is None else inicio)
+                    estatisticas['bytes_lidos'] = estatisticas.get('bytes_lidos', 0) + lidos
+
+def _registo_no_offset(mapa, offset):
+    mapa.seek(offset)
+    partes, aspas = [], 0
+    while True:
+        linha_bruta = mapa.readline()
+        if not linha_bruta:
+            break
+        partes.append(linha_bruta)
+        aspas += linha_bruta.count(b'"')
+        if aspas % 2 == 0:
+            break
+    texto = b''.join(partes).decode('utf-8')
+    return next(csv.reader(io.StringIO(texto, newline='')), [])
+
+# Lê as linhas que começam nos offsets indicados (pela ordem dada).
+# Se for passado um dicionário em 'estatisticas', acumula em 'bytes_lidos' os bytes lidos do ficheiro.
+def ler_linhas_nos_offsets(arquivo, offsets, estatisticas=None):
+    with open(arquivo, 'rb') as f:
+        mapa = _mapear(f)
+        if mapa is None:
+            return
+        with mapa:
+            cabecalho, fim_cabecalho = _ler_cabecalho(mapa)
+            lidos = fim_cabecalho
+            try:
+                for offset in offsets:
+                    valores = _registo_no_offset(mapa, offset)
+                    lidos += mapa.tell() - offset
+                    yield linha_como_dicionario(cabecalho, valores)
+            finally:
+                if estatisticas is not None:
+                    estatisticas['bytes_lidos'] = estatisticas.get('bytes_lidos', 0) + lidos
+
+# Converte offsets de inícios de linhas (ex.: devolvidos por um índice) nos números dessas linhas.
+def numeros_das_linhas(arquivo, offsets):
+    tabela = obter_offsets(arquivo)
+    return [bisect.bisect_left(tabela, offset) for offset in offsets]
+
+# Percorre o mapa e calcula o offset do início de cada linha de dados.
+# Um registo só termina numa quebra de linha quando o número de aspas até ali é par
+# (campos entre aspas podem conter quebras de linha). As linhas em branco são ignoradas, como no csv.DictReader.
+def _calcular_offsets(mapa):
+    offsets = array.array('Q')
+    _, posicao = _ler_cabecalho(mapa)
+    tamanho = len(mapa)
+    inicio_registo, aspas_abertas = posicao, False
+    while posicao < tamanho:
+        fim_linha = mapa.find(b'\n', posicao)
+        fim_linha = tamanho if fim_linha == -1 else fim_linha + 1
+        if mapa.find(b'"', posicao, fim_linha) != -1 and mapa[posicao:fim_linha].count(b'"') % 2:
+            aspas_abertas = not aspas_abertas
+        if not aspas_abertas:
+            if mapa[inicio_registo:fim_linha].strip(b'\r\n'):
+                offsets.append(inicio_registo)
+            inicio_registo = fim_linha
+        posicao = fim_linha
+    return offsets
+
+# Grava os offsets ao lado do CSV. São só uma aceleração: se não puderem ser gravados (ex.: diretório só
+# de leitura, disco cheio), ficam apenas em memória.
+def _gravar_offsets(arquivo, assinatura, offsets):
+    temporario = f'{caminho_offsets(arquivo)}.{os.getpid()}.tmp'
+    try:
+        with open(temporario, 'wb') as f:
+            f.write(_CABECALHO_OFFSETS.pack(_MAGICO, *assinatura))
+            offsets.tofile(f)
+        os.replace(temporario, caminho_offsets(arquivo))
+    except OSError:
+        try:
+            os.remove(temporario)
+        except OSError:
+            pass
+
+def _carregar_offsets(arquivo, assinatura):
+    try:
+        with open(caminho_offsets(arquivo), 'rb') as f:
+            mapa = _mapear(f)
+    except FileNotFoundError:
+        return None
+    if mapa is None or len(mapa) < _CABECALHO_OFFSETS.size:
+        return None
+    magico, *assinatura_gravada = _CABECALHO_OFFSETS.unpack_from(mapa)
+    if magico != _MAGICO or tuple(assinatura_gravada) != tuple(assinatura):
+        return None
+    # A vista sobre o mapa não copia os dados: as páginas ficam partilhadas com outros processos.
+    return memoryview(mapa)[_CABECALHO_OFFSETS.size:].cast('Q')
+
+# Devolve a tabela de offsets das linhas de dados do CSV (uma sequência de inteiros).
+# Usa a versão já carregada ou gravada enquanto a assinatura do CSV coincidir; senão calcula-a de novo.
+def obter_offsets(arquivo):
+    assinatura = assinatura_ficheiro(arquivo)
+    carregado = _carregados.get(arquivo)
+    if carregado is not None and carregado[0] == assinatura:
+        return carregado[1]
+
+    offsets = None
+    if configuracao.PERSISTIR_OFFSETS:
+        offsets = _carregar_offsets(arquivo, assinatura)
+    if offsets is None:
+        with open(arquivo, 'rb') as f:
+            mapa = _mapear(f)
+            if mapa is None:
+                offsets = array.array('Q')
+            else:
+                with mapa:
+                    offsets = _calcular_offsets(mapa)
+        if configuracao.PERSISTIR_OFFSETS:
+            _gravar_offsets(arquivo, assinatura, offsets)
+    _carregados[arquivo] = (assinatura, offsets)
+    return offsets
+
+# Divide as linhas de dados em (no máximo) 'numero_partes' intervalos de bytes [inicio, fim) com
+# aproximadamente o mesmo número de linhas. Cada intervalo começa exatamente no início de uma linha.
+# Devolve também o número da primeira linha de cada intervalo.
+def dividir_em_partes(arquivo, numero_partes):
+    offsets = obter_offsets(arquivo)
+    total = len(offsets)
+    if total == 0:
+        return []
+    tamanho = os.path.getsize(arquivo)
+    passo = -(-total // numero_partes)
+    partes = []
+    for primeira in range(0, total, passo):
+        seguinte = primeira + passo
+        fim = offsets[seguinte] if seguinte < total else tamanho
+        partes.append((offsets[primeira], fim, primeira))
+    return partes
+
+def _assinatura_gravada(arquivo):
+    try:
+        with open(caminho_offsets(arquivo), 'rb') as f:
+            dados = f.read(_CABECALHO_OFFSETS.size)
+    except FileNotFoundError:
+        return None
+    if len(dados) < _CABECALHO_OFFSETS.size:
+        return None
+    magico, *assinatura = _CABECALHO_OFFSETS.unpack(dados)
+    return tuple(assinatura) if magico == _MAGICO else None
+
+# Acrescenta à tabela de offsets as linhas que acabaram de ser escritas no fim do CSV.
+# Só é possível se a tabela correspondia à versão do ficheiro anterior à escrita; senão é descartada.
+def registrar_insercao(arquivo, assinatura_anterior, novos_offsets):
+    carregado = _carregados.pop(arquivo, None)
+    assinatura = assinatura_ficheiro(arquivo)
+    if configuracao.PERSISTIR_OFFSETS:
+        if _assinatura_gravada(arquivo) != tuple(assinatura_anterior):
+            invalidar(arquivo)
+            return
+        # Primeiro os offsets e só depois a assinatura nova: se algo falhar a meio, a tabela
+        # fica com a assinatura antiga e é simplesmente recalculada.
+        with open(caminho_offsets(arquivo), 'r+b') as f:
+            f.seek(0, os.SEEK_END)
+            array.array('Q', novos_offsets).tofile(f)
+            f.seek(0)
+            f.write(_CABECALHO_OFFSETS.pack(_MAGICO, *assinatura))
+    elif carregado is not None and carregado[0] == assinatura_anterior:
+        offsets = array.array('Q', carregado[1])
+        offsets.extend(novos_offsets)
+        _carregados[arquivo] = (assinatura, offsets)
+
+# Descarta a tabela de offsets (depois de uma escrita que reescreve o ficheiro).
+def invalidar(arquivo):
+    _carregados.pop(arquivo, None)
+    try:
+        os.remove(caminho_offsets(arquivo))
+    except FileNotFoundError:
+        pass
@@ -1,3 +1,7 @@
+import hashlib
+import os
+import sys
+
 import ply.lex as lex
 
 # Dicionário de palavras-chave da nossa linguagem SQL.
@@ -28,7 +32,14 @@ keywords = {
     'left': 'LEFT',
     'limit': 'LIMIT',
     'distinct': 'DISTINCT',
-    'like': 'LIKE'
+    'like': 'LIKE',
+    'create': 'CREATE',
+    'drop': 'DROP',
+    'index': 'INDEX',
+    'vacuum': 'VACUUM',
+    'copy': 'COPY',
+    'explain': 'EXPLAIN',
+    'analyze': 'ANALYZE'
 }
 
 tokens = [
@@ -38,6 +49,7 @@ tokens = [
     'EQ', 'NEQ', 'GT', 'LT', 'GE', 'LE',
     'COMMA', 'LPAREN', 'RPAREN',
     'TIMES',
+    'PARAMETRO',
 ] + list(keywords.values())
 
 t_EQ = r'='
@@ -65,6 +77,13 @@ def t_STRING_LITERAL(t):
     t.value = t.value[1:-1]  # Remove as aspas.
     return t
 
+# Regra para parâmetros de instruções preparadas: '?' (posicional) ou ':nome' (nomeado).
+# O valor guarda o nome (None para '?') e a posição no texto, usada para numerar os '?' pela ordem em que aparecem.
+def t_PARAMETRO(t):
+    r'\?|:[a-zA-Z_][a-zA-Z0-9_]*'
+    t.value = {'parametro': t.value[1:] if t.value != '?' else None, 'posicao': t.lexpos}
+    return t
+
 # Regra para números (int ou float).
 def t_NUMBER(t):
     r'\d+\.?\d*'
@@ -84,4 +103,55 @@ def t_error(t):
     print(f"Caracter inválido: {t.value[0]}")
     t.lexer.skip(1)
 
-lexer = lex.lex()
\ No newline at end of file
+# O lexer só é construído na primeira utilização, e a partir das tabelas já geradas em lextab.py
+# (modo optimize do PLY: sem validar as regras nem ler o código-fonte). As tabelas são regeneradas com
+# 'python parser_sql.py' depois de alterar as regras acima; lextab.py guarda também a assinatura das
+# regras de que foi gerado e, se ela não coincidir com a das regras atuais (um token, uma expressão
+# regular ou a ordem das regras mudou), o lexer é construído a partir das regras sem gravar nada.
+_DIRETORIO = os.path.dirname(os.path.abspath(__file__))
+_lexer = None
+
+# Assinatura das regras que o PLY grava em lextab.py: os tokens, os literais e a expressão regular de cada
+# regra t_, com as funções pela ordem em que estão definidas (a ordem em que o PLY as tenta).
+def _assinatura_regras():
+    regras = [(nome, valor) for nome, valor in globals().items() if nome.startswith('t_')]
+    funcoes = sorted((valor for _, valor in regras if callable(valor)), key=lambda funcao: funcao.__code__.co_firstlineno)
+    partes = (
+        sorted(tokens),
+        globals().get('literals', ''),
+        [(funcao.__name__, getattr(funcao, 'regex', funcao.__doc__)) for funcao in funcoes],
+        sorted((nome, valor) for nome, valor in regras if isinstance(valor, str)),
+    )
+    return hashlib.sha256(repr(partes).encode('utf-8')).hexdigest()
+
+def _tabela_atualizada():
+    try:
+        import lextab
+    except ImportError:
+        return False
+    return getattr(lextab, '_assinatura_regras', None) == _assinatura_regras()
+
+def obter_lexer():
+    global _lexer
+    if _lexer is None:
+        modulo = sys.modules[__name__]
+        if _tabela_atualizada():
+            _lexer = lex.lex(module=modulo, optimize=True, lextab='lextab')
+        else:
+            _lexer = lex.lex(module=modulo)
+    return _lexer
+
+# Gera de novo lextab.py a partir das regras, com a assinatura delas no fim.
+def gerar_tabelas():
+    global _lexer
+    _lexer = lex.lex(module=sys.modules[__name__])
+    _lexer.writetab('lextab', _DIRETORIO)
+    with open(os.path.join(_DIRETORIO, 'lextab.py'), 'a', encoding='utf-8') as f:
+        f.write(f"_assinatura_regras = {_assinatura_regras()!r}\n")
+    return _lexer
+
+# Mantém 'from lexer import lexer' a funcionar, construindo o lexer só quando é pedido.
+def __getattr__(nome):
+    if nome == 'lexer':
+        return obter_lexer()
+    raise AttributeError(f"module {__name__!r} has no attribute {nome!r}")
\ No newline at end of file
@@ -0,0 +1,11 @@
+# lextab.py. This file automatically created by PLY (version 3.11). Don't edit!
+_tabversion   = '3.10'
+_lextokens    = set(('ANALYZE', 'AND', 'ASC', 'AVG', 'BY', 'COMMA', 'COPY', 'COUNT', 'CREATE', 'DELETE', 'DESC', 'DISTINCT', 'DROP', 'EQ', 'EXPLAIN', 'FROM', 'GE', 'GROUP', 'GT', 'IDENTIFIER', 'INDEX', 'INSERT', 'INTO', 'JOIN', 'LE', 'LEFT', 'LIKE', 'LIMIT', 'LPAREN', 'LT', 'NEQ', 'NOT', 'NUMBER', 'ON', 'OR', 'ORDER', 'PARAMETRO', 'RPAREN', 'SELECT', 'SET', 'STRING_LITERAL', 'SUM', 'TIMES', 'UPDATE', 'VACUUM', 'VALUES', 'WHERE'))
+_lexreflags   = 64
+_lexliterals  = ''
+_lexstateinfo = {'INITIAL': 'inclusive'}
+_lexstatere   = {'INITIAL': [('(?P<t_IDENTIFIER>[a-zA-Z_][a-zA-Z0-9_]*)|(?P<t_STRING_LITERAL>\\"[^\\"]*\\"|\\\'[^\\\']*\\\')|(?P<t_PARAMETRO>\\?|:[a-zA-Z_][a-zA-Z0-9_]*)|(?P<t_NUMBER>\\d+\\.?\\d*)|(?P<t_newline>\\n+)|(?P<t_GE>>=)|(?P<t_LE><=)|(?P<t_LPAREN>\\()|(?P<t_NEQ>!=)|(?P<t_RPAREN>\\))|(?P<t_TIMES>\\*)|(?P<t_COMMA>,)|(?P<t_EQ>=)|(?P<t_GT>>)|(?P<t_LT><)', [None, ('t_IDENTIFIER', 'IDENTIFIER'), ('t_STRING_LITERAL', 'STRING_LITERAL'), ('t_PARAMETRO', 'PARAMETRO'), ('t_NUMBER', 'NUMBER'), ('t_newline', 'newline'), (None, 'GE'), (None, 'LE'), (None, 'LPAREN'), (None, 'NEQ'), (None, 'RPAREN'), (None, 'TIMES'), (None, 'COMMA'), (None, 'EQ'), (None, 'GT'), (None, 'LT')])]}
+_lexstateignore = {'INITIAL': ' \t'}
+_lexstateerrorf = {'INITIAL': 't_error'}
+_lexstateeoff = {}
+_assinatura_regras = '5e1a3bedd740fabd7d75ce0eb549bb39e00fcf3bc9f797ccb7a77cede29c8a7f'
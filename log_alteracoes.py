@@ -0,0 +1,147 @@
+# Registo (log) de alterações de cada tabela, usado por UPDATE e DELETE em vez de reescreverem o CSV.
+#
+# O log fica em '<tabela>.csv.log', em JSON Lines. A primeira linha identifica o CSV base (o seu inode);
+# as seguintes são registos acrescentados no fim:
+#   {"op": "D", "linha": N}                      -> a linha de dados N foi removida
+#   {"op": "U", "linha": N, "valores": {...}}    -> a linha N passou a ter estes valores
+# onde N é o número da linha no CSV base (a sua posição na tabela de offsets de leitor_mmap).
+# As leituras juntam o log às linhas do CSV no momento da leitura. A compactação (VACUUM) escreve uma
+# nova versão do CSV já com as alterações aplicadas e troca-a pela antiga de forma atómica; como o
+# ficheiro novo tem outro inode, um log antigo que tenha ficado para trás deixa de ser aplicado.
+import csv
+import json
+import os
+
+import configuracao
+import leitor_mmap
+from cache_tabelas import assinatura_ficheiro
+
+# caminho do log -> (assinatura do log, alterações)
+_carregados = {}
+
+def caminho_log(arquivo):
+    return f"{arquivo}.log"
+
+# Assinatura do log (tamanho, mtime, inode), ou None se a tabela não tem log.
+def assinatura_log(arquivo):
+    try:
+        estado = os.stat(caminho_log(arquivo))
+    except FileNotFoundError:
+        return None
+    return (estado.st_size, estado.st_mtime_ns, estado.st_ino)
+
+# Assinatura da versão atual da tabela: a do CSV seguida da do log (se existir), como lista.
+def assinatura_tabela(arquivo):
+    return list(assinatura_ficheiro(arquivo)) + list(assinatura_log(arquivo) or ())
+
+def _log_pertence_ao_csv(cabecalho_log, arquivo):
+    return cabecalho_log.get('inode') == os.stat(arquivo).st_ino
+
+# Devolve as alterações pendentes da tabela: {numero_da_linha: None (removida) ou dicionário de valores}.
+def carregar(arquivo):
+    assinatura = assinatura_log(arquivo)
+    if assinatura is None:
+        return {}
+    caminho = caminho_log(arquivo)
+    carregado = _carregados.get(caminho)
+    if carregado is not None and carregado[0] == assinatura:
+        return carregado[1]
+
+    alteracoes = {}
+    with open(caminho, encoding='utf-8') as f:
+        primeira_linha = f.readline()
+        if primeira_linha and _log_pertence_ao_csv(json.loads(primeira_linha), arquivo):
+            for texto in f:
+                registo = json.loads(texto)
+                if registo['op'] == 'D':
+                    alteracoes[registo['linha']] = None
+                else:
+                    alteracoes[registo['linha']] = registo['valores']
+    _carregados[caminho] = (assinatura, alteracoes)
+    return alteracoes
+
+# Aplica as alterações a uma sequência de (numero, linha) do CSV base: as linhas removidas desaparecem
+# e as atualizadas são trocadas pelos seus novos valores.
+def aplicar(linhas_numeradas, alteracoes):
+    if not alteracoes:
+        yield from linhas_numeradas
+        return
+    for numero, linha in linhas_numeradas:
+        if numero in alteracoes:
+            valores = alteracoes[numero]
+            if valores is None:
+                continue
+            linha = dict(valores)
+        yield numero, linha
+
+# Percorre as linhas atuais da tabela (CSV base mais log), com o número de cada uma.
+# 'inicio', 'fim' e 'primeira' permitem ler só um intervalo (ver leitor_mmap.dividir_em_partes).
+def varrer_mescladas(arquivo, inicio=None, fim=None, primeira=0):
+    linhas = enumerate(leitor_mmap.varrer(arquivo, inicio, fim), start=primeira)
+    return aplicar(linhas, carregar(arquivo))
+
+# Acrescenta registos ao log da tabela, criando-o (ou substituindo um log antigo de outra versão do CSV).
+def _acrescentar(arquivo, registos):
+    if not registos:
+        return
+    caminho = caminho_log(arquivo)
+    modo = 'a'
+    try:
+        with open(caminho, encoding='utf-8') as f:
+            primeira_linha = f.readline()
+        if not primeira_linha or not _log_pertence_ao_csv(json.loads(primeira_linha), arquivo):
+            modo = 'w'
+    except FileNotFoundError:
+        modo = 'w'
+
+    with open(caminho, modo, encoding='utf-8') as f:
+        if modo == 'w':
+            f.write(json.dumps({'inode': os.stat(arquivo).st_ino}) + '\n')
+        f.write(''.join(json.dumps(registo, ensure_ascii=False) + '\n' for registo in registos))
+
+# Regista a remoção das linhas com os números indicados.
+def registrar_remocoes(arquivo, numeros):
+    _acrescentar(arquivo, [{'op': 'D', 'linha': numero} for numero in numeros])
+
+# Regista os novos valores de linhas atualizadas: lista de (numero, dicionário de valores).
+def registrar_atualizacoes(arquivo, atualizacoes):
+    _acrescentar(arquivo, [{'op': 'U', 'linha': numero, 'valores': valores} for numero, valores in atualizacoes])
+
+# Indica se o log já cresceu o suficiente, em relação ao CSV, para valer a pena compactar.
+def precisa_compactar(arquivo):
+    assinatura = assinatura_log(arquivo)
+    if assinatura is None or assinatura[0] < configuracao.LOG_COMPACTACAO_MINIMO_BYTES:
+        return False
+    return assinatura[0] >= configuracao.LOG_COMPACTACAO_FRACAO * os.path.getsize(arquivo)
+
+# Compacta a tabela (VACUUM): escreve o CSV com as alterações do log já aplicadas num ficheiro temporário,
+# troca-o pelo original de forma atómica e apaga o log. Devolve o número de linhas da nova versão.
+def compactar(arquivo):
+    cabecalho = leitor_mmap.ler_cabecalho(arquivo)
+    # O nome do ficheiro temporário leva o pid, para que dois processos a compactar a mesma tabela (ex.: o
+    # main.py e o servidor.py) não escrevam no mesmo ficheiro.
+    temporario = f'{arquivo}.{os.getpid()}.tmp'
+    total = 0
+    if not cabecalho:
+        # Tabela vazia (sem cabeçalho): não há linhas às quais aplicar o log.
+        _remover_log(arquivo)
+        return total
+    with open(temporario, 'w', newline='', encoding='utf-8') as f:
+        escritor = csv.writer(f)
+        escritor.writerow(cabecalho)
+        for _, linha in varrer_mescladas(arquivo):
+            # Campos em falta ficam vazios; campos a mais (chave None do DictReader) são mantidos.
+            escritor.writerow([linha.get(coluna) for coluna in cabecalho] + list(linha.get(None) or []))
+            total += 1
+    # A troca é atómica; se o processo parar antes de o log ser apagado, o log fica a apontar para o
+    # inode do CSV antigo e é ignorado.
+    os.replace(temporario, arquivo)
+    _remover_log(arquivo)
+    return total
+
+def _remover_log(arquivo):
+    _carregados.pop(caminho_log(arquivo), None)
+    try:
+        os.remove(caminho_log(arquivo))
+    except FileNotFoundError:
+        pass
@@ -0,0 +1,237 @@
+# Execução em lote de várias instruções SQL (ex.: um script .sql), com leituras partilhadas.
+#     python lote.py consultas.sql
+#     lote.executar_lote(["SELECT ...", "UPDATE ...", ...])
+#
+# As instruções são todas analisadas antes de se executar a primeira. Cada sequência de SELECT seguidos
+# é executada em conjunto: os SELECT sem JOIN sobre a mesma tabela partilham uma única leitura dela, em
+# que cada bloco de linhas lido passa pelo WHERE e pela projeção ou agregação de todos eles (como na
+# leitura paralela, os acumuladores de cada grupo vão sendo atualizados bloco a bloco). O DISTINCT, o
+# ORDER BY e o LIMIT de cada SELECT são aplicados depois, pela ordem habitual. As outras instruções
+# (INSERT, UPDATE, DELETE, COPY, VACUUM, ANALYZE, índices, EXPLAIN) são barreiras: os SELECT anteriores
+# são executados antes delas e os seguintes só depois. Os resultados são impressos pela ordem do script.
+#
+# Continuam a ser executados sozinhos, como em executar(): os SELECT com JOIN, os que podem usar um
+# índice, os que vão para o motor NumPy ou para a leitura paralela, e o SELECT que é o único da sua
+# tabela no grupo. Um SELECT cuja avaliação falha na leitura partilhada (ex.: WHERE que compara texto
+# com um número) ou que guarda linhas ou grupos a mais (configuracao.LOTE_MAXIMO_LINHAS_GUARDADAS) também é
+# executado sozinho no fim do grupo, por isso o resultado (ou a mensagem de erro) é sempre o mesmo.
+import argparse
+import contextlib
+import io
+import itertools
+import os
+import sys
+
+import colunar
+import configuracao
+import indices
+import paralelo
+from executor import (agregacoes_da_consulta, colunas_referenciadas, executar, executar_select, filtro_da_consulta,
+                      get_csv_path, projetar_linhas, varrer_tabela)
+from operadores import acumular_grupos, finalizar_grupos, ordenar_linhas
+from preparadas import analisar
+
+# Linhas lidas de cada vez na leitura partilhada e passadas a todas as consultas.
+_TAMANHO_BLOCO = 4096
+
+# Divide um script em instruções, nos ';' que não estão dentro de strings. Os comentários '--' (até ao
+# fim da linha, fora das strings) são ignorados. Devolve a lista das instruções não vazias.
+def dividir_instrucoes(texto):
+    instrucoes, atual = [], []
+    aspas = None
+    i = 0
+    while i < len(texto):
+        caractere = texto[i]
+        if aspas:
+            if caractere == aspas:
+                aspas = None
+        elif caractere in "'\"":
+            aspas = caractere
+        elif caractere == '-' and texto.startswith('--', i):
+            fim = texto.find('\n', i)
+            i = len(texto) if fim < 0 else fim
+            continue
+        elif caractere == ';':
+            instrucoes.append(''.join(atual).strip())
+            atual = []
+            i += 1
+            continue
+        atual.append(caractere)
+        i += 1
+    instrucoes.append(''.join(atual).strip())
+    return [instrucao for instrucao in instrucoes if instrucao]
+
+# Uma consulta a ser alimentada pela leitura partilhada: aplica o WHERE e a projeção ou agregação a cada
+# bloco de linhas e guarda o resultado até ao fim da leitura.
+class _ConsultaPartilhada:
+    def __init__(self, consulta):
+        self.consulta = consulta
+        self.filtro = filtro_da_consulta(consulta)
+        colunas_solicitadas = consulta['columns']
+        self.agregada = bool(consulta['group_by']) or any(isinstance(coluna, dict) for coluna in colunas_solicitadas)
+        self.agregacoes = agregacoes_da_consulta(consulta) if self.agregada else None
+        self.grupos = {}
+        self.linhas = []
+        self.nomes_colunas = colunas_solicitadas if colunas_solicitadas[0] != '*' else None
+        # Sem DISTINCT nem ORDER BY, o LIMIT diz quantas linhas chegam; com ORDER BY e LIMIT, só as melhores
+        # 'limit' linhas lidas até agora podem vir a fazer parte do resultado (top-K).
+        limite = consulta.get('limit')
+        simples = not self.agregada and not consulta.get('distinct')
+        self.limite = limite if simples and not consulta.get('order_by') else None
+        self.limite_ordenado = limite if simples and consulta.get('order_by') else None
+        self.concluida = False
+        # True se tem de ser executada sozinha (a avaliação falhou ou guardou linhas a mais).
+        self.sozinha = False
+
+    def consumir(self, bloco):
+        linhas = filter(self.filtro, bloco) if self.filtro is not None else bloco
+        if self.agregada:
+            acumular_grupos(linhas, self.consulta['group_by'], self.agregacoes, self.grupos)
+            if len(self.grupos) > configuracao.LOTE_MAXIMO_LINHAS_GUARDADAS:
+                self.desistir()
+            return
+        linhas = list(linhas)
+        if linhas and self.nomes_colunas is None:
+            # SELECT *: as colunas são as da primeira linha, como em projetar_linhas.
+            self.nomes_colunas = list(linhas[0].keys())
+        self.linhas.extend(projetar_linhas(linhas, self.nomes_colunas))
+        if self.limite is not None and len(self.linhas) >= self.limite:
+            del self.linhas[self.limite:]
+            self.concluida = True
+        elif self.limite_ordenado is not None and len(self.linhas) >= 2 * self.limite_ordenado + _TAMANHO_BLOCO:
+            # As linhas descartadas não estão entre as 'limit' primeiras; a ordenação é estável, por isso as
+            # que ficam mantêm a ordem de chegada entre empatadas.
+            self.linhas = ordenar_linhas(self.linhas, self.consulta['order_by'], self.limite_ordenado)
+        if len(self.linhas) > configuracao.LOTE_MAXIMO_LINHAS_GUARDADAS:
+            self.desistir()
+
+    def desistir(self):
+        self.sozinha = self.concluida = True
+        self.grupos, self.linhas = {}, []
+
+    # Linhas do SELECT depois das etapas 1 a 3 (ver executor.construir_select).
+    def linhas_calculadas(self):
+        if self.agregada:
+            return finalizar_grupos(self.grupos, self.consulta['group_by'], self.agregacoes)
+        return iter(self.linhas)
+
+# Indica se um SELECT pode entrar numa leitura partilhada: tem de ler a tabela inteira em série no
+# motor de linhas.
+def _partilhavel(consulta):
+    if consulta['join']:
+        return False
+    arquivo = get_csv_path(consulta['table'])
+    if not os.path.exists(arquivo):
+        return False
+    if consulta['where'] is not None and indices.procurar(arquivo, consulta['where']) is not None:
+        return False
+    if configuracao.MOTOR_EXECUCAO == 'numpy':
+        import motor_numpy
+        if motor_numpy.aplicavel(arquivo):
+            return False
+    return not (paralelo.deve_paralelizar(arquivo) and not colunar.disponivel(arquivo))
+
+# Lê a tabela uma vez e passa cada bloco de linhas a todas as consultas que ainda não terminaram.
+# Se a leitura falhar, todas as consultas passam a ser executadas sozinhas.
+def _ler_partilhada(nome_tabela, consultas):
+    colunas = set()
+    for consulta in consultas:
+        usadas = colunas_referenciadas(consulta.consulta)
+        if usadas is None:
+            colunas = None
+            break
+        colunas |= usadas
+    linhas = varrer_tabela(nome_tabela, colunas=colunas)
+    try:
+        while True:
+            pendentes = [consulta for consulta in consultas if not consulta.concluida]
+            bloco = list(itertools.islice(linhas, _TAMANHO_BLOCO)) if pendentes else None
+            if not bloco:
+                break
+            for consulta in pendentes:
+                try:
+                    consulta.consumir(bloco)
+                except Exception:
+                    consulta.desistir()
+    except Exception:
+        for consulta in consultas:
+            consulta.desistir()
+    finally:
+        linhas.close()
+
+# Executa um grupo de SELECT seguidos, partilhando as leituras, e imprime os resultados pela ordem do grupo.
+def _executar_selects(grupo, ecoar, estatisticas):
+    partilhadas = {}
+    por_tabela = {}
+    for posicao, (_, consulta) in enumerate(grupo):
+        if _partilhavel(consulta):
+            por_tabela.setdefault(consulta['table'], []).append(posicao)
+    for nome_tabela, posicoes in por_tabela.items():
+        if len(posicoes) < 2:
+            continue
+        consultas = [_ConsultaPartilhada(grupo[posicao][1]) for posicao in posicoes]
+        _ler_partilhada(nome_tabela, consultas)
+        partilhadas.update(zip(posicoes, consultas))
+        if estatisticas is not None:
+            estatisticas['leituras_partilhadas'] = estatisticas.get('leituras_partilhadas', 0) + 1
+            estatisticas['consultas_partilhadas'] = estatisticas.get('consultas_partilhadas', 0) + len(posicoes)
+
+    for posicao, (sql, consulta) in enumerate(grupo):
+        if ecoar:
+            print(f"\n> Executando: {sql}")
+        partilhada = partilhadas.get(posicao)
+        if partilhada is not None and not partilhada.sozinha:
+            executar_select(consulta, linhas_calculadas=partilhada.linhas_calculadas())
+        else:
+            executar_select(consulta)
+
+# Executa uma lista de instruções SQL (texto) pela ordem dada, partilhando as leituras das tabelas entre os
+# SELECT seguidos. Com 'ecoar', cada resultado é precedido da instrução, como no main.py. Se for passado um
+# dicionário em 'estatisticas', regista nele o número de leituras partilhadas e das consultas que as usaram.
+def executar_lote(instrucoes, ecoar=True, estatisticas=None):
+    # Todas as instruções são analisadas primeiro; as mensagens de erro de sintaxe são guardadas para
+    # serem impressas no lugar da instrução.
+    analisadas = []
+    for sql in instrucoes:
+        mensagens = io.StringIO()
+        try:
+            with contextlib.redirect_stdout(mensagens):
+                consulta = analisar(sql)
+        except ValueError as e:
+            consulta = None
+            mensagens.write(f"ERRO: {e}\n")
+        analisadas.append((sql, consulta, mensagens.getvalue()))
+
+    grupo = []
+    for sql, consulta, mensagens in analisadas:
+        if consulta is not None and consulta['type'] == 'select':
+            grupo.append((sql, consulta))
+            continue
+        _executar_selects(grupo, ecoar, estatisticas)
+        grupo = []
+        if ecoar:
+            print(f"\n> Executando: {sql}")
+        if consulta is None:
+            print(mensagens, end='')
+        else:
+            executar(consulta)
+    _executar_selects(grupo, ecoar, estatisticas)
+
+# Lê um script .sql e executa as suas instruções em lote.
+def executar_script(caminho, ecoar=True, estatisticas=None):
+    with open(caminho, encoding='utf-8') as f:
+        texto = f.read()
+    executar_lote(dividir_instrucoes(texto), ecoar, estatisticas)
+
+def main():
+    argumentos = argparse.ArgumentParser(description="Executa um script SQL, partilhando as leituras das tabelas.")
+    argumentos.add_argument('script', help="ficheiro .sql com as instruções separadas por ';'")
+    argumentos.add_argument('--sem-eco', action='store_true', help="não imprime cada instrução antes do resultado")
+    opcoes = argumentos.parse_args()
+    try:
+        executar_script(opcoes.script, ecoar=not opcoes.sem_eco)
+    except FileNotFoundError:
+        sys.exit(f"ERRO: Ficheiro '{opcoes.script}' não encontrado.")
+
+if __name__ == '__main__':
+    main()
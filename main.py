@@ -1,4 +1,4 @@
-from parser_sql import parser
+from preparadas import analisar
 from executor import executar
 
 # Lista de consultas para demonstrar as funcionalidades do sistema
@@ -27,7 +27,7 @@ for sql in consultas:
         continue
     
     print(f"\n> Executando: {sql}")
-    ast = parser.parse(sql) # AST (Abstract Syntax Tree)
+    ast = analisar(sql) # AST (Abstract Syntax Tree), reaproveitada da cache se o texto se repetir
     
     # --- LINHA DE DEPURAÇÃO ---
     # print(f"--- [DEPURAÇÃO] AST Gerado: {ast} ---")
@@ -0,0 +1,298 @@
+# Motor de execução vetorizado (configuracao.MOTOR_EXECUCAO = 'numpy'), alternativo ao motor de linhas
+# do executor nos SELECTs sobre uma só tabela.
+#
+# Em vez de montar um dicionário por linha e avaliar o WHERE linha a linha, as colunas usadas são lidas
+# do ficheiro colunar (colunar.py) como vetores NumPy, sem cópia:
+#   - o WHERE é avaliado como uma máscara booleana: a comparação de uma coluna numérica com uma constante
+#     numérica é uma operação sobre o vetor; as outras condições (LIKE, colunas de texto) são avaliadas
+#     pela condição compilada do executor uma vez por valor distinto e espalhadas pelas linhas;
+#     AND, OR e NOT são &, | e ~ entre máscaras;
+#   - no GROUP BY os grupos são numerados com np.unique, os COUNT e as quantidades são calculados com
+#     np.bincount e os valores de cada SUM e AVG são ordenados por grupo e somados com
+#     operadores.soma_exata;
+#   - sem agregação, só as linhas selecionadas são convertidas em dicionários, que seguem para as
+#     etapas seguintes do SELECT (projeção, DISTINCT, ORDER BY, LIMIT).
+# O resultado é o do motor de linhas: as chaves dos grupos são o texto sem espaços nas pontas, os grupos
+# saem pela ordem em que aparecem e cada soma é exata, arredondada uma só vez, como no motor de linhas
+# (np.bincount e np.sum arredondariam a cada parcela e os reais podiam diferir).
+#
+# É usado quando o NumPy está instalado, a consulta não tem JOIN e a tabela não tem alterações pendentes
+# no log; o ficheiro colunar é construído se faltar. Se a tabela não puder ser convertida, ou a avaliação
+# vetorizada falhar (ex.: uma comparação entre texto e número), a consulta corre no motor de linhas, que
+# produz o resultado ou o erro habituais.
+import operator
+
+import colunar
+import log_alteracoes
+from operadores import soma_exata
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+# Linhas convertidas em dicionários de cada vez nas consultas sem agregação.
+_LINHAS_POR_BLOCO = 65536
+
+_COMPARADORES = {
+    '=': operator.eq,
+    '!=': operator.ne,
+    '>': operator.gt,
+    '<': operator.lt,
+    '>=': operator.ge,
+    '<=': operator.le
+}
+
+# Indica, sem ler a tabela, se um SELECT sem JOIN sobre 'arquivo' pode correr no motor vetorizado.
+def aplicavel(arquivo):
+    if np is None or log_alteracoes.carregar(arquivo):
+        return False
+    return colunar.disponivel(arquivo, construir_sempre=True)
+
+# Colunas da tabela colunar lidas como vetores NumPy, cada uma uma só vez por consulta.
+class _Colunas:
+    _TIPOS = {'int': 'int64', 'float': 'float64', 'str': 'uint32'}
+
+    def __init__(self, tabela, estatisticas=None):
+        self.tabela = tabela
+        self.linhas = tabela['cabecalho']['linhas']
+        self.nomes = [info['nome'] for info in tabela['cabecalho']['colunas']]
+        self._estatisticas = estatisticas
+        self._lidas = {}
+
+    # Devolve (tipo, vetor, dicionario) da coluna (ver colunar.coluna), ou None se a tabela não a tem.
+    def obter(self, nome):
+        if nome not in self._lidas:
+            lida = colunar.coluna(self.tabela, nome, self._estatisticas)
+            if lida is not None:
+                tipo, dados, dicionario = lida
+                if tipo not in self._TIPOS:
+                    # Uma coluna de texto sem dicionário ('texto') não tem vetor de códigos: a consulta
+                    # corre no motor de linhas.
+                    raise ValueError(f"A coluna {nome} não tem dicionário.")
+                lida = (tipo, np.frombuffer(dados, dtype=self._TIPOS[tipo]), dicionario)
+            self._lidas[nome] = lida
+        return self._lidas[nome]
+
+    # Devolve os valores distintos da coluna como texto (tal como no CSV) e, para cada linha, o índice do
+    # seu valor nessa lista. 'selecao' (índices de linhas) restringe as linhas; None usa todas.
+    def distintos(self, nome, selecao=None):
+        tipo, vetor, dicionario = self.obter(nome)
+        if selecao is not None:
+            vetor = vetor[selecao]
+        if tipo == 'str':
+            return dicionario, vetor
+        if tipo == 'float':
+            # Pelos bits, para 0.0 e -0.0 (textos diferentes) não se juntarem.
+            unicos, codigos = np.unique(vetor.view(np.int64), return_inverse=True)
+            return list(map(repr, unicos.view(np.float64).tolist())), codigos
+        unicos, codigos = np.unique(vetor, return_inverse=True)
+        return list(map(str, unicos.tolist())), codigos
+
+    # Valores da coluna nas linhas 'indices', como texto.
+    def textos(self, nome, indices):
+        tipo, vetor, dicionario = self.obter(nome)
+        valores = vetor[indices].tolist()
+        if tipo == 'int':
+            return map(str, valores)
+        if tipo == 'float':
+            return map(repr, valores)
+        return map(dicionario.__getitem__, valores)
+
+    # Devolve (numeros, validos): o valor de cada linha como real e se o motor de linhas o somaria
+    # (SUM e AVG ignoram os valores vazios e os que float() não converte).
+    def numeros(self, nome, selecao):
+        lida = self.obter(nome)
+        total = self.linhas if selecao is None else len(selecao)
+        if lida is None:
+            return np.zeros(total), np.zeros(total, dtype=bool)
+        tipo, vetor, dicionario = lida
+        if selecao is not None:
+            vetor = vetor[selecao]
+        if tipo != 'str':
+            return vetor.astype(np.float64), np.ones(total, dtype=bool)
+        numeros, validos = np.zeros(len(dicionario)), np.zeros(len(dicionario), dtype=bool)
+        for posicao, texto in enumerate(dicionario):
+            if not texto:
+                continue
+            try:
+                numeros[posicao] = float(texto)
+            except ValueError:
+                continue
+            validos[posicao] = True
+        return numeros[vetor], validos[vetor]
+
+    # Indica, para cada linha, se a coluna tem valor (o critério de COUNT(coluna)).
+    def preenchidos(self, nome, selecao):
+        lida = self.obter(nome)
+        total = self.linhas if selecao is None else len(selecao)
+        if lida is None:
+            return np.zeros(total, dtype=bool)
+        tipo, vetor, dicionario = lida
+        if tipo != 'str':
+            # O texto canónico de um número nunca é vazio.
+            return np.ones(total, dtype=bool)
+        if selecao is not None:
+            vetor = vetor[selecao]
+        return np.fromiter(map(bool, dicionario), dtype=bool, count=len(dicionario))[vetor]
+
+# Abre a tabela para o motor vetorizado, ou devolve None se a consulta tem de correr no motor de linhas.
+def _abrir(arquivo, leitura):
+    if np is None or log_alteracoes.carregar(arquivo):
+        return None
+    tabela = colunar.abrir(arquivo, leitura, construir_sempre=True)
+    if tabela is None:
+        return None
+    if leitura is not None:
+        leitura.update(fonte='colunar (NumPy)', bytes_lidos=leitura.get('bytes_lidos', 0))
+    return _Colunas(tabela, leitura)
+
+# Avalia a condição WHERE em todas as linhas e devolve a máscara booleana das que a satisfazem.
+def _mascara(colunas, cond):
+    from executor import compilar_condicao
+    operador = cond['operator']
+    if operador == 'AND':
+        return _mascara(colunas, cond['left']) & _mascara(colunas, cond['right'])
+    if operador == 'OR':
+        return _mascara(colunas, cond['left']) | _mascara(colunas, cond['right'])
+    if operador == 'NOT':
+        return ~_mascara(colunas, cond['condition'])
+
+    nome = cond['column']
+    lida = colunas.obter(nome)
+    if lida is None:
+        # Tal como no motor de linhas, uma coluna que não existe nunca satisfaz a condição.
+        return np.zeros(colunas.linhas, dtype=bool)
+    tipo, vetor, _ = lida
+    if tipo != 'str' and operador in _COMPARADORES:
+        try:
+            valor_condicao_num = float(cond['value'])
+        except (ValueError, TypeError):
+            valor_condicao_num = None
+        if valor_condicao_num is not None:
+            return _COMPARADORES[operador](vetor.astype(np.float64, copy=False), valor_condicao_num)
+
+    textos, codigos = colunas.distintos(nome)
+    condicao = compilar_condicao(cond)
+    satisfazem = np.fromiter((condicao({nome: texto}) for texto in textos), dtype=bool, count=len(textos))
+    return satisfazem[codigos]
+
+# Índices das linhas que satisfazem a condição, ou None (todas as linhas) se não há condição.
+def _selecionar(colunas, condicao):
+    if condicao is None:
+        return None
+    return np.flatnonzero(_mascara(colunas, condicao))
+
+# Numera os grupos de GROUP BY pela ordem em que aparecem nas linhas selecionadas.
+# Devolve o número do grupo de cada linha e a lista das chaves (tuplos de texto) de cada grupo.
+def _numerar_grupos(colunas, colunas_group_by, selecao, total):
+    partes = []
+    combinados = None
+    for nome in colunas_group_by:
+        if colunas.obter(nome) is None:
+            textos, codigos = [''], np.zeros(total, dtype=np.int64)
+        else:
+            textos, codigos = colunas.distintos(nome, selecao)
+        # Valores com o mesmo texto sem espaços nas pontas pertencem ao mesmo grupo.
+        posicoes = {}
+        chaves = np.fromiter((posicoes.setdefault(texto.strip(), len(posicoes)) for texto in textos),
+                             dtype=np.int64, count=len(textos))
+        codigos = chaves[codigos]
+        partes.append((list(posicoes), codigos))
+        if combinados is None:
+            combinados = codigos
+        else:
+            # Renumera a combinação a cada coluna, para os números não crescerem com o produto das colunas.
+            combinados = np.unique(combinados * len(posicoes) + codigos, return_inverse=True)[1]
+
+    _, primeiras, grupos = np.unique(combinados, return_index=True, return_inverse=True)
+    ordem = np.argsort(primeiras, kind='stable')
+    posicao_do_grupo = np.empty_like(ordem)
+    posicao_do_grupo[ordem] = np.arange(len(ordem))
+    linhas_representantes = primeiras[ordem].tolist()
+    chaves_grupos = [tuple(textos[codigos[linha]] for textos, codigos in partes) for linha in linhas_representantes]
+    return posicao_do_grupo[grupos], chaves_grupos
+
+# Calcula o GROUP BY e as agregações e devolve as linhas do resultado (as de operadores.finalizar_grupos).
+def _agregar(colunas, condicao, colunas_group_by, agregacoes):
+    selecao = _selecionar(colunas, condicao)
+    total = colunas.linhas if selecao is None else len(selecao)
+    if total == 0:
+        return []
+    if colunas_group_by:
+        grupos, chaves_grupos = _numerar_grupos(colunas, colunas_group_by, selecao, total)
+    else:
+        grupos, chaves_grupos = np.zeros(total, dtype=np.int64), [()]
+    quantidade_grupos = len(chaves_grupos)
+
+    resultados = []
+    for nome_coluna_resultado, funcao, coluna_alvo, _ in agregacoes:
+        if funcao == 'COUNT':
+            contados = grupos if coluna_alvo == '*' else grupos[colunas.preenchidos(coluna_alvo, selecao)]
+            valores = np.bincount(contados, minlength=quantidade_grupos).tolist()
+        else:
+            numeros, validos = colunas.numeros(coluna_alvo, selecao)
+            somados = grupos[validos]
+            if quantidade_grupos == 1:
+                por_grupo, limites = numeros[validos].tolist(), [0, len(somados)]
+            else:
+                ordem = np.argsort(somados, kind='stable')
+                por_grupo = numeros[validos][ordem].tolist()
+                limites = np.searchsorted(somados[ordem], np.arange(quantidade_grupos + 1)).tolist()
+            somas = [soma_exata(por_grupo[inicio:fim]) for inicio, fim in zip(limites, limites[1:])]
+            quantidades = [fim - inicio for inicio, fim in zip(limites, limites[1:])]
+            # Um grupo sem valores fica com o acumulador inicial (o inteiro 0), como no motor de linhas.
+            if funcao == 'AVG':
+                valores = [soma / quantidade if quantidade else 0 for soma, quantidade in zip(somas, quantidades)]
+            else:
+                valores = [soma if quantidade else 0 for soma, quantidade in zip(somas, quantidades)]
+        resultados.append((nome_coluna_resultado, valores))
+
+    linhas = []
+    for posicao, chave_grupo in enumerate(chaves_grupos):
+        linha_agregada = dict(zip(colunas_group_by or (), chave_grupo))
+        for nome_coluna_resultado, valores in resultados:
+            linha_agregada[nome_coluna_resultado] = valores[posicao]
+        linhas.append(linha_agregada)
+    return linhas
+
+# Executa o WHERE, o GROUP BY e as agregações de um SELECT sobre 'arquivo' e gera as linhas agregadas.
+# 'alternativa' é uma função sem argumentos que devolve as mesmas linhas pelo motor de linhas, usada
+# quando a consulta não pode ser vetorizada. Nada é lido antes de ser pedida a primeira linha.
+def agregar(arquivo, condicao, colunas_group_by, agregacoes, alternativa, leitura=None):
+    colunas = _abrir(arquivo, leitura)
+    if colunas is None:
+        yield from alternativa()
+        return
+    try:
+        linhas = _agregar(colunas, condicao, colunas_group_by, agregacoes)
+    except Exception:
+        yield from alternativa()
+        return
+    yield from linhas
+
+# Executa o WHERE de um SELECT sem agregação sobre 'arquivo' e gera as linhas selecionadas, com as
+# 'colunas' pedidas (conjunto de nomes; None para todas), pela ordem do ficheiro. 'alternativa' devolve
+# as mesmas linhas pelo motor de linhas (ver agregar).
+def filtrar(arquivo, condicao, colunas, alternativa, leitura=None):
+    tabela = _abrir(arquivo, leitura)
+    if tabela is None:
+        yield from alternativa()
+        return
+    try:
+        selecao = _selecionar(tabela, condicao)
+        nomes = [nome for nome in tabela.nomes if colunas is None or nome in colunas]
+        for nome in nomes:
+            tabela.obter(nome)
+    except Exception:
+        yield from alternativa()
+        return
+
+    if selecao is None:
+        selecao = np.arange(tabela.linhas)
+    if not nomes:
+        yield from (dict() for _ in range(len(selecao)))
+        return
+    for inicio in range(0, len(selecao), _LINHAS_POR_BLOCO):
+        indices = selecao[inicio:inicio + _LINHAS_POR_BLOCO]
+        yield from colunar.montar_linhas(nomes, [tabela.textos(nome, indices) for nome in nomes])
@@ -0,0 +1,542 @@
+# Operadores relacionais usados pelo executor (JOIN, ORDER BY, ...).
+# Cada operador recebe iteráveis de linhas (dicionários) e devolve as linhas resultantes.
+import heapq
+import itertools
+import math
+import operator
+import pickle
+import sqlite3
+import sys
+import tempfile
+
+LADO_ESQUERDO = 'esquerda'
+LADO_DIREITO = 'direita'
+
+# Com um limite de memória (ver configuracao.MEMORIA_CONSULTA_BYTES): linhas processadas de cada vez entre
+# duas estimativas da memória usada, elementos medidos em cada estimativa, linhas gravadas de cada vez nos
+# ficheiros temporários, sequências ordenadas juntadas de cada vez, partições da agregação e número máximo
+# de divisões sucessivas de uma partição.
+_TAMANHO_BLOCO = 4096
+_AMOSTRA = 256
+_LINHAS_POR_LOTE = 1024
+_MAXIMO_SEQUENCIAS = 64
+_PARTICOES = 16
+_NIVEIS_MAXIMOS = 8
+
+# Parcelas guardadas na soma de um SUM ou AVG antes de serem reduzidas (ver _compactar_soma).
+_PARCELAS_MAXIMAS = 64
+
+# Escolhe o lado sobre o qual a tabela hash é construída: o menor dos dois.
+# Em caso de empate constrói-se sobre a direita, para que a tabela principal seja apenas percorrida.
+def escolher_lado_construcao(tamanho_esquerda, tamanho_direita):
+    if tamanho_esquerda < tamanho_direita:
+        return LADO_ESQUERDO
+    return LADO_DIREITO
+
+# Hash join entre a tabela principal (esquerda) e a secundária (direita).
+# Mantém a semântica do antigo nested loop: as linhas saem pela ordem da esquerda e, para cada uma,
+# pela ordem da direita; no LEFT JOIN as linhas sem par são preenchidas com '' nas colunas da direita.
+# Devolve o lado escolhido para construir a tabela hash e um gerador com as linhas juntadas.
+def juntar_hash(linhas_esquerda, linhas_direita, col_esquerda, col_direita, tipo_join='INNER', lado_construcao=None):
+    if lado_construcao is None:
+        lado_construcao = escolher_lado_construcao(len(linhas_esquerda), len(linhas_direita))
+
+    if lado_construcao == LADO_DIREITO:
+        gerador = _construir_direita(linhas_esquerda, linhas_direita, col_esquerda, col_direita, tipo_join)
+    else:
+        gerador = _construir_esquerda(linhas_esquerda, linhas_direita, col_esquerda, col_direita, tipo_join)
+    return lado_construcao, gerador
+
+def _linha_preenchida(cabecalhos_direita):
+    linha_preenchida = {}
+    for cabecalho in cabecalhos_direita:
+        linha_preenchida[cabecalho] = ''
+    return linha_preenchida
+
+# Constrói a tabela hash com a direita e percorre a esquerda uma única vez.
+def _construir_direita(linhas_esquerda, linhas_direita, col_esquerda, col_direita, tipo_join):
+    tabela_hash = {}
+    cabecalhos_direita = None
+    for linha_dir in linhas_direita:
+        if cabecalhos_direita is None:
+            cabecalhos_direita = list(linha_dir.keys())
+        tabela_hash.setdefault(linha_dir.get(col_direita), []).append(linha_dir)
+
+    linha_vazia = _linha_preenchida(cabecalhos_direita or [])
+    for linha_esq in linhas_esquerda:
+        pares = tabela_hash.get(linha_esq.get(col_esquerda))
+        if pares:
+            for linha_dir in pares:
+                yield {**linha_dir, **linha_esq}
+        elif tipo_join == 'LEFT':
+            yield {**linha_vazia, **linha_esq}
+
+# Constrói a tabela hash com a esquerda (a menor) e percorre a direita.
+# Os pares ficam guardados por linha da esquerda para manter a ordem de saída do nested loop.
+def _construir_esquerda(linhas_esquerda, linhas_direita, col_esquerda, col_direita, tipo_join):
+    linhas_esq = list(linhas_esquerda)
+    tabela_hash = {}
+    for indice, linha_esq in enumerate(linhas_esq):
+        tabela_hash.setdefault(linha_esq.get(col_esquerda), []).append(indice)
+
+    pares_por_linha = [None] * len(linhas_esq)
+    cabecalhos_direita = None
+    for linha_dir in linhas_direita:
+        if cabecalhos_direita is None:
+            cabecalhos_direita = list(linha_dir.keys())
+        for indice in tabela_hash.get(linha_dir.get(col_direita), ()):
+            if pares_por_linha[indice] is None:
+                pares_por_linha[indice] = []
+            pares_por_linha[indice].append(linha_dir)
+
+    linha_vazia = _linha_preenchida(cabecalhos_direita or [])
+    for indice, linha_esq in enumerate(linhas_esq):
+        pares = pares_por_linha[indice]
+        if pares:
+            for linha_dir in pares:
+                yield {**linha_dir, **linha_esq}
+        elif tipo_join == 'LEFT':
+            yield {**linha_vazia, **linha_esq}
+
+# Envolve um valor de uma coluna ORDER BY ... DESC que não é numérico, invertendo a comparação.
+# (os valores numéricos são simplesmente negados)
+class _Decrescente:
+    __slots__ = ('valor',)
+
+    def __init__(self, valor):
+        self.valor = valor
+
+    def __lt__(self, outro):
+        if not isinstance(outro, _Decrescente):
+            return NotImplemented
+        return outro.valor < self.valor
+
+    def __eq__(self, outro):
+        if not isinstance(outro, _Decrescente):
+            return NotImplemented
+        return self.valor == outro.valor
+
+# Cria a chave de ordenação composta para uma lista ORDER BY (com ASC/DESC misturados).
+# Cada valor é convertido para float uma única vez por linha; os que não são números ficam como estão.
+def chave_ordenacao(order_by):
+    colunas = [(ordem['column'], ordem['direction'] == 'DESC') for ordem in order_by]
+
+    def chave(linha):
+        partes = []
+        for coluna, decrescente in colunas:
+            valor = linha.get(coluna, 0)
+            try:
+                valor = float(valor)
+            except (ValueError, TypeError):
+                if decrescente:
+                    valor = _Decrescente(valor)
+            else:
+                if decrescente:
+                    valor = -valor
+            partes.append(valor)
+        return tuple(partes)
+
+    return chave
+
+# Ordena as linhas numa única passagem. Com um limite, usa um heap que guarda apenas as 'limite' primeiras.
+# Sem limite e com 'memoria_maxima' (bytes), as linhas que não cabem são ordenadas em disco (ver
+# _ordenar_externo). A ordenação é sempre estável: linhas empatadas mantêm a ordem de chegada.
+def ordenar_linhas(linhas, order_by, limite=None, memoria_maxima=None):
+    chave = chave_ordenacao(order_by)
+    if limite is not None:
+        return heapq.nsmallest(limite, linhas, key=chave)
+    if memoria_maxima is not None:
+        return _ordenar_externo(linhas, chave, memoria_maxima)
+    return sorted(linhas, key=chave)
+
+# Estimativa (em bytes) da memória ocupada por um valor, incluindo os valores dentro de tuplos, listas e
+# dicionários (as chaves dos dicionários, nomes de colunas partilhados por todas as linhas, não contam).
+def _memoria(valor):
+    tamanho = sys.getsizeof(valor)
+    if isinstance(valor, dict):
+        valor = valor.values()
+    elif not isinstance(valor, (tuple, list)):
+        return tamanho
+    return tamanho + sum(map(_memoria, valor))
+
+# Grava as linhas (quaisquer objetos) num ficheiro temporário, em lotes, e devolve-o pronto a ser lido.
+def _gravar_lotes(linhas):
+    ficheiro = tempfile.TemporaryFile()
+    try:
+        linhas = iter(linhas)
+        while lote := list(itertools.islice(linhas, _LINHAS_POR_LOTE)):
+            pickle.dump(lote, ficheiro, pickle.HIGHEST_PROTOCOL)
+        ficheiro.seek(0)
+    except BaseException:
+        ficheiro.close()
+        raise
+    return ficheiro
+
+# Lê as linhas gravadas por _gravar_lotes, pela mesma ordem, e fecha (apaga) o ficheiro no fim.
+def _ler_lotes(ficheiro):
+    with ficheiro:
+        while True:
+            try:
+                lote = pickle.load(ficheiro)
+            except EOFError:
+                return
+            yield from lote
+
+# Ordenação externa: as linhas são lidas em blocos que cabem em 'memoria_maxima' (estimada a partir das
+# primeiras linhas e das suas chaves); cada bloco é ordenado e gravado num ficheiro temporário e no fim as
+# sequências ordenadas são juntadas (k-way merge). Se houver mais de _MAXIMO_SEQUENCIAS, as primeiras são
+# juntadas primeiro numa só, para limitar os ficheiros abertos. O heapq.merge desempata pela ordem das
+# sequências, e cada sequência vem depois das anteriores, por isso a ordenação continua estável.
+def _ordenar_externo(linhas, chave, memoria_maxima):
+    linhas = iter(linhas)
+    amostra = list(itertools.islice(linhas, _AMOSTRA))
+    if len(amostra) < _AMOSTRA:
+        yield from sorted(amostra, key=chave)
+        return
+    # Cada linha guardada ocupa a linha, a sua chave e as referências na lista.
+    por_linha = sum(_memoria(linha) + _memoria(chave(linha)) + 16 for linha in amostra) / len(amostra)
+    por_sequencia = max(_AMOSTRA, int(memoria_maxima // por_linha))
+    linhas = itertools.chain(amostra, linhas)
+    del amostra
+    sequencias = []
+    try:
+        while bloco := list(itertools.islice(linhas, por_sequencia)):
+            bloco.sort(key=chave)
+            if not sequencias and len(bloco) < por_sequencia:
+                # Cabe tudo em memória.
+                yield from bloco
+                return
+            sequencias.append(_gravar_lotes(bloco))
+            del bloco
+        while len(sequencias) > _MAXIMO_SEQUENCIAS:
+            primeiras = sequencias[:_MAXIMO_SEQUENCIAS]
+            juntas = _gravar_lotes(heapq.merge(*map(_ler_lotes, primeiras), key=chave))
+            sequencias[:_MAXIMO_SEQUENCIAS] = [juntas]
+        yield from heapq.merge(*map(_ler_lotes, sequencias), key=chave)
+    finally:
+        for ficheiro in sequencias:
+            ficheiro.close()
+
+# Prepara as funções de agregação pedidas no SELECT.
+# Cada agregação fica como (nome_resultado, funcao, coluna, posicao), onde 'posicao' é o índice do
+# seu acumulador na lista de acumuladores de cada grupo (o AVG usa duas posições: soma e contagem).
+def preparar_agregacoes(colunas_solicitadas):
+    agregacoes, posicao = [], 0
+    for info_coluna in colunas_solicitadas:
+        if isinstance(info_coluna, dict) and 'aggregate' in info_coluna:
+            funcao, coluna_alvo = info_coluna['aggregate'], info_coluna['column']
+            agregacoes.append((f"{funcao}({coluna_alvo})", funcao, coluna_alvo, posicao))
+            posicao += 2 if funcao == 'AVG' else 1
+    return agregacoes
+
+def _numero_acumuladores(agregacoes):
+    if not agregacoes:
+        return 0
+    _, funcao, _, posicao = agregacoes[-1]
+    return posicao + (2 if funcao == 'AVG' else 1)
+
+# Soma exata (arredondada uma só vez) das parcelas, como math.fsum: o resultado não depende da ordem
+# nem da forma como as parcelas foram repartidas, por isso a leitura em série, a paralela e o motor
+# NumPy dão a mesma soma. Com infinitos e NaN segue as regras dos reais (inf - inf é NaN).
+def soma_exata(parcelas):
+    try:
+        # Como numa soma que parte de 0, um total nulo é 0.0 e não -0.0.
+        return math.fsum(parcelas) + 0.0
+    except ValueError:
+        return math.nan
+    except OverflowError:
+        # Uma soma intermédia passou do maior real: soma pela ordem, como os reais fariam.
+        return sum(parcelas, 0.0)
+
+# Reduz, no lugar, as parcelas de uma soma a poucas com a mesma soma exata: a soma arredondada e,
+# enquanto sobrar alguma coisa, a soma arredondada do que sobra.
+def _compactar_soma(parcelas):
+    try:
+        compactadas = [math.fsum(parcelas)]
+        while math.isfinite(compactadas[-1]):
+            resto = math.fsum(itertools.chain(parcelas, map(operator.neg, compactadas)))
+            if not resto:
+                break
+            compactadas.append(resto)
+    except (ValueError, OverflowError):
+        compactadas = [soma_exata(parcelas)]
+    parcelas[:] = compactadas
+
+# Acumuladores iniciais de um grupo: os contadores começam em 0 e as somas (SUM, e a soma do AVG) numa
+# lista vazia de parcelas, somadas exatamente no fim (ver soma_exata).
+def _novos_acumuladores(agregacoes):
+    acumuladores = [0] * _numero_acumuladores(agregacoes)
+    for _, funcao, _, posicao in agregacoes:
+        if funcao != 'COUNT':
+            acumuladores[posicao] = []
+    return acumuladores
+
+# Atualiza, numa única passagem pelas linhas, os acumuladores de cada grupo.
+# Só se guarda um pequeno conjunto de acumuladores por grupo, nunca as linhas:
+# COUNT(*) e COUNT(coluna) são contadores, SUM são as parcelas de uma soma exata e AVG essas parcelas
+# mais uma contagem.
+def acumular_grupos(linhas, colunas_group_by, agregacoes, grupos=None):
+    if grupos is None:
+        grupos = {}
+    for linha in linhas:
+        if colunas_group_by:
+            chave_grupo = tuple(linha.get(nome_da_coluna, '').strip() for nome_da_coluna in colunas_group_by)
+        else:
+            chave_grupo = ()
+
+        acumuladores = grupos.get(chave_grupo)
+        if acumuladores is None:
+            acumuladores = grupos[chave_grupo] = _novos_acumuladores(agregacoes)
+
+        for _, funcao, coluna_alvo, posicao in agregacoes:
+            if funcao == 'COUNT':
+                # COUNT(*) conta todas as linhas; COUNT(coluna) só as que têm valor nessa coluna
+                if coluna_alvo == '*' or linha.get(coluna_alvo):
+                    acumuladores[posicao] += 1
+            else:
+                valor_da_celula = linha.get(coluna_alvo)
+                if not valor_da_celula:
+                    continue
+                try:
+                    valor = float(valor_da_celula)
+                except (ValueError, TypeError):
+                    continue
+                parcelas = acumuladores[posicao]
+                parcelas.append(valor)
+                if len(parcelas) > _PARCELAS_MAXIMAS:
+                    _compactar_soma(parcelas)
+                if funcao == 'AVG':
+                    acumuladores[posicao + 1] += 1
+    return grupos
+
+# Junta os acumuladores parciais de 'origem' em 'destino' (contadores somados, parcelas das somas juntas).
+# Os grupos novos são acrescentados no fim, mantendo a ordem em que cada grupo apareceu.
+def combinar_grupos(destino, origem):
+    for chave_grupo, acumuladores in origem.items():
+        existentes = destino.get(chave_grupo)
+        if existentes is None:
+            destino[chave_grupo] = [list(valor) if isinstance(valor, list) else valor for valor in acumuladores]
+            continue
+        for posicao, valor in enumerate(acumuladores):
+            if isinstance(valor, list):
+                existentes[posicao].extend(valor)
+                if len(existentes[posicao]) > _PARCELAS_MAXIMAS:
+                    _compactar_soma(existentes[posicao])
+            else:
+                existentes[posicao] += valor
+    return destino
+
+# Produz uma linha de resultado por grupo a partir dos acumuladores.
+def finalizar_grupos(grupos, colunas_group_by, agregacoes):
+    for chave_grupo, acumuladores in grupos.items():
+        yield _linha_agregada(chave_grupo, acumuladores, colunas_group_by, agregacoes)
+
+# Um grupo sem valores numa soma fica com 0 (inteiro), tanto no SUM como no AVG.
+def _linha_agregada(chave_grupo, acumuladores, colunas_group_by, agregacoes):
+    linha_agregada = {}
+    if colunas_group_by:
+        for i, nome_coluna in enumerate(colunas_group_by):
+            linha_agregada[nome_coluna] = chave_grupo[i]
+
+    for nome_coluna_resultado, funcao, _, posicao in agregacoes:
+        if funcao == 'COUNT':
+            linha_agregada[nome_coluna_resultado] = acumuladores[posicao]
+            continue
+        parcelas = acumuladores[posicao]
+        soma = soma_exata(parcelas) if parcelas else 0
+        if funcao == 'AVG':
+            quantidade = acumuladores[posicao + 1]
+            linha_agregada[nome_coluna_resultado] = soma / quantidade if quantidade else 0
+        else:
+            linha_agregada[nome_coluna_resultado] = soma
+    return linha_agregada
+
+# GROUP BY por hash: uma passagem pelas linhas e memória proporcional ao número de grupos.
+# Com 'memoria_maxima' (bytes), os grupos que não cabem são agregados em partições em disco
+# (ver _agregar_com_limite).
+def agregar_hash(linhas, colunas_group_by, agregacoes, memoria_maxima=None):
+    if memoria_maxima is not None:
+        return _agregar_com_limite(linhas, colunas_group_by, agregacoes, memoria_maxima)
+    grupos = acumular_grupos(linhas, colunas_group_by, agregacoes)
+    return finalizar_grupos(grupos, colunas_group_by, agregacoes)
+
+# Estimativa (em bytes) da memória ocupada pelos grupos, a partir dos primeiros. 'por_grupo' é a
+# estimativa anterior por grupo, que deixa de ser recalculada quando a amostra está completa.
+def _memoria_grupos(grupos, por_grupo=None):
+    if por_grupo is None or len(grupos) < _AMOSTRA:
+        amostra = list(itertools.islice(grupos.items(), _AMOSTRA))
+        por_grupo = sum(_memoria(chave) + _memoria(acumuladores) for chave, acumuladores in amostra)
+        por_grupo /= max(len(amostra), 1)
+    return sys.getsizeof(grupos) + len(grupos) * por_grupo, por_grupo
+
+# A chave do grupo de uma linha, igual à de acumular_grupos.
+def _chave_grupo(linha, colunas_group_by):
+    if not colunas_group_by:
+        return ()
+    return tuple(linha.get(nome_da_coluna, '').strip() for nome_da_coluna in colunas_group_by)
+
+# Colunas de que a agregação precisa: as do GROUP BY e as das funções de agregação.
+def _colunas_agregacao(colunas_group_by, agregacoes):
+    colunas = list(colunas_group_by or ())
+    colunas += [coluna for _, _, coluna, _ in agregacoes if coluna != '*' and coluna not in colunas]
+    return colunas
+
+# Agregação híbrida com a memória limitada. Os grupos são acumulados em memória até a estimativa da
+# memória que ocupam passar de 'memoria_maxima'. A partir daí só as linhas dos grupos já em memória são
+# acumuladas; as dos grupos novos, reduzidas às colunas usadas, vão para _PARTICOES ficheiros temporários
+# (pelo hash da chave), agregados depois um de cada vez da mesma maneira. Cada grupo é acumulado com as
+# suas linhas pela ordem de chegada e os grupos saem pela ordem em que apareceram, como em agregar_hash.
+def _agregar_com_limite(linhas, colunas_group_by, agregacoes, memoria_maxima):
+    linhas = iter(linhas)
+    grupos, por_grupo = {}, None
+    particoes = None
+    numero = 0
+    try:
+        while bloco := list(itertools.islice(linhas, _TAMANHO_BLOCO)):
+            if particoes is None:
+                acumular_grupos(bloco, colunas_group_by, agregacoes, grupos)
+                memoria, por_grupo = _memoria_grupos(grupos, por_grupo)
+                if memoria > memoria_maxima:
+                    particoes = _Particoes(0, _colunas_agregacao(colunas_group_by, agregacoes))
+            else:
+                em_memoria = []
+                for numero_linha, linha in enumerate(bloco, numero):
+                    chave_grupo = _chave_grupo(linha, colunas_group_by)
+                    if chave_grupo in grupos:
+                        em_memoria.append(linha)
+                    else:
+                        particoes.escrever(numero_linha, chave_grupo, linha)
+                acumular_grupos(em_memoria, colunas_group_by, agregacoes, grupos)
+            numero += len(bloco)
+        # Os grupos em memória apareceram todos antes dos das partições.
+        yield from finalizar_grupos(grupos, colunas_group_by, agregacoes)
+        grupos = None
+        if particoes is not None:
+            for _, chave_grupo, acumuladores in particoes.agregar(colunas_group_by, agregacoes, memoria_maxima):
+                yield _linha_agregada(chave_grupo, acumuladores, colunas_group_by, agregacoes)
+    finally:
+        if particoes is not None:
+            particoes.fechar()
+
+# Agrega as entradas (numero, chave, linha) de uma partição, por ordem de número da linha, com a memória
+# limitada como em _agregar_com_limite. Devolve (numero, chave, acumuladores) de cada grupo, por ordem do
+# número da sua primeira linha.
+def _agregar_particao(entradas, colunas_group_by, agregacoes, memoria_maxima, nivel):
+    entradas = iter(entradas)
+    grupos, primeiras, por_grupo = {}, {}, None
+    particoes = None
+    try:
+        while bloco := list(itertools.islice(entradas, _TAMANHO_BLOCO)):
+            if particoes is None:
+                for numero, chave_grupo, _ in bloco:
+                    primeiras.setdefault(chave_grupo, numero)
+                acumular_grupos((linha for _, _, linha in bloco), colunas_group_by, agregacoes, grupos)
+                memoria, por_grupo = _memoria_grupos(grupos, por_grupo)
+                if memoria > memoria_maxima and nivel < _NIVEIS_MAXIMOS:
+                    particoes = _Particoes(nivel, _colunas_agregacao(colunas_group_by, agregacoes))
+            else:
+                em_memoria = []
+                for numero, chave_grupo, linha in bloco:
+                    if chave_grupo in grupos:
+                        em_memoria.append(linha)
+                    else:
+                        particoes.escrever(numero, chave_grupo, linha)
+                acumular_grupos(em_memoria, colunas_group_by, agregacoes, grupos)
+        for chave_grupo, acumuladores in grupos.items():
+            yield primeiras[chave_grupo], chave_grupo, acumuladores
+        grupos = primeiras = None
+        if particoes is not None:
+            yield from particoes.agregar(colunas_group_by, agregacoes, memoria_maxima)
+    finally:
+        if particoes is not None:
+            particoes.fechar()
+
+# Linhas de uma agregação distribuídas por _PARTICOES ficheiros temporários pelo hash da chave do grupo
+# (com o nível no hash, para que uma partição dividida outra vez não vá toda para a mesma subpartição).
+class _Particoes:
+    def __init__(self, nivel, colunas):
+        self._nivel = nivel
+        self._colunas = colunas
+        self._ficheiros = [tempfile.TemporaryFile() for _ in range(_PARTICOES)]
+        self._pendentes = [[] for _ in range(_PARTICOES)]
+        self._resultados = []
+
+    def escrever(self, numero, chave_grupo, linha):
+        particao = hash((self._nivel, chave_grupo)) % _PARTICOES
+        pendentes = self._pendentes[particao]
+        pendentes.append((numero, chave_grupo, {coluna: linha[coluna] for coluna in self._colunas if coluna in linha}))
+        if len(pendentes) >= _LINHAS_POR_LOTE:
+            pickle.dump(pendentes, self._ficheiros[particao], pickle.HIGHEST_PROTOCOL)
+            pendentes.clear()
+
+    # Agrega as partições, uma de cada vez, e devolve (numero, chave, acumuladores) de todos os grupos por
+    # ordem de número. O resultado de cada partição fica num ficheiro temporário até serem todos juntados.
+    def agregar(self, colunas_group_by, agregacoes, memoria_maxima):
+        for ficheiro, pendentes in zip(self._ficheiros, self._pendentes):
+            if pendentes:
+                pickle.dump(pendentes, ficheiro, pickle.HIGHEST_PROTOCOL)
+                pendentes.clear()
+            ficheiro.seek(0)
+            entradas = _ler_lotes(ficheiro)
+            self._resultados.append(_gravar_lotes(
+                _agregar_particao(entradas, colunas_group_by, agregacoes, memoria_maxima, self._nivel + 1)
+            ))
+        return heapq.merge(*map(_ler_lotes, self._resultados), key=operator.itemgetter(0))
+
+    def fechar(self):
+        for ficheiro in self._ficheiros + self._resultados:
+            ficheiro.close()
+
+# DISTINCT por hash, em streaming: cada linha sai assim que aparece pela primeira vez, por isso com um
+# LIMIT a leitura para logo que há linhas distintas suficientes. A chave de cada linha é o tuplo dos
+# seus valores, pela ordem das colunas (todas as linhas projetadas têm as mesmas colunas, pela ordem do
+# SELECT). Só as primeiras 'maximo_em_memoria' chaves ficam num conjunto em memória; as seguintes vão
+# para uma base SQLite temporária em disco (apagada no fim), para que um resultado com muitíssimas
+# linhas distintas não esgote a memória. None guarda todas as chaves em memória. Com 'memoria_maxima'
+# (bytes), o conjunto em memória também não passa da estimativa dessa memória, feita com as primeiras chaves.
+def distinto_hash(linhas, maximo_em_memoria=None, memoria_maxima=None):
+    vistos = set()
+    em_disco = None
+    try:
+        for linha in linhas:
+            chave = tuple(linha.values())
+            if chave in vistos:
+                continue
+            if em_disco is not None:
+                if not em_disco.acrescentar(chave):
+                    continue
+            elif maximo_em_memoria is not None and len(vistos) >= maximo_em_memoria:
+                em_disco = _ChavesEmDisco()
+                em_disco.acrescentar(chave)
+            else:
+                vistos.add(chave)
+                if memoria_maxima is not None and len(vistos) == _AMOSTRA:
+                    por_chave = sum(map(_memoria, vistos)) / _AMOSTRA + sys.getsizeof(vistos) / _AMOSTRA
+                    cabem = max(_AMOSTRA, int(memoria_maxima // por_chave))
+                    maximo_em_memoria = cabem if maximo_em_memoria is None else min(maximo_em_memoria, cabem)
+            yield linha
+    finally:
+        if em_disco is not None:
+            em_disco.fechar()
+
+# Conjunto de chaves do DISTINCT guardado numa base SQLite temporária (sqlite3.connect('') cria uma
+# base privada em disco, apagada quando a ligação é fechada).
+class _ChavesEmDisco:
+    def __init__(self):
+        self._ligacao = sqlite3.connect('')
+        self._ligacao.execute("PRAGMA journal_mode = OFF")
+        self._ligacao.execute("PRAGMA synchronous = OFF")
+        self._ligacao.execute("CREATE TABLE vistos (chave TEXT PRIMARY KEY) WITHOUT ROWID")
+        self._inserir = "INSERT OR IGNORE INTO vistos VALUES (?)"
+
+    # Acrescenta a chave e indica se ela ainda não existia.
+    def acrescentar(self, chave):
+        return self._ligacao.execute(self._inserir, (_chave_em_texto(chave),)).rowcount == 1
+
+    def fechar(self):
+        self._ligacao.close()
+
+# Texto de uma chave do DISTINCT, igual para chaves iguais em Python: os reais inteiros passam a
+# inteiros, porque 0 == 0.0 (ex.: o SUM de um grupo sem valores é 0, o de outro pode ser 0.0).
+def _chave_em_texto(chave):
+    return repr(tuple(int(valor) if isinstance(valor, float) and valor.is_integer() else valor for valor in chave))
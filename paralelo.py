@@ -0,0 +1,65 @@
+# Leitura paralela de tabelas CSV grandes num SELECT.
+# A tabela é dividida, com a tabela de offsets das linhas (leitor_mmap), em intervalos de bytes que começam
+# exatamente no início de uma linha; cada processo do pool mapeia o ficheiro, lê o seu intervalo e aplica
+# o WHERE, a projeção e uma agregação parcial. Como todos usam mmap, as páginas do ficheiro ficam
+# partilhadas na cache do sistema operativo. O processo principal junta os resultados pela ordem dos
+# intervalos, de modo que a saída é a mesma da leitura em série.
+# Cada processo aplica às suas linhas o log de alterações da tabela (log_alteracoes), sabendo pelo número
+# da primeira linha do intervalo a que linhas do CSV correspondem as alterações.
+import os
+
+import configuracao
+import leitor_mmap
+import log_alteracoes
+from operadores import acumular_grupos, combinar_grupos, finalizar_grupos
+
+# Intervalos por processo: mais do que um permite equilibrar a carga quando os filtros não são uniformes.
+_INTERVALOS_POR_TRABALHADOR = 4
+
+# Indica se vale a pena ler o ficheiro em paralelo, segundo a configuração.
+def deve_paralelizar(arquivo):
+    if configuracao.TRABALHADORES_PARALELOS <= 1:
+        return False
+    return os.path.getsize(arquivo) >= configuracao.LIMIAR_PARALELO_BYTES
+
+# Trabalho feito por cada processo: lê um intervalo, filtra e projeta ou agrega parcialmente.
+# Devolve as linhas projetadas como listas de valores (mais baratas de transferir) ou os acumuladores dos grupos.
+def _processar_intervalo(tarefa):
+    from executor import compilar_condicao
+
+    arquivo, inicio, fim, primeira, condicao, nomes_colunas, colunas_group_by, agregacoes = tarefa
+    linhas = (linha for _, linha in log_alteracoes.varrer_mescladas(arquivo, inicio, fim, primeira))
+    if condicao is not None:
+        linhas = filter(compilar_condicao(condicao), linhas)
+    if agregacoes is not None:
+        return acumular_grupos(linhas, colunas_group_by, agregacoes)
+    return [[linha.get(coluna) for coluna in nomes_colunas] for linha in linhas]
+
+# Executa a leitura, o WHERE e a projeção/agregação de um SELECT sobre uma única tabela em paralelo.
+# Se 'agregacoes' não for None, devolve as linhas agregadas; senão devolve as linhas projetadas
+# nas colunas 'nomes_colunas' (None significa todas as colunas do cabeçalho).
+def varrer_paralelo(arquivo, condicao, nomes_colunas=None, colunas_group_by=None, agregacoes=None):
+    if nomes_colunas is None:
+        nomes_colunas = leitor_mmap.ler_cabecalho(arquivo)
+
+    trabalhadores = configuracao.TRABALHADORES_PARALELOS
+    partes = leitor_mmap.dividir_em_partes(arquivo, trabalhadores * _INTERVALOS_POR_TRABALHADOR)
+    tarefas = [
+        (arquivo, inicio, fim, primeira, condicao, nomes_colunas, colunas_group_by, agregacoes)
+        for inicio, fim, primeira in partes
+    ]
+
+    # Importado só aqui: o multiprocessing pesa no arranque e só é preciso nas leituras paralelas.
+    import multiprocessing
+    with multiprocessing.Pool(processes=trabalhadores) as pool:
+        # imap devolve os resultados pela ordem dos intervalos, mesmo que terminem fora de ordem.
+        resultados = pool.imap(_processar_intervalo, tarefas)
+        if agregacoes is not None:
+            grupos = {}
+            for grupos_parciais in resultados:
+                combinar_grupos(grupos, grupos_parciais)
+            yield from finalizar_grupos(grupos, colunas_group_by, agregacoes)
+        else:
+            for linhas in resultados:
+                for valores in linhas:
+                    yield dict(zip(nomes_colunas, valores))
@@ -1,11 +1,19 @@
-import ply.yacc as yacc
-from lexer import tokens
+import os
+import sys
+
+from lexer import gerar_tabelas as gerar_tabelas_lexer, obter_lexer, tokens
 
 def p_query(p):
     '''query : select_query
              | insert_query
              | update_query
-             | delete_query'''
+             | delete_query
+             | create_index_query
+             | drop_index_query
+             | vacuum_query
+             | copy_query
+             | explain_query
+             | analyze_query'''
     p[0] = p[1]
 
 # --- SELECT ---
@@ -66,24 +74,35 @@ def p_aggregate_function(p):
 
 # --- Regras INSERT, UPDATE, DELETE ---
 
+# 'values' é a lista de linhas a inserir; cada linha é uma lista de valores.
 def p_insert_query(p):
-    '''insert_query : INSERT INTO IDENTIFIER LPAREN column_list RPAREN VALUES LPAREN value_list RPAREN
-                    | INSERT INTO IDENTIFIER VALUES LPAREN value_list RPAREN'''
-    if len(p) == 11:
+    '''insert_query : INSERT INTO IDENTIFIER LPAREN column_list RPAREN VALUES values_rows
+                    | INSERT INTO IDENTIFIER VALUES values_rows'''
+    if len(p) == 9:
         p[0] = {
             'type': 'insert',
             'table': p[3],
             'columns': p[5],
-            'values': p[9]
+            'values': p[8]
         }
     else:
         p[0] = {
             'type': 'insert',
             'table': p[3],
             'columns': None,
-            'values': p[6]
+            'values': p[5]
         }
 
+# Recursiva à esquerda para que um INSERT com muitas linhas não encha a pilha do parser.
+def p_values_rows(p):
+    '''values_rows : LPAREN value_list RPAREN
+                   | values_rows COMMA LPAREN value_list RPAREN'''
+    if len(p) == 4:
+        p[0] = [p[2]]
+    else:
+        p[1].append(p[4])
+        p[0] = p[1]
+
 def p_update_query(p):
     '''update_query : UPDATE IDENTIFIER SET set_list where_clause_opt'''
     p[0] = {
@@ -101,6 +120,63 @@ def p_delete_query(p):
         'where': p[4]
     }
 
+# --- Índices (CREATE INDEX, DROP INDEX) ---
+
+def p_create_index_query(p):
+    '''create_index_query : CREATE INDEX ON IDENTIFIER LPAREN IDENTIFIER RPAREN'''
+    p[0] = {
+        'type': 'create_index',
+        'table': p[4],
+        'column': p[6]
+    }
+
+def p_drop_index_query(p):
+    '''drop_index_query : DROP INDEX ON IDENTIFIER LPAREN IDENTIFIER RPAREN'''
+    p[0] = {
+        'type': 'drop_index',
+        'table': p[4],
+        'column': p[6]
+    }
+
+# --- COPY (carga de um ficheiro CSV) ---
+
+def p_copy_query(p):
+    '''copy_query : COPY IDENTIFIER FROM STRING_LITERAL'''
+    p[0] = {
+        'type': 'copy',
+        'table': p[2],
+        'file': p[4]
+    }
+
+# --- VACUUM ---
+
+def p_vacuum_query(p):
+    '''vacuum_query : VACUUM IDENTIFIER'''
+    p[0] = {
+        'type': 'vacuum',
+        'table': p[2]
+    }
+
+# --- EXPLAIN ---
+
+def p_explain_query(p):
+    '''explain_query : EXPLAIN select_query
+                     | EXPLAIN ANALYZE select_query'''
+    p[0] = {
+        'type': 'explain',
+        'analyze': len(p) == 4,
+        'query': p[len(p) - 1]
+    }
+
+# --- ANALYZE ---
+
+def p_analyze_query(p):
+    '''analyze_query : ANALYZE IDENTIFIER'''
+    p[0] = {
+        'type': 'analyze',
+        'table': p[2]
+    }
+
 # --- Cláusulas Opcionais (JOIN, WHERE, etc.) ---
 
 def p_join_clause_opt(p):
@@ -208,7 +284,8 @@ def p_condition(p):
 
 def p_simple_condition(p):
     '''simple_condition : IDENTIFIER operator value
-                        | IDENTIFIER LIKE STRING_LITERAL'''
+                        | IDENTIFIER LIKE STRING_LITERAL
+                        | IDENTIFIER LIKE PARAMETRO'''
     if len(p) == 4 and p[2].lower() == 'like':
         p[0] = {
             'column': p[1],
@@ -233,7 +310,8 @@ def p_operator(p):
 
 def p_value(p):
     '''value : NUMBER
-             | STRING_LITERAL'''
+             | STRING_LITERAL
+             | PARAMETRO'''
     p[0] = p[1]
 
 # --- Regras Vazias e de Erro ---
@@ -248,5 +326,49 @@ def p_error(p):
     else:
         print("Erro de sintaxe: fim inesperado da entrada")
 
-# Constrói o parser
-parser = yacc.yacc(debug=False)
\ No newline at end of file
+# O parser só é construído na primeira utilização, a partir das tabelas LALR já geradas em parsetab.py.
+# Nunca grava ficheiros (o diretório pode não ter permissão de escrita): se a gramática mudou e
+# parsetab.py ficou desatualizado, as tabelas são calculadas em memória, o que é lento. Para as
+# regenerar depois de alterar a gramática ou o lexer: python parser_sql.py
+_DIRETORIO = os.path.dirname(os.path.abspath(__file__))
+_parser = None
+
+# Indica se parsetab.py foi gerado a partir da gramática atual: compara a assinatura que o PLY grava
+# nele (símbolo inicial, precedências, tokens e regras) com a das funções p_ deste módulo.
+def _tabela_atualizada():
+    try:
+        import parsetab
+    except ImportError:
+        return False
+    import ply.yacc as yacc
+    modulo = sys.modules[__name__]
+    reflexao = yacc.ParserReflect({nome: getattr(modulo, nome) for nome in dir(modulo)}, log=yacc.NullLogger())
+    reflexao.get_all()
+    return getattr(parsetab, '_lr_signature', None) == reflexao.signature()
+
+def obter_parser():
+    global _parser
+    if _parser is None:
+        import ply.yacc as yacc
+        obter_lexer()
+        # Com as tabelas atualizadas, o modo optimize usa-as sem voltar a verificar a gramática.
+        _parser = yacc.yacc(module=sys.modules[__name__], debug=False, write_tables=False, tabmodule='parsetab',
+                            optimize=_tabela_atualizada())
+    return _parser
+
+# Analisa um texto SQL e devolve a árvore da consulta (ou None se tiver erros de sintaxe).
+def analisar_sql(texto):
+    return obter_parser().parse(texto, lexer=obter_lexer())
+
+# Mantém 'from parser_sql import parser' a funcionar, construindo o parser só quando é pedido.
+def __getattr__(nome):
+    if nome == 'parser':
+        return obter_parser()
+    raise AttributeError(f"module {__name__!r} has no attribute {nome!r}")
+
+# Regenera lextab.py e parsetab.py a partir das regras do lexer e da gramática.
+if __name__ == '__main__':
+    import ply.yacc as yacc
+    gerar_tabelas_lexer()
+    yacc.yacc(module=sys.modules[__name__], debug=False, tabmodule='parsetab', outputdir=_DIRETORIO)
+    print("Tabelas do lexer e do parser geradas.")
\ No newline at end of file
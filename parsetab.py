@@ -6,9 +6,9 @@ _tabversion = '3.10'
 
 _lr_method = 'LALR'
 
-_lr_signature = 'AND ASC AVG BY COMMA COUNT DELETE DESC DISTINCT EQ FROM GE GROUP GT IDENTIFIER INSERT INTO JOIN LE LEFT LIKE LIMIT LPAREN LT NEQ NOT NUMBER ON OR ORDER RPAREN SELECT SET STRING_LITERAL SUM TIMES UPDATE VALUES WHEREquery : select_query\n             | insert_query\n             | update_query\n             | delete_queryselect_query : SELECT DISTINCT select_list FROM IDENTIFIER join_clause_opt where_clause_opt group_by_clause_opt order_by_opt limit_clause_opt\n                    | SELECT select_list FROM IDENTIFIER join_clause_opt where_clause_opt group_by_clause_opt order_by_opt limit_clause_optselect_list : select_item\n                   | select_item COMMA select_listselect_item : TIMES\n                   | IDENTIFIER\n                   | aggregate_functionaggregate_function : COUNT LPAREN TIMES RPAREN\n                          | COUNT LPAREN IDENTIFIER RPAREN\n                          | SUM LPAREN IDENTIFIER RPAREN\n                          | AVG LPAREN IDENTIFIER RPARENinsert_query : INSERT INTO IDENTIFIER LPAREN column_list RPAREN VALUES LPAREN value_list RPAREN\n                    | INSERT INTO IDENTIFIER VALUES LPAREN value_list RPARENupdate_query : UPDATE IDENTIFIER SET set_list where_clause_optdelete_query : DELETE FROM IDENTIFIER where_clause_optjoin_clause_opt : inner_join_clause\n                       | left_join_clause\n                       | emptyinner_join_clause : JOIN IDENTIFIER ON join_conditionleft_join_clause : LEFT JOIN IDENTIFIER ON join_conditionjoin_condition : IDENTIFIER EQ IDENTIFIERwhere_clause_opt : WHERE condition\n                        | emptygroup_by_clause_opt : GROUP BY column_list\n                           | emptyorder_by_opt : ORDER BY order_list\n                    | emptylimit_clause_opt : LIMIT NUMBER\n                        | emptyset_list : set_item\n               | set_item COMMA set_listset_item : IDENTIFIER EQ valuevalue_list : value\n                 | value COMMA value_listcolumn_list : IDENTIFIER\n                  | IDENTIFIER COMMA column_listorder_list : order_item\n                 | order_item COMMA order_listorder_item : IDENTIFIER asc_descasc_desc : ASC\n                | DESC\n                | emptycondition : simple_condition\n                 | LPAREN condition RPAREN\n                 | condition AND condition\n                 | condition OR condition\n                 | NOT conditionsimple_condition : IDENTIFIER operator value\n                        | IDENTIFIER LIKE STRING_LITERALoperator : EQ\n                | NEQ\n                | GT\n                | LT\n                | GE\n                | LEvalue : NUMBER\n             | STRING_LITERALempty :'
+_lr_signature = 'ANALYZE AND ASC AVG BY COMMA COPY COUNT CREATE DELETE DESC DISTINCT DROP EQ EXPLAIN FROM GE GROUP GT IDENTIFIER INDEX INSERT INTO JOIN LE LEFT LIKE LIMIT LPAREN LT NEQ NOT NUMBER ON OR ORDER PARAMETRO RPAREN SELECT SET STRING_LITERAL SUM TIMES UPDATE VACUUM VALUES WHEREquery : select_query\n             | insert_query\n             | update_query\n             | delete_query\n             | create_index_query\n             | drop_index_query\n             | vacuum_query\n             | copy_query\n             | explain_query\n             | analyze_queryselect_query : SELECT DISTINCT select_list FROM IDENTIFIER join_clause_opt where_clause_opt group_by_clause_opt order_by_opt limit_clause_opt\n                    | SELECT select_list FROM IDENTIFIER join_clause_opt where_clause_opt group_by_clause_opt order_by_opt limit_clause_optselect_list : select_item\n                   | select_item COMMA select_listselect_item : TIMES\n                   | IDENTIFIER\n                   | aggregate_functionaggregate_function : COUNT LPAREN TIMES RPAREN\n                          | COUNT LPAREN IDENTIFIER RPAREN\n                          | SUM LPAREN IDENTIFIER RPAREN\n                          | AVG LPAREN IDENTIFIER RPARENinsert_query : INSERT INTO IDENTIFIER LPAREN column_list RPAREN VALUES values_rows\n                    | INSERT INTO IDENTIFIER VALUES values_rowsvalues_rows : LPAREN value_list RPAREN\n                   | values_rows COMMA LPAREN value_list RPARENupdate_query : UPDATE IDENTIFIER SET set_list where_clause_optdelete_query : DELETE FROM IDENTIFIER where_clause_optcreate_index_query : CREATE INDEX ON IDENTIFIER LPAREN IDENTIFIER RPARENdrop_index_query : DROP INDEX ON IDENTIFIER LPAREN IDENTIFIER RPARENcopy_query : COPY IDENTIFIER FROM STRING_LITERALvacuum_query : VACUUM IDENTIFIERexplain_query : EXPLAIN select_query\n                     | EXPLAIN ANALYZE select_queryanalyze_query : ANALYZE IDENTIFIERjoin_clause_opt : inner_join_clause\n                       | left_join_clause\n                       | emptyinner_join_clause : JOIN IDENTIFIER ON join_conditionleft_join_clause : LEFT JOIN IDENTIFIER ON join_conditionjoin_condition : IDENTIFIER EQ IDENTIFIERwhere_clause_opt : WHERE condition\n                        | emptygroup_by_clause_opt : GROUP BY column_list\n                           | emptyorder_by_opt : ORDER BY order_list\n                    | emptylimit_clause_opt : LIMIT NUMBER\n                        | emptyset_list : set_item\n               | set_item COMMA set_listset_item : IDENTIFIER EQ valuevalue_list : value\n                 | value COMMA value_listcolumn_list : IDENTIFIER\n                  | IDENTIFIER COMMA column_listorder_list : order_item\n                 | order_item COMMA order_listorder_item : IDENTIFIER asc_descasc_desc : ASC\n                | DESC\n                | emptycondition : simple_condition\n                 | LPAREN condition RPAREN\n                 | condition AND condition\n                 | condition OR condition\n                 | NOT conditionsimple_condition : IDENTIFIER operator value\n                        | IDENTIFIER LIKE STRING_LITERAL\n                        | IDENTIFIER LIKE PARAMETROoperator : EQ\n                | NEQ\n                | GT\n                | LT\n                | GE\n                | LEvalue : NUMBER\n             | STRING_LITERAL\n             | PARAMETROempty :'
     
-_lr_action_items = {'SELECT':([0,],[6,]),'INSERT':([0,],[7,]),'UPDATE':([0,],[8,]),'DELETE':([0,],[9,]),'$end':([1,2,3,4,5,30,32,41,42,43,45,46,47,48,49,50,57,61,63,64,68,69,76,77,78,79,83,92,93,95,98,100,102,103,104,105,106,107,108,110,113,117,118,120,122,124,126,127,128,129,130,131,132,134,135,136,137,138,],[0,-1,-2,-3,-4,-62,-62,-62,-34,-19,-27,-62,-62,-20,-21,-22,-39,-18,-26,-47,-62,-62,-60,-61,-36,-35,-51,-62,-62,-29,-40,-17,-49,-50,-48,-52,-53,-62,-62,-31,-23,-62,-6,-33,-28,-24,-5,-32,-30,-41,-62,-25,-16,-43,-44,-45,-46,-42,]),'DISTINCT':([6,],[10,]),'TIMES':([6,10,24,25,],[14,14,14,34,]),'IDENTIFIER':([6,8,10,19,21,23,24,25,26,27,29,31,38,44,51,62,65,66,71,72,80,81,96,111,114,121,123,133,],[12,20,12,28,30,32,12,35,36,37,40,46,57,67,70,40,67,67,97,57,67,67,112,57,112,130,131,130,]),'COUNT':([6,10,24,],[16,16,16,]),'SUM':([6,10,24,],[17,17,17,]),'AVG':([6,10,24,],[18,18,18,]),'INTO':([7,],[19,]),'FROM':([9,11,12,13,14,15,22,33,53,54,55,56,],[21,23,-10,-7,-9,-11,31,-8,-12,-13,-14,-15,]),'COMMA':([12,13,14,15,42,53,54,55,56,57,75,76,77,78,129,130,134,135,136,137,],[-10,24,-9,-11,62,-12,-13,-14,-15,72,101,-60,-61,-36,133,-62,-43,-44,-45,-46,]),'LPAREN':([16,17,18,28,39,44,65,66,80,81,99,],[25,26,27,38,59,65,65,65,65,65,115,]),'SET':([20,],[29,]),'VALUES':([28,73,],[39,99,]),'WHERE':([30,32,41,42,46,47,48,49,50,68,76,77,78,79,113,124,131,],[44,-62,44,-34,-62,44,-20,-21,-22,44,-60,-61,-36,-35,-23,-24,-25,]),'JOIN':([32,46,52,],[51,51,71,]),'LEFT':([32,46,],[52,52,]),'GROUP':([32,45,46,47,48,49,50,63,64,68,69,76,77,83,92,102,103,104,105,106,113,124,131,],[-62,-27,-62,-62,-20,-21,-22,-26,-47,-62,94,-60,-61,-51,94,-49,-50,-48,-52,-53,-23,-24,-25,]),'ORDER':([32,45,46,47,48,49,50,57,63,64,68,69,76,77,83,92,93,95,98,102,103,104,105,106,107,113,122,124,131,],[-62,-27,-62,-62,-20,-21,-22,-39,-26,-47,-62,-62,-60,-61,-51,-62,109,-29,-40,-49,-50,-48,-52,-53,109,-23,-28,-24,-25,]),'LIMIT':([32,45,46,47,48,49,50,57,63,64,68,69,76,77,83,92,93,95,98,102,103,104,105,106,107,108,110,113,117,122,124,128,129,130,131,134,135,136,137,138,],[-62,-27,-62,-62,-20,-21,-22,-39,-26,-47,-62,-62,-60,-61,-51,-62,-62,-29,-40,-49,-50,-48,-52,-53,-62,119,-31,-23,119,-28,-24,-30,-41,-62,-25,-43,-44,-45,-46,-42,]),'RPAREN':([34,35,36,37,57,58,64,74,75,76,77,82,83,98,102,103,104,105,106,116,125,],[53,54,55,56,-39,73,-47,100,-37,-60,-61,104,-51,-40,-49,-50,-48,-52,-53,-38,132,]),'EQ':([40,67,112,],[60,86,123,]),'NOT':([44,65,66,80,81,],[66,66,66,66,66,]),'NUMBER':([59,60,84,86,87,88,89,90,91,101,115,119,],[76,76,76,-54,-55,-56,-57,-58,-59,76,76,127,]),'STRING_LITERAL':([59,60,84,85,86,87,88,89,90,91,101,115,],[77,77,77,106,-54,-55,-56,-57,-58,-59,77,77,]),'AND':([63,64,76,77,82,83,102,103,104,105,106,],[80,-47,-60,-61,80,80,80,80,-48,-52,-53,]),'OR':([63,64,76,77,82,83,102,103,104,105,106,],[81,-47,-60,-61,81,81,81,81,-48,-52,-53,]),'LIKE':([67,],[85,]),'NEQ':([67,],[87,]),'GT':([67,],[88,]),'LT':([67,],[89,]),'GE':([67,],[90,]),'LE':([67,],[91,]),'ON':([70,97,],[96,114,]),'BY':([94,109,],[111,121,]),'ASC':([130,],[135,]),'DESC':([130,],[136,]),}
+_lr_action_items = {'SELECT':([0,20,39,],[12,12,12,]),'INSERT':([0,],[13,]),'UPDATE':([0,],[14,]),'DELETE':([0,],[15,]),'CREATE':([0,],[16,]),'DROP':([0,],[17,]),'VACUUM':([0,],[18,]),'COPY':([0,],[19,]),'EXPLAIN':([0,],[20,]),'ANALYZE':([0,20,],[21,39,]),'$end':([1,2,3,4,5,6,7,8,9,10,11,36,38,40,49,53,55,64,65,66,68,71,72,73,74,75,76,83,85,88,90,91,97,98,106,107,108,109,110,114,125,126,128,131,134,136,137,138,139,140,141,142,143,144,145,147,150,152,155,156,158,160,162,163,164,165,166,167,168,169,171,172,173,174,175,],[0,-1,-2,-3,-4,-5,-6,-7,-8,-9,-10,-31,-32,-34,-79,-33,-79,-79,-49,-27,-42,-30,-79,-79,-35,-36,-37,-54,-23,-26,-41,-62,-79,-79,-76,-77,-78,-51,-50,-66,-79,-79,-44,-55,-24,-64,-65,-63,-67,-68,-69,-28,-29,-79,-79,-46,-38,-22,-79,-12,-48,-43,-39,-25,-11,-47,-45,-56,-79,-40,-58,-59,-60,-61,-57,]),'DISTINCT':([12,],[22,]),'TIMES':([12,22,43,44,],[26,26,26,57,]),'IDENTIFIER':([12,14,18,19,21,22,31,33,42,43,44,45,46,48,50,51,54,61,67,77,89,92,93,95,96,100,101,111,112,129,148,151,159,161,170,],[24,32,36,37,40,24,47,49,55,24,58,59,60,63,69,70,72,83,94,99,63,94,94,123,124,130,83,94,94,149,83,149,168,169,168,]),'COUNT':([12,22,43,],[28,28,28,]),'SUM':([12,22,43,],[29,29,29,]),'AVG':([12,22,43,],[30,30,30,]),'INTO':([13,],[31,]),'FROM':([15,23,24,25,26,27,37,41,56,79,80,81,82,],[33,42,-16,-13,-15,-17,52,54,-14,-18,-19,-20,-21,]),'INDEX':([16,17,],[34,35,]),'COMMA':([24,25,26,27,65,79,80,81,82,83,85,105,106,107,108,109,134,152,163,167,168,171,172,173,174,],[-16,43,-15,-17,89,-18,-19,-20,-21,101,103,135,-76,-77,-78,-51,-24,103,-25,170,-79,-58,-59,-60,-61,]),'LPAREN':([28,29,30,47,62,67,69,70,92,93,103,111,112,132,],[44,45,46,61,86,92,95,96,92,92,133,92,92,86,]),'SET':([32,],[48,]),'ON':([34,35,99,130,],[50,51,129,151,]),'VALUES':([47,102,],[62,132,]),'WHERE':([49,55,64,65,72,73,74,75,76,97,106,107,108,109,110,150,162,169,],[67,-79,67,-49,-79,67,-35,-36,-37,67,-76,-77,-78,-51,-50,-38,-39,-40,]),'STRING_LITERAL':([52,86,87,115,116,117,118,119,120,121,122,133,135,],[71,107,107,107,140,-70,-71,-72,-73,-74,-75,107,107,]),'JOIN':([55,72,78,],[77,77,100,]),'LEFT':([55,72,],[78,78,]),'GROUP':([55,68,72,73,74,75,76,90,91,97,98,106,107,108,114,125,136,137,138,139,140,141,150,162,169,],[-79,-42,-79,-79,-35,-36,-37,-41,-62,-79,127,-76,-77,-78,-66,127,-64,-65,-63,-67,-68,-69,-38,-39,-40,]),'ORDER':([55,68,72,73,74,75,76,83,90,91,97,98,106,107,108,114,125,126,128,131,136,137,138,139,140,141,144,150,160,162,169,],[-79,-42,-79,-79,-35,-36,-37,-54,-41,-62,-79,-79,-76,-77,-78,-66,-79,146,-44,-55,-64,-65,-63,-67,-68,-69,146,-38,-43,-39,-40,]),'LIMIT':([55,68,72,73,74,75,76,83,90,91,97,98,106,107,108,114,125,126,128,131,136,137,138,139,140,141,144,145,147,150,155,160,162,166,167,168,169,171,172,173,174,175,],[-79,-42,-79,-79,-35,-36,-37,-54,-41,-62,-79,-79,-76,-77,-78,-66,-79,-79,-44,-55,-64,-65,-63,-67,-68,-69,-79,157,-46,-38,157,-43,-39,-45,-56,-79,-40,-58,-59,-60,-61,-57,]),'RPAREN':([57,58,59,60,83,84,91,104,105,106,107,108,113,114,123,124,131,136,137,138,139,140,141,153,154,],[79,80,81,82,-54,102,-62,134,-52,-76,-77,-78,138,-66,142,143,-55,-64,-65,-63,-67,-68,-69,163,-53,]),'EQ':([63,94,149,],[87,117,161,]),'NOT':([67,92,93,111,112,],[93,93,93,93,93,]),'NUMBER':([86,87,115,117,118,119,120,121,122,133,135,157,],[106,106,106,-70,-71,-72,-73,-74,-75,106,106,165,]),'PARAMETRO':([86,87,115,116,117,118,119,120,121,122,133,135,],[108,108,108,141,-70,-71,-72,-73,-74,-75,108,108,]),'AND':([90,91,106,107,108,113,114,136,137,138,139,140,141,],[111,-62,-76,-77,-78,111,111,111,111,-63,-67,-68,-69,]),'OR':([90,91,106,107,108,113,114,136,137,138,139,140,141,],[112,-62,-76,-77,-78,112,112,112,112,-63,-67,-68,-69,]),'LIKE':([94,],[116,]),'NEQ':([94,],[118,]),'GT':([94,],[119,]),'LT':([94,],[120,]),'GE':([94,],[121,]),'LE':([94,],[122,]),'BY':([127,146,],[148,159,]),'ASC':([168,],[172,]),'DESC':([168,],[173,]),}
 
 _lr_action = {}
 for _k, _v in _lr_action_items.items():
@@ -17,7 +17,7 @@ for _k, _v in _lr_action_items.items():
       _lr_action[_x][_k] = _y
 del _lr_action_items
 
-_lr_goto_items = {'query':([0,],[1,]),'select_query':([0,],[2,]),'insert_query':([0,],[3,]),'update_query':([0,],[4,]),'delete_query':([0,],[5,]),'select_list':([6,10,24,],[11,22,33,]),'select_item':([6,10,24,],[13,13,13,]),'aggregate_function':([6,10,24,],[15,15,15,]),'set_list':([29,62,],[41,79,]),'set_item':([29,62,],[42,42,]),'where_clause_opt':([30,41,47,68,],[43,61,69,92,]),'empty':([30,32,41,46,47,68,69,92,93,107,108,117,130,],[45,50,45,50,45,45,95,95,110,110,120,120,137,]),'join_clause_opt':([32,46,],[47,68,]),'inner_join_clause':([32,46,],[48,48,]),'left_join_clause':([32,46,],[49,49,]),'column_list':([38,72,111,],[58,98,122,]),'condition':([44,65,66,80,81,],[63,82,83,102,103,]),'simple_condition':([44,65,66,80,81,],[64,64,64,64,64,]),'value_list':([59,101,115,],[74,116,125,]),'value':([59,60,84,101,115,],[75,78,105,75,75,]),'operator':([67,],[84,]),'group_by_clause_opt':([69,92,],[93,107,]),'order_by_opt':([93,107,],[108,117,]),'join_condition':([96,114,],[113,124,]),'limit_clause_opt':([108,117,],[118,126,]),'order_list':([121,133,],[128,138,]),'order_item':([121,133,],[129,129,]),'asc_desc':([130,],[134,]),}
+_lr_goto_items = {'query':([0,],[1,]),'select_query':([0,20,39,],[2,38,53,]),'insert_query':([0,],[3,]),'update_query':([0,],[4,]),'delete_query':([0,],[5,]),'create_index_query':([0,],[6,]),'drop_index_query':([0,],[7,]),'vacuum_query':([0,],[8,]),'copy_query':([0,],[9,]),'explain_query':([0,],[10,]),'analyze_query':([0,],[11,]),'select_list':([12,22,43,],[23,41,56,]),'select_item':([12,22,43,],[25,25,25,]),'aggregate_function':([12,22,43,],[27,27,27,]),'set_list':([48,89,],[64,110,]),'set_item':([48,89,],[65,65,]),'where_clause_opt':([49,64,73,97,],[66,88,98,125,]),'empty':([49,55,64,72,73,97,98,125,126,144,145,155,168,],[68,76,68,76,68,68,128,128,147,147,158,158,174,]),'join_clause_opt':([55,72,],[73,97,]),'inner_join_clause':([55,72,],[74,74,]),'left_join_clause':([55,72,],[75,75,]),'column_list':([61,101,148,],[84,131,160,]),'values_rows':([62,132,],[85,152,]),'condition':([67,92,93,111,112,],[90,113,114,136,137,]),'simple_condition':([67,92,93,111,112,],[91,91,91,91,91,]),'value_list':([86,133,135,],[104,153,154,]),'value':([86,87,115,133,135,],[105,109,139,105,105,]),'operator':([94,],[115,]),'group_by_clause_opt':([98,125,],[126,144,]),'order_by_opt':([126,144,],[145,155,]),'join_condition':([129,151,],[150,162,]),'limit_clause_opt':([145,155,],[156,164,]),'order_list':([159,170,],[166,175,]),'order_item':([159,170,],[167,167,]),'asc_desc':([168,],[171,]),}
 
 _lr_goto = {}
 for _k, _v in _lr_goto_items.items():
@@ -27,66 +27,83 @@ for _k, _v in _lr_goto_items.items():
 del _lr_goto_items
 _lr_productions = [
   ("S' -> query","S'",1,None,None,None),
-  ('query -> select_query','query',1,'p_query','parser_sql.py',5),
-  ('query -> insert_query','query',1,'p_query','parser_sql.py',6),
-  ('query -> update_query','query',1,'p_query','parser_sql.py',7),
-  ('query -> delete_query','query',1,'p_query','parser_sql.py',8),
-  ('select_query -> SELECT DISTINCT select_list FROM IDENTIFIER join_clause_opt where_clause_opt group_by_clause_opt order_by_opt limit_clause_opt','select_query',10,'p_select_query','parser_sql.py',14),
-  ('select_query -> SELECT select_list FROM IDENTIFIER join_clause_opt where_clause_opt group_by_clause_opt order_by_opt limit_clause_opt','select_query',9,'p_select_query','parser_sql.py',15),
-  ('select_list -> select_item','select_list',1,'p_select_list','parser_sql.py',44),
-  ('select_list -> select_item COMMA select_list','select_list',3,'p_select_list','parser_sql.py',45),
-  ('select_item -> TIMES','select_item',1,'p_select_item','parser_sql.py',52),
-  ('select_item -> IDENTIFIER','select_item',1,'p_select_item','parser_sql.py',53),
-  ('select_item -> aggregate_function','select_item',1,'p_select_item','parser_sql.py',54),
-  ('aggregate_function -> COUNT LPAREN TIMES RPAREN','aggregate_function',4,'p_aggregate_function','parser_sql.py',58),
-  ('aggregate_function -> COUNT LPAREN IDENTIFIER RPAREN','aggregate_function',4,'p_aggregate_function','parser_sql.py',59),
-  ('aggregate_function -> SUM LPAREN IDENTIFIER RPAREN','aggregate_function',4,'p_aggregate_function','parser_sql.py',60),
-  ('aggregate_function -> AVG LPAREN IDENTIFIER RPAREN','aggregate_function',4,'p_aggregate_function','parser_sql.py',61),
-  ('insert_query -> INSERT INTO IDENTIFIER LPAREN column_list RPAREN VALUES LPAREN value_list RPAREN','insert_query',10,'p_insert_query','parser_sql.py',72),
-  ('insert_query -> INSERT INTO IDENTIFIER VALUES LPAREN value_list RPAREN','insert_query',7,'p_insert_query','parser_sql.py',73),
-  ('update_query -> UPDATE IDENTIFIER SET set_list where_clause_opt','update_query',5,'p_update_query','parser_sql.py',80),
-  ('delete_query -> DELETE FROM IDENTIFIER where_clause_opt','delete_query',4,'p_delete_query','parser_sql.py',84),
-  ('join_clause_opt -> inner_join_clause','join_clause_opt',1,'p_join_clause_opt','parser_sql.py',91),
-  ('join_clause_opt -> left_join_clause','join_clause_opt',1,'p_join_clause_opt','parser_sql.py',92),
-  ('join_clause_opt -> empty','join_clause_opt',1,'p_join_clause_opt','parser_sql.py',93),
-  ('inner_join_clause -> JOIN IDENTIFIER ON join_condition','inner_join_clause',4,'p_inner_join_clause','parser_sql.py',97),
-  ('left_join_clause -> LEFT JOIN IDENTIFIER ON join_condition','left_join_clause',5,'p_left_join_clause','parser_sql.py',101),
-  ('join_condition -> IDENTIFIER EQ IDENTIFIER','join_condition',3,'p_join_condition','parser_sql.py',105),
-  ('where_clause_opt -> WHERE condition','where_clause_opt',2,'p_where_clause_opt','parser_sql.py',109),
-  ('where_clause_opt -> empty','where_clause_opt',1,'p_where_clause_opt','parser_sql.py',110),
-  ('group_by_clause_opt -> GROUP BY column_list','group_by_clause_opt',3,'p_group_by_clause_opt','parser_sql.py',114),
-  ('group_by_clause_opt -> empty','group_by_clause_opt',1,'p_group_by_clause_opt','parser_sql.py',115),
-  ('order_by_opt -> ORDER BY order_list','order_by_opt',3,'p_order_by_opt','parser_sql.py',119),
-  ('order_by_opt -> empty','order_by_opt',1,'p_order_by_opt','parser_sql.py',120),
-  ('limit_clause_opt -> LIMIT NUMBER','limit_clause_opt',2,'p_limit_clause_opt','parser_sql.py',124),
-  ('limit_clause_opt -> empty','limit_clause_opt',1,'p_limit_clause_opt','parser_sql.py',125),
-  ('set_list -> set_item','set_list',1,'p_set_list','parser_sql.py',131),
-  ('set_list -> set_item COMMA set_list','set_list',3,'p_set_list','parser_sql.py',132),
-  ('set_item -> IDENTIFIER EQ value','set_item',3,'p_set_item','parser_sql.py',136),
-  ('value_list -> value','value_list',1,'p_value_list','parser_sql.py',140),
-  ('value_list -> value COMMA value_list','value_list',3,'p_value_list','parser_sql.py',141),
-  ('column_list -> IDENTIFIER','column_list',1,'p_column_list','parser_sql.py',145),
-  ('column_list -> IDENTIFIER COMMA column_list','column_list',3,'p_column_list','parser_sql.py',146),
-  ('order_list -> order_item','order_list',1,'p_order_list','parser_sql.py',150),
-  ('order_list -> order_item COMMA order_list','order_list',3,'p_order_list','parser_sql.py',151),
-  ('order_item -> IDENTIFIER asc_desc','order_item',2,'p_order_item','parser_sql.py',155),
-  ('asc_desc -> ASC','asc_desc',1,'p_asc_desc','parser_sql.py',159),
-  ('asc_desc -> DESC','asc_desc',1,'p_asc_desc','parser_sql.py',160),
-  ('asc_desc -> empty','asc_desc',1,'p_asc_desc','parser_sql.py',161),
-  ('condition -> simple_condition','condition',1,'p_condition','parser_sql.py',167),
-  ('condition -> LPAREN condition RPAREN','condition',3,'p_condition','parser_sql.py',168),
-  ('condition -> condition AND condition','condition',3,'p_condition','parser_sql.py',169),
-  ('condition -> condition OR condition','condition',3,'p_condition','parser_sql.py',170),
-  ('condition -> NOT condition','condition',2,'p_condition','parser_sql.py',171),
-  ('simple_condition -> IDENTIFIER operator value','simple_condition',3,'p_simple_condition','parser_sql.py',179),
-  ('simple_condition -> IDENTIFIER LIKE STRING_LITERAL','simple_condition',3,'p_simple_condition','parser_sql.py',180),
-  ('operator -> EQ','operator',1,'p_operator','parser_sql.py',187),
-  ('operator -> NEQ','operator',1,'p_operator','parser_sql.py',188),
-  ('operator -> GT','operator',1,'p_operator','parser_sql.py',189),
-  ('operator -> LT','operator',1,'p_operator','parser_sql.py',190),
-  ('operator -> GE','operator',1,'p_operator','parser_sql.py',191),
-  ('operator -> LE','operator',1,'p_operator','parser_sql.py',192),
-  ('value -> NUMBER','value',1,'p_value','parser_sql.py',196),
-  ('value -> STRING_LITERAL','value',1,'p_value','parser_sql.py',197),
-  ('empty -> <empty>','empty',0,'p_empty','parser_sql.py',203),
+  ('query -> select_query','query',1,'p_query','parser_sql.py',7),
+  ('query -> insert_query','query',1,'p_query','parser_sql.py',8),
+  ('query -> update_query','query',1,'p_query','parser_sql.py',9),
+  ('query -> delete_query','query',1,'p_query','parser_sql.py',10),
+  ('query -> create_index_query','query',1,'p_query','parser_sql.py',11),
+  ('query -> drop_index_query','query',1,'p_query','parser_sql.py',12),
+  ('query -> vacuum_query','query',1,'p_query','parser_sql.py',13),
+  ('query -> copy_query','query',1,'p_query','parser_sql.py',14),
+  ('query -> explain_query','query',1,'p_query','parser_sql.py',15),
+  ('query -> analyze_query','query',1,'p_query','parser_sql.py',16),
+  ('select_query -> SELECT DISTINCT select_list FROM IDENTIFIER join_clause_opt where_clause_opt group_by_clause_opt order_by_opt limit_clause_opt','select_query',10,'p_select_query','parser_sql.py',22),
+  ('select_query -> SELECT select_list FROM IDENTIFIER join_clause_opt where_clause_opt group_by_clause_opt order_by_opt limit_clause_opt','select_query',9,'p_select_query','parser_sql.py',23),
+  ('select_list -> select_item','select_list',1,'p_select_list','parser_sql.py',50),
+  ('select_list -> select_item COMMA select_list','select_list',3,'p_select_list','parser_sql.py',51),
+  ('select_item -> TIMES','select_item',1,'p_select_item','parser_sql.py',58),
+  ('select_item -> IDENTIFIER','select_item',1,'p_select_item','parser_sql.py',59),
+  ('select_item -> aggregate_function','select_item',1,'p_select_item','parser_sql.py',60),
+  ('aggregate_function -> COUNT LPAREN TIMES RPAREN','aggregate_function',4,'p_aggregate_function','parser_sql.py',64),
+  ('aggregate_function -> COUNT LPAREN IDENTIFIER RPAREN','aggregate_function',4,'p_aggregate_function','parser_sql.py',65),
+  ('aggregate_function -> SUM LPAREN IDENTIFIER RPAREN','aggregate_function',4,'p_aggregate_function','parser_sql.py',66),
+  ('aggregate_function -> AVG LPAREN IDENTIFIER RPAREN','aggregate_function',4,'p_aggregate_function','parser_sql.py',67),
+  ('insert_query -> INSERT INTO IDENTIFIER LPAREN column_list RPAREN VALUES values_rows','insert_query',8,'p_insert_query','parser_sql.py',79),
+  ('insert_query -> INSERT INTO IDENTIFIER VALUES values_rows','insert_query',5,'p_insert_query','parser_sql.py',80),
+  ('values_rows -> LPAREN value_list RPAREN','values_rows',3,'p_values_rows','parser_sql.py',98),
+  ('values_rows -> values_rows COMMA LPAREN value_list RPAREN','values_rows',5,'p_values_rows','parser_sql.py',99),
+  ('update_query -> UPDATE IDENTIFIER SET set_list where_clause_opt','update_query',5,'p_update_query','parser_sql.py',107),
+  ('delete_query -> DELETE FROM IDENTIFIER where_clause_opt','delete_query',4,'p_delete_query','parser_sql.py',116),
+  ('create_index_query -> CREATE INDEX ON IDENTIFIER LPAREN IDENTIFIER RPAREN','create_index_query',7,'p_create_index_query','parser_sql.py',126),
+  ('drop_index_query -> DROP INDEX ON IDENTIFIER LPAREN IDENTIFIER RPAREN','drop_index_query',7,'p_drop_index_query','parser_sql.py',134),
+  ('copy_query -> COPY IDENTIFIER FROM STRING_LITERAL','copy_query',4,'p_copy_query','parser_sql.py',144),
+  ('vacuum_query -> VACUUM IDENTIFIER','vacuum_query',2,'p_vacuum_query','parser_sql.py',154),
+  ('explain_query -> EXPLAIN select_query','explain_query',2,'p_explain_query','parser_sql.py',163),
+  ('explain_query -> EXPLAIN ANALYZE select_query','explain_query',3,'p_explain_query','parser_sql.py',164),
+  ('analyze_query -> ANALYZE IDENTIFIER','analyze_query',2,'p_analyze_query','parser_sql.py',174),
+  ('join_clause_opt -> inner_join_clause','join_clause_opt',1,'p_join_clause_opt','parser_sql.py',183),
+  ('join_clause_opt -> left_join_clause','join_clause_opt',1,'p_join_clause_opt','parser_sql.py',184),
+  ('join_clause_opt -> empty','join_clause_opt',1,'p_join_clause_opt','parser_sql.py',185),
+  ('inner_join_clause -> JOIN IDENTIFIER ON join_condition','inner_join_clause',4,'p_inner_join_clause','parser_sql.py',189),
+  ('left_join_clause -> LEFT JOIN IDENTIFIER ON join_condition','left_join_clause',5,'p_left_join_clause','parser_sql.py',197),
+  ('join_condition -> IDENTIFIER EQ IDENTIFIER','join_condition',3,'p_join_condition','parser_sql.py',201),
+  ('where_clause_opt -> WHERE condition','where_clause_opt',2,'p_where_clause_opt','parser_sql.py',205),
+  ('where_clause_opt -> empty','where_clause_opt',1,'p_where_clause_opt','parser_sql.py',206),
+  ('group_by_clause_opt -> GROUP BY column_list','group_by_clause_opt',3,'p_group_by_clause_opt','parser_sql.py',210),
+  ('group_by_clause_opt -> empty','group_by_clause_opt',1,'p_group_by_clause_opt','parser_sql.py',211),
+  ('order_by_opt -> ORDER BY order_list','order_by_opt',3,'p_order_by_opt','parser_sql.py',215),
+  ('order_by_opt -> empty','order_by_opt',1,'p_order_by_opt','parser_sql.py',216),
+  ('limit_clause_opt -> LIMIT NUMBER','limit_clause_opt',2,'p_limit_clause_opt','parser_sql.py',220),
+  ('limit_clause_opt -> empty','limit_clause_opt',1,'p_limit_clause_opt','parser_sql.py',221),
+  ('set_list -> set_item','set_list',1,'p_set_list','parser_sql.py',227),
+  ('set_list -> set_item COMMA set_list','set_list',3,'p_set_list','parser_sql.py',228),
+  ('set_item -> IDENTIFIER EQ value','set_item',3,'p_set_item','parser_sql.py',232),
+  ('value_list -> value','value_list',1,'p_value_list','parser_sql.py',236),
+  ('value_list -> value COMMA value_list','value_list',3,'p_value_list','parser_sql.py',237),
+  ('column_list -> IDENTIFIER','column_list',1,'p_column_list','parser_sql.py',241),
+  ('column_list -> IDENTIFIER COMMA column_list','column_list',3,'p_column_list','parser_sql.py',242),
+  ('order_list -> order_item','order_list',1,'p_order_list','parser_sql.py',246),
+  ('order_list -> order_item COMMA order_list','order_list',3,'p_order_list','parser_sql.py',247),
+  ('order_item -> IDENTIFIER asc_desc','order_item',2,'p_order_item','parser_sql.py',251),
+  ('asc_desc -> ASC','asc_desc',1,'p_asc_desc','parser_sql.py',255),
+  ('asc_desc -> DESC','asc_desc',1,'p_asc_desc','parser_sql.py',256),
+  ('asc_desc -> empty','asc_desc',1,'p_asc_desc','parser_sql.py',257),
+  ('condition -> simple_condition','condition',1,'p_condition','parser_sql.py',263),
+  ('condition -> LPAREN condition RPAREN','condition',3,'p_condition','parser_sql.py',264),
+  ('condition -> condition AND condition','condition',3,'p_condition','parser_sql.py',265),
+  ('condition -> condition OR condition','condition',3,'p_condition','parser_sql.py',266),
+  ('condition -> NOT condition','condition',2,'p_condition','parser_sql.py',267),
+  ('simple_condition -> IDENTIFIER operator value','simple_condition',3,'p_simple_condition','parser_sql.py',286),
+  ('simple_condition -> IDENTIFIER LIKE STRING_LITERAL','simple_condition',3,'p_simple_condition','parser_sql.py',287),
+  ('simple_condition -> IDENTIFIER LIKE PARAMETRO','simple_condition',3,'p_simple_condition','parser_sql.py',288),
+  ('operator -> EQ','operator',1,'p_operator','parser_sql.py',303),
+  ('operator -> NEQ','operator',1,'p_operator','parser_sql.py',304),
+  ('operator -> GT','operator',1,'p_operator','parser_sql.py',305),
+  ('operator -> LT','operator',1,'p_operator','parser_sql.py',306),
+  ('operator -> GE','operator',1,'p_operator','parser_sql.py',307),
+  ('operator -> LE','operator',1,'p_operator','parser_sql.py',308),
+  ('value -> NUMBER','value',1,'p_value','parser_sql.py',312),
+  ('value -> STRING_LITERAL','value',1,'p_value','parser_sql.py',313),
+  ('value -> PARAMETRO','value',1,'p_value','parser_sql.py',314),
+  ('empty -> <empty>','empty',0,'p_empty','parser_sql.py',320),
 ]
@@ -0,0 +1,138 @@
+# Instruções preparadas e cache de consultas já analisadas.
+#
+# preparar(sql) analisa a instrução uma vez e devolve uma InstrucaoPreparada, que pode ser executada
+# várias vezes com valores diferentes para os parâmetros '?' (posicionais) ou ':nome' (nomeados):
+#     instrucao = preparar("SELECT * FROM usuarios WHERE idade > ? AND nome LIKE ?")
+#     instrucao.executar([20, 'J%'])
+# As instruções ficam numa cache LRU indexada pelo texto SQL normalizado (espaços repetidos fora das
+# strings são ignorados), por isso voltar a preparar ou analisar o mesmo texto não passa pelo lexer nem
+# pelo parser. A árvore guardada na cache é partilhada: o executor nunca a altera, e ligar os parâmetros
+# produz uma cópia.
+# Cada instrução guarda também o seu plano (ver executor.preparar_plano), com o WHERE já compilado: ao
+# ligar os parâmetros só se compilam as comparações que os usam, e o plano ligado segue na chave 'plano'
+# da árvore.
+import re
+from collections import OrderedDict
+
+import configuracao
+from executor import executar, preparar_plano
+from parser_sql import analisar_sql
+
+# sql normalizado -> InstrucaoPreparada; a ordem é a ordem de uso (a mais antiga primeiro).
+_instrucoes = OrderedDict()
+
+_PARTES_SQL = re.compile(r"""('[^']*'|"[^"]*")""")
+_ESPACOS = re.compile(r'\s+')
+
+# Normaliza o texto SQL para servir de chave da cache: junta os espaços fora das strings e retira
+# os espaços e o ';' do fim.
+def normalizar(sql):
+    partes = _PARTES_SQL.split(sql)
+    for i in range(0, len(partes), 2):
+        partes[i] = _ESPACOS.sub(' ', partes[i])
+    return ''.join(partes).strip().rstrip(';').strip()
+
+# Percorre a árvore da consulta e devolve os nós de parâmetro pela ordem em que aparecem no texto.
+def _encontrar_parametros(no, encontrados):
+    if isinstance(no, dict):
+        if 'parametro' in no:
+            encontrados.append(no)
+        else:
+            for valor in no.values():
+                _encontrar_parametros(valor, encontrados)
+    elif isinstance(no, list):
+        for valor in no:
+            _encontrar_parametros(valor, encontrados)
+    return encontrados
+
+# Devolve uma cópia da árvore com cada nó de parâmetro trocado pelo seu valor ('valores' está indexado
+# pela posição do parâmetro).
+def _substituir(no, valores):
+    if isinstance(no, dict):
+        if 'parametro' in no:
+            return valores[no['posicao']]
+        return {chave: _substituir(valor, valores) for chave, valor in no.items()}
+    if isinstance(no, list):
+        return [_substituir(valor, valores) for valor in no]
+    return no
+
+# Nó da árvore que recebe o plano: a própria consulta ou, no EXPLAIN, o SELECT explicado.
+def _com_plano(consulta):
+    return consulta['query'] if consulta['type'] == 'explain' else consulta
+
+class InstrucaoPreparada:
+    # Instrução SQL já analisada. 'parametros' tem os nomes dos parâmetros (None para cada '?'),
+    # pela ordem em que aparecem no texto.
+    def __init__(self, sql, consulta):
+        self.sql = sql
+        self.consulta = consulta
+        self._nos_parametros = sorted(_encontrar_parametros(consulta, []), key=lambda no: no['posicao'])
+        self.parametros = [no['parametro'] for no in self._nos_parametros]
+        nomeados = {nome is not None for nome in self.parametros}
+        if len(nomeados) > 1:
+            raise ValueError("não é possível misturar parâmetros '?' e ':nome' na mesma instrução")
+        self._ligar_plano = preparar_plano(_com_plano(consulta))
+        if self._ligar_plano is not None and not self._nos_parametros:
+            _com_plano(consulta)['plano'] = self._ligar_plano({})
+
+    def __repr__(self):
+        return f"InstrucaoPreparada({self.sql!r})"
+
+    # Devolve a árvore da consulta com os parâmetros substituídos pelos valores dados:
+    # uma sequência (para '?') ou um dicionário (para ':nome').
+    def ligar(self, valores=()):
+        if not self._nos_parametros:
+            return self.consulta
+        if self.parametros[0] is None:
+            if isinstance(valores, dict) or len(valores) != len(self._nos_parametros):
+                raise ValueError(f"a instrução espera {len(self._nos_parametros)} parâmetro(s) posicional(is)")
+            por_posicao = {no['posicao']: valor for no, valor in zip(self._nos_parametros, valores)}
+        else:
+            if not isinstance(valores, dict):
+                raise ValueError("a instrução usa parâmetros nomeados: passe um dicionário")
+            em_falta = [nome for nome in self.parametros if nome not in valores]
+            if em_falta:
+                raise ValueError(f"falta(m) o(s) parâmetro(s): {', '.join(em_falta)}")
+            por_posicao = {no['posicao']: valores[no['parametro']] for no in self._nos_parametros}
+        ligada = _substituir(self.consulta, por_posicao)
+        if self._ligar_plano is not None:
+            _com_plano(ligada)['plano'] = self._ligar_plano(por_posicao)
+        return ligada
+
+    # Liga os parâmetros e executa a instrução.
+    def executar(self, valores=()):
+        executar(self.ligar(valores))
+
+# Analisa e prepara uma instrução SQL, reaproveitando a da cache se o mesmo texto já foi preparado.
+# Devolve None se o texto tem erros de sintaxe (o parser já imprimiu a mensagem).
+def preparar(sql):
+    chave = normalizar(sql)
+    instrucao = _instrucoes.get(chave)
+    if instrucao is not None:
+        _instrucoes.move_to_end(chave)
+        return instrucao
+
+    consulta = analisar_sql(chave)
+    if consulta is None:
+        return None
+    instrucao = InstrucaoPreparada(chave, consulta)
+    limite = configuracao.CACHE_INSTRUCOES
+    if limite > 0:
+        _instrucoes[chave] = instrucao
+        while len(_instrucoes) > limite:
+            _instrucoes.popitem(last=False)
+    return instrucao
+
+# Devolve a árvore (AST) de uma instrução sem parâmetros, usando a cache de instruções.
+# A árvore é partilhada com a cache e não deve ser alterada.
+def analisar(sql):
+    instrucao = preparar(sql)
+    if instrucao is None:
+        return None
+    if instrucao.parametros:
+        raise ValueError("a instrução tem parâmetros: use preparar(sql).executar(valores)")
+    return instrucao.consulta
+
+# Esvazia a cache de instruções.
+def limpar():
+    _instrucoes.clear()
@@ -0,0 +1,87 @@
+# Escrita dos resultados de um SELECT em qualquer ficheiro de texto (sys.stdout, um ficheiro aberto, io.StringIO...).
+#
+# As linhas são sequências de valores pela ordem das colunas (ex.: as devolvidas por um Cursor).
+# Em vez de uma escrita por linha, o texto é juntado em blocos de _LINHAS_POR_BLOCO linhas, o que torna a
+# escrita de milhões de linhas limitada pela velocidade do disco ou do pipe e não pelas chamadas de I/O.
+# Se a produção das linhas falhar a meio, o bloco já formatado é escrito antes de o erro seguir.
+import csv
+import io
+import itertools
+import json
+import operator
+
+_LINHAS_POR_BLOCO = 4096
+
+# Escreve os textos no destino em blocos. Devolve o número de textos escritos.
+def _escrever_em_blocos(destino, textos):
+    escritos = 0
+    bloco = []
+    try:
+        for texto in textos:
+            bloco.append(texto)
+            if len(bloco) == _LINHAS_POR_BLOCO:
+                destino.write(''.join(bloco))
+                escritos += len(bloco)
+                bloco.clear()
+    finally:
+        if bloco:
+            destino.write(''.join(bloco))
+            escritos += len(bloco)
+    return escritos
+
+# Converte linhas em dicionários em tuplos com os valores das colunas indicadas ('' para as que faltam).
+def tuplos(linhas, colunas):
+    vazios = itertools.repeat('')
+    for linha in linhas:
+        yield tuple(map(linha.get, colunas, vazios))
+
+# Tabela legível, no formato usado pelo interpretador: cabeçalho, linha separadora e valores separados por ' | '.
+# Sem linhas, escreve "Nenhum resultado encontrado.". Devolve o número de linhas escritas.
+def escrever_tabela(destino, colunas, linhas):
+    linhas = iter(linhas)
+    primeira_linha = next(linhas, None)
+    if primeira_linha is None:
+        destino.write("Nenhum resultado encontrado.\n")
+        return 0
+    nomes = [str(coluna) for coluna in colunas]
+    largura = sum(len(nome) for nome in nomes) + 3 * max(len(nomes) - 1, 0)
+    destino.write(" | ".join(nomes) + "\n" + "-" * largura + "\n")
+    textos = (" | ".join(map(str, linha)) + "\n" for linha in itertools.chain([primeira_linha], linhas))
+    return _escrever_em_blocos(destino, textos)
+
+# CSV (dialeto por omissão do módulo csv, o mesmo com que as tabelas são escritas), com o cabeçalho na
+# primeira linha. None é escrito como campo vazio. Devolve o número de linhas escritas (sem o cabeçalho).
+def escrever_csv(destino, colunas, linhas, cabecalho=True):
+    texto = io.StringIO(newline='')
+    escritor = csv.writer(texto)
+    if cabecalho:
+        escritor.writerow(colunas)
+    escritas = 0
+    try:
+        for linha in linhas:
+            escritor.writerow(linha)
+            escritas += 1
+            if escritas % _LINHAS_POR_BLOCO == 0:
+                destino.write(texto.getvalue())
+                texto.seek(0)
+                texto.truncate()
+    finally:
+        if texto.tell():
+            destino.write(texto.getvalue())
+    return escritas
+
+# JSON Lines: um objeto JSON por linha, com os nomes das colunas como chaves. Devolve o número de linhas escritas.
+# O texto das chaves é preparado uma só vez e cada linha só codifica os valores (o resultado é o mesmo
+# de json.dumps sobre um dicionário, mas sem criar um dicionário por linha).
+def escrever_jsonl(destino, colunas, linhas):
+    codificar = json.JSONEncoder(ensure_ascii=False, default=str).encode
+    chaves = [codificar(str(coluna)) + ": " for coluna in colunas]
+    textos = ("{" + ", ".join(map(operator.add, chaves, map(codificar, linha))) + "}\n" for linha in linhas)
+    return _escrever_em_blocos(destino, textos)
+
+# Formatos disponíveis, pelo nome usado em Cursor.escrever e na linha de comandos.
+FORMATOS = {
+    'tabela': escrever_tabela,
+    'csv': escrever_csv,
+    'jsonl': escrever_jsonl
+}
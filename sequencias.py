@@ -0,0 +1,93 @@
+# Sequência de IDs de cada tabela, para o INSERT não ter de ler a tabela toda à procura do maior ID.
+#
+# Fica em '<tabela>.csv.seq' (JSON) com o cabeçalho da tabela, a coluna da chave primária, o próximo ID
+# e a assinatura da versão da tabela (CSV e log de alterações) a que corresponde. Cada INSERT atualiza o
+# ficheiro de forma atómica. Se ele não existir ou a assinatura não coincidir (a tabela foi alterada por
+# fora, ou uma escrita do executor o invalidou), é reconstruído a partir dos dados: o próximo ID volta a
+# ser o maior ID numérico existente mais um, como sempre foi.
+import json
+import os
+
+from leitor_mmap import ler_cabecalho
+from log_alteracoes import assinatura_tabela, varrer_mescladas
+
+def caminho_sequencia(arquivo):
+    return f"{arquivo}.seq"
+
+# Determina o nome da coluna de chave primária procurando por id ou sufixos _id.
+def coluna_chave(fieldnames):
+    if not fieldnames: return 'id'
+    if 'id' in fieldnames: return 'id'
+    for name in fieldnames:
+        if name.endswith('_id'): return name
+    return fieldnames[0]
+
+def _gravar(arquivo, sequencia):
+    # Escreve num ficheiro temporário e só depois o troca pelo definitivo, para nunca deixar um ficheiro a meio.
+    caminho = caminho_sequencia(arquivo)
+    temporario = f'{caminho}.{os.getpid()}.tmp'
+    with open(temporario, 'w', encoding='utf-8') as f:
+        json.dump(sequencia, f)
+    os.replace(temporario, caminho)
+
+def _construir(arquivo, assinatura):
+    cabecalho = ler_cabecalho(arquivo)
+    if not cabecalho:
+        return None
+    chave = coluna_chave(cabecalho)
+    maior_id = 0
+    for _, linha in varrer_mescladas(arquivo):
+        id_como_texto = linha.get(chave)
+        if id_como_texto and id_como_texto.isdigit():
+            maior_id = max(maior_id, int(id_como_texto))
+    sequencia = {
+        'cabecalho': cabecalho,
+        'chave': chave,
+        'proximo_id': maior_id + 1,
+        'assinatura': assinatura
+    }
+    _gravar(arquivo, sequencia)
+    return sequencia
+
+# Devolve a sequência da tabela ({'cabecalho', 'chave', 'proximo_id', 'assinatura'}),
+# reconstruindo-a se estiver em falta ou desatualizada. Devolve None se o CSV está vazio (sem cabeçalho).
+def obter(arquivo):
+    assinatura = assinatura_tabela(arquivo)
+    try:
+        with open(caminho_sequencia(arquivo), encoding='utf-8') as f:
+            sequencia = json.load(f)
+    except (FileNotFoundError, ValueError):
+        sequencia = None
+    if sequencia is None or sequencia.get('assinatura') != assinatura:
+        return _construir(arquivo, assinatura)
+    return sequencia
+
+# Regista que o INSERT acabou de usar 'id_usado' e deixa a sequência válida para a nova versão da tabela.
+def registrar_insercao(arquivo, cabecalho, chave, id_usado):
+    _gravar(arquivo, {
+        'cabecalho': cabecalho,
+        'chave': chave,
+        'proximo_id': id_usado + 1,
+        'assinatura': assinatura_tabela(arquivo)
+    })
+
+# Regista uma escrita que não mexe na coluna da chave primária (ex.: UPDATE de outras colunas):
+# se a sequência correspondia à versão anterior da tabela, continua válida para a nova.
+def registrar_escrita_sem_chave(arquivo, assinatura_anterior):
+    try:
+        with open(caminho_sequencia(arquivo), encoding='utf-8') as f:
+            sequencia = json.load(f)
+    except (FileNotFoundError, ValueError):
+        return
+    if sequencia.get('assinatura') != assinatura_anterior:
+        invalidar(arquivo)
+        return
+    sequencia['assinatura'] = assinatura_tabela(arquivo)
+    _gravar(arquivo, sequencia)
+
+# Apaga a sequência; será reconstruída a partir dos dados no próximo INSERT.
+def invalidar(arquivo):
+    try:
+        os.remove(caminho_sequencia(arquivo))
+    except FileNotFoundError:
+        pass
@@ -0,0 +1,238 @@
+# Servidor de consultas: mantém o interpretador a correr e executa instruções SQL pedidas por uma ligação
+# TCP local ou por um socket Unix, sem que cada cliente pague o arranque do Python e do parser.
+#     python servidor.py --porta 5433 --trabalhadores 4
+#     python servidor.py --socket /tmp/sql.sock --config MOTOR_EXECUCAO=numpy
+#
+# Protocolo (uma linha por pedido, uma linha por resposta, pela mesma ordem, em UTF-8):
+#   pedido:   {"sql": "SELECT * FROM usuarios WHERE idade > ?", "parametros": [20], "id": 7}
+#             (ou só o texto SQL, numa linha; "parametros" e "id" são opcionais)
+#   resposta: {"colunas": ["id", "nome", ...], "linhas": [["1", "João", ...], ...]}   (SELECT)
+#             {"mensagens": ["1 registro inserido."]}                               (outras instruções)
+#             {"erro": "Tabela não encontrada: x.csv"}
+#   O "id" do pedido, se existir, é repetido na resposta. Como em executar(), as instruções que não são
+#   SELECT comunicam os seus erros nas mensagens ("ERRO: ...").
+#
+# O ciclo de eventos (asyncio) só lê os pedidos, analisa o SQL (com a cache de preparadas.py) e trata dos
+# bloqueios; a execução corre num pool de processos, para que as leituras pesadas corram em paralelo.
+# Cada processo volta a preparar a instrução (com a sua própria cache), para que o plano compilado dela
+# (ver executor.preparar_plano) fique guardado no processo que a executa.
+# Cada tabela tem um bloqueio de leitores/escritor: vários SELECT (e EXPLAIN) sobre a mesma tabela correm
+# ao mesmo tempo, enquanto um INSERT, UPDATE, DELETE, COPY, VACUUM, ANALYZE ou CREATE/DROP INDEX tem a
+# tabela só para si. Um escritor à espera passa à frente dos leitores que chegam depois dele, para não
+# ficar bloqueado para sempre numa tabela muito lida. As caches de cada processo (tabelas, log de
+# alterações, offsets) validam-se pela assinatura dos ficheiros, por isso veem as escritas dos outros.
+import argparse
+import ast
+import asyncio
+import contextlib
+import io
+import json
+import os
+import signal
+import sys
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
+
+import configuracao
+from cursor import Cursor
+from executor import get_csv_path
+from preparadas import preparar
+
+_PORTA = 5433
+
+# Tamanho máximo de uma linha do protocolo (um INSERT com muitas linhas pode ser grande).
+_LIMITE_LINHA = 64 * 1024 * 1024
+
+class TrancaLeituraEscrita:
+    # Bloqueio de leitores/escritor para corrotinas do mesmo ciclo de eventos.
+    def __init__(self):
+        self._condicao = asyncio.Condition()
+        self._leitores = 0
+        self._escritor = False
+        self._escritores_em_espera = 0
+
+    async def adquirir_leitura(self):
+        async with self._condicao:
+            await self._condicao.wait_for(lambda: not self._escritor and not self._escritores_em_espera)
+            self._leitores += 1
+
+    async def libertar_leitura(self):
+        async with self._condicao:
+            self._leitores -= 1
+            if not self._leitores:
+                self._condicao.notify_all()
+
+    async def adquirir_escrita(self):
+        async with self._condicao:
+            self._escritores_em_espera += 1
+            try:
+                await self._condicao.wait_for(lambda: not self._escritor and not self._leitores)
+            finally:
+                self._escritores_em_espera -= 1
+                # Se a espera foi cancelada, os leitores que esperavam por este escritor podem avançar.
+                self._condicao.notify_all()
+            self._escritor = True
+
+    async def libertar_escrita(self):
+        async with self._condicao:
+            self._escritor = False
+            self._condicao.notify_all()
+
+# Tabelas usadas por uma consulta: dicionário tabela -> True se a instrução escreve nela.
+def tabelas_da_consulta(consulta):
+    tipo = consulta['type']
+    if tipo == 'explain':
+        consulta, tipo = consulta['query'], 'select'
+    if tipo == 'select':
+        tabelas = {consulta['table']: False}
+        if consulta['join']:
+            tabelas[consulta['join']['table']] = False
+        return tabelas
+    tabelas = {consulta['table']: True}
+    if tipo == 'copy':
+        # COPY a partir do CSV de outra tabela: essa tabela também é lida.
+        origem = os.path.normpath(consulta['file'])
+        nome, extensao = os.path.splitext(origem)
+        if extensao == '.csv' and get_csv_path(nome) == origem and nome not in tabelas:
+            tabelas[nome] = False
+    return tabelas
+
+def _opcao_configuracao(texto):
+    chave, _, valor = texto.partition('=')
+    try:
+        return chave, ast.literal_eval(valor)
+    except (ValueError, SyntaxError):
+        return chave, valor
+
+def _aplicar_configuracao(configuracoes):
+    for chave, valor in configuracoes:
+        setattr(configuracao, chave, valor)
+
+# Trabalho feito num processo do pool: executa a instrução (já analisada sem erros pelo servidor) com os
+# parâmetros dados e devolve a resposta.
+def _executar_no_trabalhador(sql, parametros):
+    mensagens = io.StringIO()
+    try:
+        with contextlib.redirect_stdout(mensagens), Cursor() as cursor:
+            cursor.executar_consulta(preparar(sql).ligar(parametros))
+            if cursor.colunas is not None:
+                return {'colunas': cursor.colunas, 'linhas': cursor.fetchall()}
+    except FileNotFoundError as e:
+        return {'erro': f"Tabela não encontrada: {e.filename}"}
+    except Exception as e:
+        return {'erro': str(e)}
+    return {'mensagens': mensagens.getvalue().splitlines()}
+
+class Servidor:
+    def __init__(self, trabalhadores, configuracoes=()):
+        self._pool = ProcessPoolExecutor(trabalhadores, initializer=_aplicar_configuracao,
+                                         initargs=(list(configuracoes),))
+        self._trancas = defaultdict(TrancaLeituraEscrita)
+
+    def fechar(self):
+        self._pool.shutdown(cancel_futures=True)
+
+    # Analisa o pedido, espera pelos bloqueios das tabelas e executa-o no pool. Devolve a resposta.
+    async def executar(self, sql, parametros=()):
+        analise = io.StringIO()
+        try:
+            # As mensagens de erro do lexer e do parser são impressas: passam a ser o texto do erro.
+            with contextlib.redirect_stdout(analise):
+                instrucao = preparar(sql)
+            if instrucao is None:
+                return {'erro': analise.getvalue().strip() or f"erro de sintaxe na instrução: {sql}"}
+            consulta = instrucao.ligar(parametros)
+        except Exception as e:
+            return {'erro': str(e)}
+
+        # Os bloqueios são adquiridos por ordem do nome da tabela, para dois pedidos nunca ficarem à espera
+        # um do outro.
+        tabelas = sorted(tabelas_da_consulta(consulta).items())
+        adquiridas = []
+        try:
+            for tabela, escrita in tabelas:
+                tranca = self._trancas[tabela]
+                await (tranca.adquirir_escrita() if escrita else tranca.adquirir_leitura())
+                adquiridas.append((tranca, escrita))
+            ciclo = asyncio.get_running_loop()
+            return await ciclo.run_in_executor(self._pool, _executar_no_trabalhador, instrucao.sql, parametros)
+        except Exception as e:
+            return {'erro': f"falha no processo de execução: {e!r}"}
+        finally:
+            for tranca, escrita in reversed(adquiridas):
+                await (tranca.libertar_escrita() if escrita else tranca.libertar_leitura())
+
+    # Atende uma ligação: lê os pedidos linha a linha e responde a cada um pela mesma ordem.
+    async def atender(self, leitor, escritor):
+        try:
+            while linha := await leitor.readline():
+                texto = linha.decode('utf-8').strip()
+                if not texto:
+                    continue
+                identificador = None
+                if texto.startswith('{'):
+                    try:
+                        pedido = json.loads(texto)
+                        identificador = pedido.get('id')
+                        resposta = await self.executar(pedido['sql'], pedido.get('parametros') or ())
+                    except (ValueError, KeyError, AttributeError) as e:
+                        resposta = {'erro': f"pedido inválido: {e}"}
+                else:
+                    resposta = await self.executar(texto)
+                if identificador is not None:
+                    resposta['id'] = identificador
+                escritor.write(json.dumps(resposta, ensure_ascii=False, default=str).encode('utf-8') + b'\n')
+                await escritor.drain()
+        except (ConnectionError, asyncio.IncompleteReadError, ValueError):
+            # Ligação fechada pelo cliente, ou linha maior do que o limite.
+            pass
+        except asyncio.CancelledError:
+            # O servidor está a terminar (Ctrl+C ou SIGTERM).
+            pass
+        finally:
+            escritor.close()
+
+async def servir(opcoes):
+    # SIGTERM termina o servidor como o Ctrl+C: fecha o pool e apaga o socket.
+    asyncio.get_running_loop().add_signal_handler(signal.SIGTERM, asyncio.current_task().cancel)
+    servidor = Servidor(opcoes.trabalhadores, opcoes.config)
+    try:
+        if opcoes.socket:
+            rede = await asyncio.start_unix_server(servidor.atender, opcoes.socket, limit=_LIMITE_LINHA)
+            endereco = opcoes.socket
+        else:
+            rede = await asyncio.start_server(servidor.atender, opcoes.host, opcoes.porta, limit=_LIMITE_LINHA)
+            endereco = f"{opcoes.host}:{opcoes.porta}"
+        print(f"Servidor à escuta em {endereco} ({opcoes.trabalhadores} processo(s) de execução, "
+              f"tabelas em {os.getcwd()})", flush=True)
+        async with rede:
+            await rede.serve_forever()
+    finally:
+        servidor.fechar()
+        if opcoes.socket and os.path.exists(opcoes.socket):
+            os.remove(opcoes.socket)
+
+def main():
+    argumentos = argparse.ArgumentParser(description="Servidor de consultas SQL sobre as tabelas CSV.")
+    argumentos.add_argument('--host', default='127.0.0.1')
+    argumentos.add_argument('--porta', type=int, default=_PORTA)
+    argumentos.add_argument('--socket', help="escuta num socket Unix com este caminho em vez de TCP")
+    argumentos.add_argument('--trabalhadores', type=int, default=os.cpu_count() or 1,
+                            help="processos que executam as consultas")
+    argumentos.add_argument('--diretorio', default='.', help="diretório das tabelas CSV")
+    argumentos.add_argument('--config', action='append', default=[], type=_opcao_configuracao,
+                            metavar='CHAVE=VALOR', help="altera um parâmetro de configuracao.py")
+    opcoes = argumentos.parse_args()
+    if opcoes.trabalhadores < 1:
+        sys.exit("ERRO: --trabalhadores tem de ser pelo menos 1.")
+    if opcoes.socket:
+        opcoes.socket = os.path.abspath(opcoes.socket)
+    os.chdir(opcoes.diretorio)
+    _aplicar_configuracao(opcoes.config)
+    try:
+        asyncio.run(servir(opcoes))
+    except (KeyboardInterrupt, asyncio.CancelledError):
+        pass
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,334 @@
+# Mapa de zonas de uma tabela ('<tabela>.csv.zonas'): estatísticas por bloco de linhas, para que as
+# leituras com WHERE saltem os blocos em que nenhuma linha pode satisfazer a condição.
+#
+# As linhas de dados do CSV base são divididas em blocos de configuracao.ZONAS_LINHAS_POR_BLOCO linhas
+# (pela numeração da tabela de offsets de leitor_mmap). De cada bloco guarda-se o número da primeira linha,
+# o byte onde ela começa e o número de linhas e, para cada coluna, o mínimo e o máximo dos valores
+# numéricos e quantos valores não são números (vazios, texto, NaN ou campos em falta). O ficheiro é JSON
+# e tem a assinatura do CSV (tamanho, mtime, inode) a que corresponde. Um INSERT ou COPY acrescenta as
+# novas linhas ao último bloco e aos blocos seguintes sem reler a tabela: os blocos alterados são
+# acrescentados, como uma linha JSON, a '<tabela>.csv.zonas.novas', que é aplicado por cima do mapa na
+# leitura e só é juntado ao mapa (reescrevendo-o) quando fica maior do que ele; um VACUUM ou uma alteração
+# externa invalidam o mapa. O mapa é só uma aceleração: se não puder ser gravado (ex.: diretório só de
+# leitura), as leituras percorrem a tabela toda.
+#
+# Um bloco só é saltado quando as estatísticas provam que o WHERE é falso em todas as suas linhas e que a
+# avaliação não falharia em nenhuma delas: 'valor > 3000' salta um bloco com máximo 2500 mas não um que
+# tenha também um valor vazio, onde a comparação de texto com um número falharia linha a linha. Como o
+# mapa descreve o CSV base, os blocos com linhas alteradas pelo log de alterações nunca são saltados.
+import itertools
+import json
+import os
+
+import configuracao
+import leitor_mmap
+from cache_tabelas import assinatura_ficheiro
+
+# caminho do CSV -> (assinatura do ficheiro de zonas, mapa)
+_carregados = {}
+
+def caminho_zonas(arquivo):
+    return f"{arquivo}.zonas"
+
+def caminho_novas(arquivo):
+    return f"{arquivo}.zonas.novas"
+
+def existe(arquivo):
+    return os.path.exists(caminho_zonas(arquivo))
+
+# Resume um bloco de linhas (listas de valores pela ordem do cabeçalho) com 'numero_colunas' colunas.
+def _resumir(linhas_valores, numero_colunas):
+    resumo = {'minimos': [], 'maximos': [], 'nao_numericos': []}
+    for posicao in range(numero_colunas):
+        numeros, nao_numericos = [], 0
+        for valores in linhas_valores:
+            try:
+                numero = float(valores[posicao])
+            except (ValueError, TypeError, IndexError):
+                nao_numericos += 1
+                continue
+            if numero != numero:
+                # NaN: as comparações com ele não seguem a ordem do mínimo e do máximo.
+                nao_numericos += 1
+            else:
+                numeros.append(numero)
+        resumo['minimos'].append(min(numeros) if numeros else None)
+        resumo['maximos'].append(max(numeros) if numeros else None)
+        resumo['nao_numericos'].append(nao_numericos)
+    return resumo
+
+# Junta ao bloco o resumo de mais linhas que lhe foram acrescentadas.
+def _juntar(bloco, resumo, linhas):
+    for posicao, (minimo, maximo) in enumerate(zip(resumo['minimos'], resumo['maximos'])):
+        if minimo is not None:
+            atual = bloco['minimos'][posicao]
+            bloco['minimos'][posicao] = minimo if atual is None else min(atual, minimo)
+            atual = bloco['maximos'][posicao]
+            bloco['maximos'][posicao] = maximo if atual is None else max(atual, maximo)
+        bloco['nao_numericos'][posicao] += resumo['nao_numericos'][posicao]
+    bloco['linhas'] += linhas
+
+# Acrescenta ao mapa os blocos das linhas 'linhas_valores', a primeira das quais é a linha número 'primeira'
+# e começa nos bytes 'offsets'. A primeira vai para o fim do último bloco, se ele ainda não estiver cheio.
+def _acrescentar_linhas(mapa, primeira, linhas_valores, offsets):
+    por_bloco = mapa['linhas_por_bloco']
+    numero_colunas = len(mapa['colunas'])
+    blocos = mapa['blocos']
+    posicao = 0
+    if blocos and blocos[-1]['linhas'] < por_bloco:
+        quantas = por_bloco - blocos[-1]['linhas']
+        parte = linhas_valores[:quantas]
+        if parte:
+            _juntar(blocos[-1], _resumir(parte, numero_colunas), len(parte))
+        posicao = len(parte)
+    while posicao < len(linhas_valores):
+        parte = linhas_valores[posicao:posicao + por_bloco]
+        bloco = {'linha': primeira + posicao, 'inicio': offsets[posicao], 'linhas': len(parte)}
+        bloco.update(_resumir(parte, numero_colunas))
+        blocos.append(bloco)
+        posicao += len(parte)
+
+def _remover(caminho):
+    try:
+        os.remove(caminho)
+    except FileNotFoundError:
+        pass
+
+# Grava o mapa completo (e apaga os blocos acrescentados, que ele já inclui). Devolve False se não foi possível.
+def _gravar(arquivo, mapa):
+    caminho = caminho_zonas(arquivo)
+    temporario = f'{caminho}.{os.getpid()}.tmp'
+    _carregados.pop(arquivo, None)
+    try:
+        with open(temporario, 'w', encoding='utf-8') as f:
+            json.dump(mapa, f)
+        os.replace(temporario, caminho)
+        _remover(caminho_novas(arquivo))
+    except OSError:
+        try:
+            os.remove(temporario)
+        except OSError:
+            pass
+        return False
+    return True
+
+# (Re)constrói o mapa de zonas da tabela a partir do CSV. Devolve o mapa, ou None se não foi possível gravá-lo.
+def construir(arquivo):
+    assinatura = list(assinatura_ficheiro(arquivo))
+    offsets = leitor_mmap.obter_offsets(arquivo)
+    mapa = {
+        'assinatura': assinatura,
+        'linhas_por_bloco': max(1, configuracao.ZONAS_LINHAS_POR_BLOCO),
+        'colunas': leitor_mmap.ler_cabecalho(arquivo),
+        'blocos': [],
+    }
+    valores = leitor_mmap.varrer_valores(arquivo)
+    primeira = 0
+    while True:
+        linhas_valores = list(itertools.islice(valores, mapa['linhas_por_bloco']))
+        if not linhas_valores:
+            break
+        _acrescentar_linhas(mapa, primeira, linhas_valores, offsets[primeira:primeira + len(linhas_valores)])
+        primeira += len(linhas_valores)
+    if not _gravar(arquivo, mapa):
+        return None
+    return mapa
+
+def _estado(caminho):
+    try:
+        estado = os.stat(caminho)
+    except FileNotFoundError:
+        return None
+    return estado.st_size, estado.st_mtime_ns, estado.st_ino
+
+# Aplica ao mapa os blocos acrescentados depois de ele ser gravado, por ordem. Cada linha só se aplica à
+# versão do CSV a que se seguiu; o resto (uma linha a meio, de uma escrita interrompida, ou que não se
+# segue à anterior) é ignorado e o mapa fica desatualizado.
+def _aplicar_novas(mapa, linhas):
+    for linha in linhas:
+        try:
+            novas = json.loads(linha)
+        except ValueError:
+            return
+        if novas['anterior'] != mapa['assinatura']:
+            return
+        blocos = mapa['blocos']
+        if blocos and novas['blocos'] and novas['blocos'][0]['linha'] == blocos[-1]['linha']:
+            # O último bloco recebeu linhas: a versão nova substitui-o.
+            blocos.pop()
+        blocos.extend(novas['blocos'])
+        mapa['assinatura'] = novas['assinatura']
+
+def _ler(arquivo):
+    caminho = caminho_zonas(arquivo)
+    estado = _estado(caminho)
+    if estado is None:
+        return None
+    assinatura = (estado, _estado(caminho_novas(arquivo)))
+    carregado = _carregados.get(arquivo)
+    if carregado is not None and carregado[0] == assinatura:
+        return carregado[1]
+    try:
+        with open(caminho, encoding='utf-8') as f:
+            mapa = json.load(f)
+    except ValueError:
+        return None
+    try:
+        with open(caminho_novas(arquivo), encoding='utf-8') as f:
+            _aplicar_novas(mapa, f)
+    except FileNotFoundError:
+        pass
+    _carregados[arquivo] = (assinatura, mapa)
+    return mapa
+
+# Devolve o mapa de zonas da tabela se corresponder à versão atual do CSV; senão constrói-o, se
+# 'construir_se_faltar', ou devolve None.
+def obter(arquivo, construir_se_faltar=False):
+    mapa = _ler(arquivo)
+    if mapa is not None and mapa['assinatura'] == list(assinatura_ficheiro(arquivo)):
+        return mapa
+    if not construir_se_faltar:
+        return None
+    return construir(arquivo)
+
+# Acrescenta ao mapa as linhas que acabaram de ser escritas no fim do CSV ('linhas_valores', listas de
+# valores pela ordem do cabeçalho, que começam nos bytes 'novos_offsets'). Só é possível se o mapa
+# correspondia à versão do ficheiro anterior à escrita; senão é descartado. Os blocos alterados são
+# acrescentados a caminho_novas; o mapa só é reescrito quando esse ficheiro fica maior do que ele.
+# Se a escrita falhar, o mapa fica desatualizado e é ignorado pelas leituras.
+def registrar_insercao(arquivo, assinatura_anterior, linhas_valores, novos_offsets):
+    mapa = _ler(arquivo)
+    if mapa is None:
+        return
+    if mapa['assinatura'] != list(assinatura_anterior) or len(linhas_valores) != len(novos_offsets):
+        invalidar(arquivo)
+        return
+    blocos = mapa['blocos']
+    primeira = sum(bloco['linhas'] for bloco in blocos)
+    # Só o último bloco pode mudar; é copiado para não alterar o mapa em cache.
+    alterados = dict(mapa, blocos=[json.loads(json.dumps(blocos[-1]))] if blocos else [])
+    _acrescentar_linhas(alterados, primeira, list(linhas_valores), list(novos_offsets))
+    assinatura = list(assinatura_ficheiro(arquivo))
+    estado_mapa, estado_novas = _estado(caminho_zonas(arquivo)), _estado(caminho_novas(arquivo))
+    if estado_novas is not None and estado_mapa is not None and estado_novas[0] > estado_mapa[0]:
+        _gravar(arquivo, dict(mapa, assinatura=assinatura, blocos=blocos[:-1] + alterados['blocos']))
+        return
+    novas = {'anterior': mapa['assinatura'], 'assinatura': assinatura, 'blocos': alterados['blocos']}
+    _carregados.pop(arquivo, None)
+    try:
+        with open(caminho_novas(arquivo), 'a', encoding='utf-8') as f:
+            f.write(json.dumps(novas) + '\n')
+    except OSError:
+        pass
+
+# Apaga o mapa de zonas (usado quando o CSV é reescrito).
+def invalidar(arquivo):
+    _carregados.pop(arquivo, None)
+    _remover(caminho_zonas(arquivo))
+    _remover(caminho_novas(arquivo))
+
+# Indica se a condição tem alguma comparação com uma constante numérica fora de um NOT, a única que o
+# mapa pode usar para saltar blocos.
+def _tem_comparacao_numerica(cond):
+    operador = cond['operator']
+    if operador in ('AND', 'OR'):
+        return _tem_comparacao_numerica(cond['left']) or _tem_comparacao_numerica(cond['right'])
+    if operador in ('NOT', 'LIKE'):
+        return False
+    try:
+        float(cond['value'])
+    except (ValueError, TypeError):
+        return False
+    return True
+
+# Compila a condição numa função bloco -> (falsa, segura): 'falsa' se a condição é falsa em todas as linhas
+# do bloco em que a avaliação não falha, e 'segura' se a avaliação não falha em nenhuma linha. Segue as
+# regras de executor.compilar_condicao, incluindo a ordem de avaliação do AND e do OR.
+def _compilar_poda(cond, posicoes):
+    operador = cond['operator']
+    if operador in ('AND', 'OR'):
+        esquerda = _compilar_poda(cond['left'], posicoes)
+        direita = _compilar_poda(cond['right'], posicoes)
+        if operador == 'AND':
+            def podar_and(bloco):
+                falsa_esquerda, segura_esquerda = esquerda(bloco)
+                if falsa_esquerda and segura_esquerda:
+                    # A direita nunca chega a ser avaliada.
+                    return True, True
+                falsa_direita, segura_direita = direita(bloco)
+                return falsa_esquerda or falsa_direita, segura_esquerda and segura_direita
+            return podar_and
+        def podar_or(bloco):
+            falsa_esquerda, segura_esquerda = esquerda(bloco)
+            falsa_direita, segura_direita = direita(bloco)
+            return falsa_esquerda and falsa_direita, segura_esquerda and segura_direita
+        return podar_or
+    if operador == 'NOT':
+        interna = _compilar_poda(cond['condition'], posicoes)
+        return lambda bloco: (False, interna(bloco)[1])
+    if operador == 'LIKE':
+        return lambda bloco: (False, True)
+
+    igualdade = operador in ('=', '!=')
+    try:
+        constante = float(cond['value'])
+    except (ValueError, TypeError):
+        # Constante de texto: o '=' e o '!=' nunca falham; as outras comparações falham com valores em falta.
+        return lambda bloco: (False, igualdade)
+    posicao = posicoes.get(cond['column'])
+    if posicao is None:
+        return lambda bloco: (False, False)
+    testes = {
+        '>': lambda minimo, maximo: maximo <= constante,
+        '>=': lambda minimo, maximo: maximo < constante,
+        '<': lambda minimo, maximo: minimo >= constante,
+        '<=': lambda minimo, maximo: minimo > constante,
+        '=': lambda minimo, maximo: constante < minimo or constante > maximo,
+        '!=': lambda minimo, maximo: minimo == maximo == constante,
+    }
+    teste = testes.get(operador)
+    if teste is None:
+        return lambda bloco: (False, False)
+    def podar_comparacao(bloco):
+        # Com um valor que não é número, a linha é comparada como texto com a constante numérica.
+        if bloco['nao_numericos'][posicao]:
+            return False, igualdade
+        return teste(bloco['minimos'][posicao], bloco['maximos'][posicao]), True
+    return podar_comparacao
+
+# Indica se a construção automática na leitura está ligada para esta tabela (ver configuracao.py).
+def _construir_ao_ler(arquivo):
+    limite = configuracao.ZONAS_AUTOMATICAS_BYTES
+    return limite > 0 and os.path.getsize(arquivo) >= limite
+
+# Escolhe os blocos da tabela que uma leitura com a condição WHERE 'condicao' tem de ler, dadas as
+# 'alteracoes' pendentes no log (ver log_alteracoes.carregar). Com 'construir', o mapa é construído se
+# faltar e a tabela for grande o suficiente. Devolve None se o mapa não deixa saltar nenhum bloco; senão
+# (intervalos, total_blocos, blocos_saltados), em que cada intervalo (primeira, fim, inicio, fim_bytes)
+# são as linhas [primeira, fim) a ler, que ocupam os bytes [inicio, fim_bytes) (fim_bytes None: até ao
+# fim do ficheiro).
+def blocos_a_ler(arquivo, condicao, alteracoes, construir=True):
+    if condicao is None or not _tem_comparacao_numerica(condicao):
+        return None
+    mapa = obter(arquivo, construir and _construir_ao_ler(arquivo))
+    if mapa is None or not mapa['blocos']:
+        return None
+    podar = _compilar_poda(condicao, {nome: posicao for posicao, nome in enumerate(mapa['colunas'])})
+    por_bloco = mapa['linhas_por_bloco']
+    alterados = {numero // por_bloco for numero, valores in alteracoes.items() if valores is not None}
+    blocos = mapa['blocos']
+    intervalos, saltados = [], 0
+    for indice, bloco in enumerate(blocos):
+        falsa, segura = podar(bloco)
+        if falsa and segura and indice not in alterados:
+            saltados += 1
+            continue
+        fim = bloco['linha'] + bloco['linhas']
+        fim_bytes = blocos[indice + 1]['inicio'] if indice + 1 < len(blocos) else None
+        if intervalos and intervalos[-1][1] == bloco['linha']:
+            intervalos[-1] = (intervalos[-1][0], fim, intervalos[-1][2], fim_bytes)
+        else:
+            intervalos.append((bloco['linha'], fim, bloco['inicio'], fim_bytes))
+    if not saltados:
+        return None
+    return intervalos, len(blocos), saltados